@@ -0,0 +1 @@
+default_app_config = "django_vr_payment.apps.VrPaymentConfig"
@@ -1,3 +1,279 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .managers import status_category_q
+from .models import (
+    VRPaymentBasicPayment,
+    VRPaymentBasicPaymentStatusResponse,
+    VRPaymentCheckoutResponse,
+    VRPaymentWebhook,
+    VRPaymentWebhookPaymentPayload,
+)
+from .utils.export import export_payments
+from .utils.transaction_status import STATUS_CATEGORIES, STATUS_UNKNOWN, classify_result_code
+
+# keyset pagination: primary key of the last row of the previous page
+KEYSET_VAR = "before"
+
+
+def make_export_action(export_format: str, compress: bool = False):
+    """
+    build an admin action streaming the selected VRPaymentBasicPayments, see utils.export
+    """
+    extension = f"{export_format}.gz" if compress else export_format
+
+    def export_action(modeladmin, request, queryset):
+        response = StreamingHttpResponse(
+            export_payments(queryset, export_format=export_format, compress=compress),
+            content_type="application/gzip" if compress else f"text/{export_format}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="vr-payments-{timezone.now():%Y%m%d%H%M%S}.{extension}"'
+        )
+        return response
+
+    export_action.__name__ = f"export_as_{extension.replace('.', '_')}"
+    export_action.short_description = f"Export selected payments as {extension}"
+    return export_action
+
+
+export_as_csv = make_export_action("csv")
+export_as_csv_gzip = make_export_action("csv", compress=True)
+export_as_jsonl = make_export_action("jsonl")
+export_as_jsonl_gzip = make_export_action("jsonl", compress=True)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    never runs a full COUNT(*): unfiltered tables on PostgreSQL use the planner estimate,
+    everything else is counted up to `max_count` rows only
+    """
+
+    max_count = 10000
+    count_is_estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 (or 0) for tables that have never been analyzed
+            if row and row[0] > 0:
+                self.count_is_estimated = True
+                return int(row[0])
+        # without annotations, e.g. the latest status of every payment
+        count = queryset.order_by().values("pk")[: self.max_count + 1].count()
+        if count > self.max_count:
+            self.count_is_estimated = True
+            return self.max_count
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    pages through the default ordering (newest first) with `?before=<pk>` instead of OFFSET,
+    so every page costs the same no matter how deep it is. Any other ordering uses the default pagination.
+    """
+
+    def get_queryset(self, request, *args, **kwargs):
+        try:
+            self.keyset_before = int(request.GET.get(KEYSET_VAR, ""))
+        except ValueError:
+            self.keyset_before = None
+        # not a lookup; keep it out of filters and generated query strings
+        self.params.pop(KEYSET_VAR, None)
+        if hasattr(self, "filter_params"):
+            self.filter_params.pop(KEYSET_VAR, None)
+        # only the default ordering can be paginated by keyset
+        self.keyset_enabled = ORDER_VAR not in request.GET
+        return super().get_queryset(request, *args, **kwargs)
+
+    def get_results(self, request):
+        if not self.keyset_enabled:
+            return super().get_results(request)
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        if self.keyset_before:
+            queryset = queryset.filter(pk__lt=self.keyset_before)
+        result_list = list(queryset.order_by("-pk")[: self.list_per_page + 1])
+        has_next = len(result_list) > self.list_per_page
+        result_list = result_list[: self.list_per_page]
+
+        self.result_count = paginator.count
+        self.result_count_estimated = paginator.count_is_estimated
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_next or bool(self.keyset_before)
+        self.paginator = paginator
+        self.keyset_next_url = (
+            self.get_query_string({KEYSET_VAR: result_list[-1].pk})
+            if has_next
+            else None
+        )
+        self.keyset_first_url = self.get_query_string()
+
+
+class StatusCategoryFilter(admin.SimpleListFilter):
+    """
+    filter by status category on result_code prefixes instead of regexes
+    """
+
+    title = "status"
+    parameter_name = "status"
+    field = "result_code"
+
+    def lookups(self, request, model_admin):
+        return [(category, category.replace("_", " ")) for category in STATUS_CATEGORIES]
+
+    def queryset(self, request, queryset):
+        category = self.value()
+        if not category:
+            return queryset
+        if category == STATUS_UNKNOWN:
+            known = status_category_q(*STATUS_CATEGORIES, field=self.field)
+            return queryset.filter(~known | Q(**{f"{self.field}__isnull": True}))
+        return queryset.filter(status_category_q(category, field=self.field))
+
+
+class WebhookTypeFilter(admin.SimpleListFilter):
+    """
+    fixed choices; a plain field filter would run SELECT DISTINCT over the whole table
+    """
+
+    title = "webhook type"
+    parameter_name = "webhook_type"
+
+    def lookups(self, request, model_admin):
+        return [("payment", "payment"), ("registration", "registration"), ("risk", "risk")]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(webhook_type=self.value())
+        return queryset
+
+
+class VRPaymentModelAdmin(admin.ModelAdmin):
+    """
+    read-only admin for large tables: keyset pagination, estimated counts,
+    exact matches on indexed columns only and the raw json loaded on the detail page only
+    """
+
+    change_list_template = "admin/django_vr_payment/keyset_change_list.html"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ("-pk",)
+    list_per_page = 50
+    # searched with exact lookups, see get_search_results
+    search_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        resolver_match = getattr(request, "resolver_match", None)
+        if resolver_match and resolver_match.url_name.endswith("_change"):
+            # the detail page shows the raw json; load it with the object instead of one query per field
+            queryset = queryset.with_raw()
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        q = Q()
+        for field in self.search_fields:
+            q |= Q(**{field: search_term})
+        return queryset.filter(q), False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VRPaymentBasicPayment)
+class VRPaymentBasicPaymentAdmin(VRPaymentModelAdmin):
+    list_display = (
+        "id",
+        "created_at",
+        "merchant_transaction_id",
+        "amount",
+        "currency",
+        "payment_type",
+        "payment_brand",
+        "sandbox",
+        "status",
+    )
+    list_filter = ("payment_type", "sandbox")
+    search_fields = ("merchant_transaction_id", "merchant_invoice_id", "payment_id")
+    actions = [export_as_csv, export_as_csv_gzip, export_as_jsonl, export_as_jsonl_gzip]
+
+    def get_queryset(self, request):
+        # the status of all payments of a page in one query
+        return super().get_queryset(request).with_latest_status()
+
+    def status(self, obj):
+        return obj.latest_response_status_category.replace("_", " ")
+
+    status.short_description = "latest status"
+
+
+class VRPaymentResponseAdmin(VRPaymentModelAdmin):
+    list_display = (
+        "id",
+        "created_at",
+        "basic_payment",
+        "http_status_code",
+        "result_code",
+        "status",
+        "payment_brand",
+        "amount",
+        "currency",
+    )
+    list_filter = (StatusCategoryFilter,)
+    list_select_related = ("basic_payment",)
+    search_fields = ("vr_pay_id", "merchant_transaction_id", "basic_payment__merchant_transaction_id")
+    raw_id_fields = ("basic_payment",)
+
+    def status(self, obj):
+        return classify_result_code(obj.result_code).replace("_", " ")
+
+    status.admin_order_field = "result_code"
+
+
+@admin.register(VRPaymentBasicPaymentStatusResponse)
+class VRPaymentBasicPaymentStatusResponseAdmin(VRPaymentResponseAdmin):
+    pass
+
+
+@admin.register(VRPaymentCheckoutResponse)
+class VRPaymentCheckoutResponseAdmin(VRPaymentResponseAdmin):
+    pass
+
+
+@admin.register(VRPaymentWebhookPaymentPayload)
+class VRPaymentWebhookPaymentPayloadAdmin(VRPaymentResponseAdmin):
+    raw_id_fields = ("basic_payment", "webhook")
+
+
+@admin.register(VRPaymentWebhook)
+class VRPaymentWebhookAdmin(VRPaymentModelAdmin):
+    list_display = ("id", "created_at", "webhook_type", "webhook_action")
+    list_filter = (WebhookTypeFilter,)
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class VrPaymentConfig(AppConfig):
     name = "django_vr_payment"
     verbose_name = "Django VR Payment"
+
+    def ready(self):
+        from . import settings
+
+        if settings.VR_PAYMENT_WARM_UP:
+            from .utils.warmup import warm_up, warm_up_in_background
+
+            if settings.VR_PAYMENT_WARM_UP_CONNECT:
+                warm_up_in_background()
+            else:
+                warm_up(connect=False)
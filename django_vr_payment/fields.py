@@ -1,8 +1,13 @@
+from base64 import b64encode
+
 from django.core import validators
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
 
 from django.utils.functional import cached_property
 
+from .utils.compression import compress_json, decompress_json
+
 try:
     # Django 3.1
     from django.db.models import JSONField as BaseJSONField
@@ -31,3 +36,36 @@ class JSONField(BaseJSONField):
     """A field used to define a JSONField value according to djstripe logic."""
     # special thanks to djstripe :-)
     pass
+
+
+class CompressedJSONDescriptor(DeferredAttribute):
+    """
+    keeps the compressed value as loaded from the database and decodes it on first access only
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, (bytes, memoryview)):
+            value = decompress_json(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    def __set__(self, instance, value):
+        # a data descriptor, so __get__ is used even if the value is already loaded
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedJSONField(models.BinaryField):
+    """A field storing json compressed with a shared dictionary. see utils.compression"""
+
+    descriptor_class = CompressedJSONDescriptor
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, (bytes, memoryview)):
+            return super().get_prep_value(value)
+        return compress_json(value)
+
+    def value_to_string(self, obj):
+        return b64encode(self.get_prep_value(self.value_from_object(obj))).decode("ascii")
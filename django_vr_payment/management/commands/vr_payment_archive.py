@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ... import settings
+from ...utils.archive import (
+    JSONLGzipArchiveWriter,
+    TableArchiveWriter,
+    archive_model,
+    get_archivable_models,
+)
+from ...utils.partitioning import ensure_monthly_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Move response and webhook rows older than --days into the archive table "
+        "or into jsonl.gz files, --batch-size rows per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.VR_PAYMENT_ARCHIVE_AFTER_DAYS,
+            help="archive rows older than this many days",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.VR_PAYMENT_ARCHIVE_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--target",
+            choices=["table", "jsonl"],
+            default="table",
+            help="archive into VRPaymentArchivedRecord or into jsonl.gz files",
+        )
+        parser.add_argument(
+            "--output-dir",
+            default=settings.VR_PAYMENT_ARCHIVE_DIR,
+            help="directory for --target jsonl",
+        )
+        parser.add_argument(
+            "--model",
+            action="append",
+            dest="models",
+            help="only archive this model (model_name); can be given multiple times",
+        )
+        parser.add_argument(
+            "--ensure-partitions",
+            type=int,
+            metavar="MONTHS",
+            help="create monthly partitions this many months ahead (partitioned installs only)",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1")
+        if options["target"] == "jsonl":
+            if not options["output_dir"]:
+                raise CommandError("--output-dir (or VR_PAYMENT_ARCHIVE_DIR) is required for --target jsonl")
+            writer = JSONLGzipArchiveWriter(options["output_dir"])
+        else:
+            writer = TableArchiveWriter()
+
+        models = get_archivable_models()
+        if options["models"]:
+            unknown = set(options["models"]) - {model._meta.model_name for model in models}
+            if unknown:
+                raise CommandError(f"unknown model(s): {', '.join(sorted(unknown))}")
+            models = [model for model in models if model._meta.model_name in options["models"]]
+
+        before = timezone.now() - timezone.timedelta(days=options["days"])
+        try:
+            for model in models:
+                archived = archive_model(model, before, writer, options["batch_size"])
+                self.stdout.write(f"archived {archived} {model._meta.verbose_name_plural}")
+        finally:
+            writer.close()
+
+        if options["ensure_partitions"] is not None:
+            for partition in ensure_monthly_partitions(options["ensure_partitions"]):
+                self.stdout.write(f"partition {partition} ready")
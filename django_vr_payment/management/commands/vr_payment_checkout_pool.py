@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import settings
+from ...utils.checkout_pool import get_pool_stats, purge_expired_checkouts, replenish_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the checkout pool (VR_PAYMENT_CHECKOUT_POOL_BUCKETS) and delete expired pooled checkouts. "
+        "Run it every few minutes or with --loop as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="run until interrupted")
+        parser.add_argument(
+            "--interval", type=int, default=60, help="seconds between two runs with --loop"
+        )
+        parser.add_argument(
+            "--stats", action="store_true", help="only print the pool stats"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.VR_PAYMENT_CHECKOUT_POOL_BUCKETS:
+            raise CommandError("VR_PAYMENT_CHECKOUT_POOL_BUCKETS is not configured")
+        if options["stats"]:
+            self.write_stats()
+            return
+        while True:
+            deleted = purge_expired_checkouts()
+            if deleted:
+                self.stdout.write(f"deleted {deleted} expired checkouts")
+            for bucket, created in replenish_pool().items():
+                if created:
+                    self.stdout.write(f"created {created} checkouts for {bucket}")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.write_stats()
+
+    def write_stats(self):
+        for bucket, stats in get_pool_stats().items():
+            hit_rate = "-" if stats["hit_rate"] is None else f"{stats['hit_rate']:.1%}"
+            self.stdout.write(
+                f"{bucket}: {stats['available']}/{stats['size']} available, "
+                f"{stats['hits']} hits, {stats['misses']} misses, hit rate {hit_rate}"
+            )
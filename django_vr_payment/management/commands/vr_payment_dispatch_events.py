@@ -0,0 +1,45 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from ...utils.events import StatusEventDispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the status change events (VR_PAYMENT_STATUS_EVENTS) to the receivers of payment_status_changed in "
+        "batches, coalescing the changes of a payment within --window seconds. Runs until stopped unless --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="max events per transaction")
+        parser.add_argument("--window", type=float, help="defaults to VR_PAYMENT_STATUS_EVENT_WINDOW")
+        parser.add_argument("--interval", type=float, default=1, help="seconds to wait when all events are sent")
+        parser.add_argument("--max-attempts", type=int, default=10, help="give events up after this many failures")
+        parser.add_argument(
+            "--retry-delay", type=float, default=60, help="seconds until failed events are sent again, doubling"
+        )
+        parser.add_argument("--once", action="store_true", help="send the pending events and exit")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        dispatcher = StatusEventDispatcher(
+            batch_size=options["batch_size"],
+            window=options["window"],
+            interval=options["interval"],
+            max_attempts=options["max_attempts"],
+            retry_delay=options["retry_delay"],
+            using=options["database"],
+        )
+        if options["once"]:
+            while dispatcher.dispatch_batch() == options["batch_size"]:
+                pass
+        else:
+            self.stopped = False
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+            dispatcher.run(should_stop=lambda: self.stopped)
+        self.stdout.write(", ".join(f"{value} {name}" for name, value in dispatcher.stats.items()))
+
+    def stop(self, signum, frame):
+        self.stopped = True
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ...utils.explain import SMALL_TABLE_ROWS, explain_app_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queries of the views, managers and commands and flag sequential scans "
+        f"of tables with at least {SMALL_TABLE_ROWS} rows. Exits with status 1 if any query scans a table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--analyze", action="store_true", help="EXPLAIN ANALYZE, i.e. run the queries (PostgreSQL only)"
+        )
+        parser.add_argument("--verbose-plans", action="store_true", help="print the plans of all queries")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise CommandError(f"sequential scans can not be detected on {connection.vendor}")
+        if connection.vendor == "postgresql":
+            # up to date statistics, e.g. right after generating data
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        flagged = 0
+        for name, plan, full_scans in explain_app_queries(options["database"], analyze=options["analyze"]):
+            if full_scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{name}: sequential scan of {', '.join(full_scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if full_scans or options["verbose_plans"]:
+                self.stdout.write(plan)
+        if flagged:
+            raise CommandError(f"{flagged} queries scan tables without an index")
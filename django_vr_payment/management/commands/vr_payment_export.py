@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from ...models import VRPaymentBasicPayment
+from ...utils.export import EXPORT_FORMATS, export_payments
+
+
+class Command(BaseCommand):
+    help = "Stream all payments with their latest status response as csv or jsonl."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--gzip", action="store_true", help="gzip the output")
+        parser.add_argument("--output", help="file to write to; defaults to stdout")
+        parser.add_argument(
+            "--from", dest="date_from", type=parse_date, help="created at or after (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--to", dest="date_to", type=parse_date, help="created before (YYYY-MM-DD)"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = VRPaymentBasicPayment.objects.all()
+        if options["date_from"]:
+            queryset = queryset.filter(created_at__date__gte=options["date_from"])
+        if options["date_to"]:
+            queryset = queryset.filter(created_at__date__lt=options["date_to"])
+        chunks = export_payments(
+            queryset,
+            export_format=options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if options["output"] and options["gzip"]:
+            with open(options["output"], "wb") as output:
+                output.writelines(chunks)
+        elif options["output"]:
+            with open(options["output"], "w", encoding="utf8", newline="") as output:
+                output.writelines(chunks)
+        elif options["gzip"]:
+            # the binary stream below self.stdout, e.g. sys.stdout.buffer, or a bytes stream given to call_command
+            output = getattr(self.stdout._out, "buffer", self.stdout._out)
+            output.writelines(chunks)
+            output.flush()
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            self.stdout.flush()
@@ -0,0 +1,48 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ...utils.generate import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate --count synthetic payments with checkout responses, status responses, webhooks, payloads and "
+        "identifiers for scale testing, e.g. before vr_payment_explain. The same --seed, --count, --days and --end "
+        "generate the same rows into an empty database. Inserts by COPY on PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100000, help="number of payments")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--days", type=int, default=30, help="spread the payments over this many days")
+        parser.add_argument(
+            "--end", type=parse_date, help="day (YYYY-MM-DD) after the last payment, defaults to today"
+        )
+        parser.add_argument("--entity-id", help="defaults to VR_PAYMENT_ENTITY_ID")
+        parser.add_argument("--batch-size", type=int, default=5000, help="payments per transaction")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        if options["count"] < 1 or options["days"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--count, --days and --batch-size must be at least 1")
+        end = None
+        if options["end"]:
+            end = timezone.make_aware(datetime.datetime.combine(options["end"], datetime.time()))
+        generator = SyntheticDataGenerator(
+            seed=options["seed"],
+            days=options["days"],
+            end=end,
+            entity_id=options["entity_id"],
+            batch_size=options["batch_size"],
+            using=options["database"],
+        )
+        if generator.exists():
+            raise CommandError(f"payments of seed {options['seed']} exist already, use another --seed")
+
+        stats = generator.run(
+            options["count"], progress=lambda done: self.stdout.write(f"{done}/{options['count']} payments")
+        )
+        self.stdout.write(", ".join(f"{count} {name}" for name, count in stats.items()))
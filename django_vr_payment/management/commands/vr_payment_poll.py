@@ -0,0 +1,53 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...utils.polling import POLLER_LOCK_KEY, PendingPaymentPoller, advisory_lock
+
+
+class Command(BaseCommand):
+    help = (
+        "Poll the status of pending payments until it is final, with exponential backoff per payment. "
+        "Runs until stopped; on PostgreSQL only the instance holding the advisory lock polls, the others wait."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-in-flight", type=int, help="max concurrent status queries")
+        parser.add_argument("--initial-delay", type=float, help="seconds before the second check")
+        parser.add_argument("--max-delay", type=float, help="max seconds between two checks")
+        parser.add_argument("--max-age-days", type=int, help="do not poll older payments")
+        parser.add_argument(
+            "--lock-retry", type=float, default=30, help="seconds between two attempts to become the poller"
+        )
+
+    def handle(self, *args, **options):
+        self.stopped = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        while not self.stopped:
+            with advisory_lock(POLLER_LOCK_KEY) as acquired:
+                if acquired:
+                    self.stdout.write("polling pending payments")
+                    poller = PendingPaymentPoller(
+                        max_in_flight=options["max_in_flight"],
+                        initial_delay=options["initial_delay"],
+                        max_delay=options["max_delay"],
+                        max_age_days=options["max_age_days"],
+                    )
+                    poller.run(should_stop=lambda: self.stopped, lock_key=POLLER_LOCK_KEY)
+                    self.stdout.write(
+                        ", ".join(f"{value} {name}" for name, value in poller.stats.items())
+                    )
+                    if not poller.lock_lost:
+                        return
+                    self.stdout.write("lost the lock, waiting")
+                else:
+                    self.stdout.write("another instance is polling, waiting")
+            waiting_since = time.monotonic()
+            while not self.stopped and time.monotonic() - waiting_since < options["lock_retry"]:
+                time.sleep(1)
+
+    def stop(self, signum, frame):
+        self.stopped = True
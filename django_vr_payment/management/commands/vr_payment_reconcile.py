@@ -0,0 +1,91 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ...utils.export import iter_csv, iter_jsonl
+from ...utils.reconcile import (
+    DEFAULT_REPORT_COLUMNS,
+    MISMATCH_COLUMNS,
+    REPORT_FORMATS,
+    Reconciliation,
+    ReportError,
+    read_report,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Match the lines of a VR Pay transaction or settlement report (csv, jsonl or json) with the payments and "
+        "stream the mismatches (missing payment, amount, status) as csv or jsonl. With --from and --to, successful "
+        "payments of the period that are not in the report are listed as well."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("report", help="path of the report")
+        parser.add_argument(
+            "--format", choices=REPORT_FORMATS, help="report format, defaults to the file extension"
+        )
+        parser.add_argument("--delimiter", default=",", help="csv delimiter")
+        parser.add_argument(
+            "--json-prefix", default="item", help="ijson prefix of the lines of a json report, e.g. transactions.item"
+        )
+        parser.add_argument(
+            "--column",
+            action="append",
+            default=[],
+            metavar="FIELD=COLUMN",
+            help=f"report column of a field ({', '.join(DEFAULT_REPORT_COLUMNS)}); can be given multiple times",
+        )
+        parser.add_argument(
+            "--from", dest="date_from", type=parse_date, help="first day (YYYY-MM-DD) of the reported period"
+        )
+        parser.add_argument(
+            "--to", dest="date_to", type=parse_date, help="last day (YYYY-MM-DD) of the reported period, inclusive"
+        )
+        parser.add_argument("--output", help="file to write the mismatches to; defaults to stdout")
+        parser.add_argument("--output-format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="report lines matched at once")
+
+    def handle(self, *args, **options):
+        report_format = options["format"] or os.path.splitext(options["report"])[1].lstrip(".").lower()
+        if report_format not in REPORT_FORMATS:
+            raise CommandError(f"unknown report format '{report_format}', use --format")
+        columns = {}
+        for column in options["column"]:
+            field, _, name = column.partition("=")
+            if field not in DEFAULT_REPORT_COLUMNS or not name:
+                raise CommandError(f"invalid --column '{column}'")
+            columns[field] = name
+        if bool(options["date_from"]) != bool(options["date_to"]):
+            raise CommandError("--from and --to must be given together")
+        date_from = date_to = None
+        if options["date_from"]:
+            date_from = timezone.make_aware(datetime.datetime.combine(options["date_from"], datetime.time()))
+            date_to = timezone.make_aware(
+                datetime.datetime.combine(options["date_to"] + datetime.timedelta(days=1), datetime.time())
+            )
+
+        reconciliation = Reconciliation(
+            columns=columns, chunk_size=options["chunk_size"], date_from=date_from, date_to=date_to
+        )
+        mismatches = reconciliation.run(
+            read_report(options["report"], report_format, options["delimiter"], options["json_prefix"])
+        )
+        if options["output_format"] == "csv":
+            chunks = iter_csv(mismatches, MISMATCH_COLUMNS)
+        else:
+            chunks = iter_jsonl(mismatches)
+        try:
+            if options["output"]:
+                with open(options["output"], "w", encoding="utf8", newline="") as output:
+                    output.writelines(chunks)
+            else:
+                for chunk in chunks:
+                    self.stdout.write(chunk, ending="")
+                self.stdout.flush()
+        except (ReportError, OSError) as e:
+            raise CommandError(str(e))
+        self.stderr.write(", ".join(f"{value} {name}" for name, value in reconciliation.stats.items()))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import settings
+from ...utils.replay import STORED_SOURCE, ReplayCheckpoint, WebhookReplay
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay webhooks from a jsonl export (--file) or the stored webhooks and derive their payment payloads, "
+        "decoding in --workers processes and writing --batch-size webhooks per transaction. "
+        "With --checkpoint an interrupted replay resumes after the last written batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            help="jsonl export, one encrypted webhook ({\"headers\": ..., \"body\": ...}) or webhook body per line; "
+            "defaults to the stored webhooks without payload",
+        )
+        parser.add_argument(
+            "--entity-id", help="decrypt the export with VR_PAYMENT_CONFIG_KEY of this entity"
+        )
+        parser.add_argument("--checkpoint", help="file to save the position of the last written batch in")
+        parser.add_argument("--workers", type=int, help="decoding processes, defaults to the number of cpus")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--rederive",
+            action="store_true",
+            help="replace the existing payloads of stored webhooks as well",
+        )
+
+    def handle(self, *args, **options):
+        if options["rederive"] and options["file"]:
+            raise CommandError("--rederive only applies to the stored webhooks")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        try:
+            entity_settings = settings.for_entity(options["entity_id"]) if options["entity_id"] else settings
+        except settings.UnknownEntityError as e:
+            raise CommandError(e)
+        source = options["file"] or STORED_SOURCE
+        checkpoint = ReplayCheckpoint(options["checkpoint"])
+        if checkpoint.get(source):
+            self.stdout.write(f"resuming {source} after {checkpoint.get(source)}")
+
+        replay = WebhookReplay(
+            source=source,
+            config_key=entity_settings.VR_PAYMENT_CONFIG_KEY,
+            checkpoint=checkpoint,
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            rederive=options["rederive"],
+        )
+        stats = replay.run()
+        self.stdout.write(", ".join(f"{value} {name}" for name, value in stats.items()))
@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ...models import VRPaymentDailyRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild VRPaymentDailyRollup from the status responses, one day per transaction. "
+        "Defaults to yesterday and today."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=parse_date, help="first day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", type=parse_date, help="last day (YYYY-MM-DD), inclusive")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        date_from = options["date_from"] or today - datetime.timedelta(days=1)
+        date_to = options["date_to"] or today
+        if date_from > date_to:
+            raise CommandError("--from must not be after --to")
+
+        day = date_from
+        while day <= date_to:
+            rows = VRPaymentDailyRollup.objects.rebuild(day)
+            self.stdout.write(f"{day}: {rows} rows")
+            day += datetime.timedelta(days=1)
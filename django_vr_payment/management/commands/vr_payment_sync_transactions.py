@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ...wrapper.registry import get_wrapper
+
+
+class Command(BaseCommand):
+    help = (
+        "Query all transactions of a date range from VR Pay, page by page, and save the ones that are not saved yet "
+        "as status responses of their payments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from", dest="date_from", type=parse_date, required=True, help="first day (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--to", dest="date_to", type=parse_date, required=True, help="last day (YYYY-MM-DD), inclusive"
+        )
+        parser.add_argument("--entity-id", help="defaults to VR_PAYMENT_ENTITY_ID")
+        parser.add_argument("--window-hours", type=int, default=24, help="max time range of one query")
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--payment-types", help="only these payment types, e.g. DB,RF")
+
+    def handle(self, *args, **options):
+        if options["date_from"] > options["date_to"]:
+            raise CommandError("--from must not be after --to")
+        if options["window_hours"] < 1 or options["page_size"] < 1:
+            raise CommandError("--window-hours and --page-size must be at least 1")
+        params = {"paymentTypes": options["payment_types"]} if options["payment_types"] else {}
+        stats = get_wrapper(options["entity_id"]).sync_transactions(
+            timezone.make_aware(datetime.datetime.combine(options["date_from"], datetime.time())),
+            timezone.make_aware(
+                datetime.datetime.combine(options["date_to"] + datetime.timedelta(days=1), datetime.time())
+            ),
+            window=datetime.timedelta(hours=options["window_hours"]),
+            page_size=options["page_size"],
+            **params,
+        )
+        self.stdout.write(", ".join(f"{value} {name}" for name, value in stats.items()))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from ...models import (
+    VRPaymentBasicPaymentStatusResponse,
+    VRPaymentCheckoutResponse,
+    VRPaymentWebhook,
+    VRPaymentWebhookPaymentPayload,
+)
+from ...utils.compression import train_dictionary
+
+
+class Command(BaseCommand):
+    help = (
+        "Train a compression dictionary on the latest stored payloads. "
+        "Point VR_PAYMENT_COMPRESSION_DICTIONARY to the written file to use it for new rows and keep the "
+        "previous dictionary file in VR_PAYMENT_COMPRESSION_PREVIOUS_DICTIONARIES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="path of the dictionary file")
+        parser.add_argument(
+            "--samples", type=int, default=1000, help="number of payloads per model"
+        )
+        parser.add_argument("--size", type=int, default=32768, help="dictionary size in bytes")
+
+    def get_latest(self, model, fields: tuple, count: int):
+        """
+        the latest rows that have at least one of the payload `fields`
+        """
+        has_payload = Q()
+        for field in fields:
+            has_payload |= Q(**{f"{field}__isnull": False})
+        return model._base_manager.filter(has_payload).order_by("-pk")[:count]
+
+    def handle(self, *args, **options):
+        samples = []
+        for model in (
+            VRPaymentCheckoutResponse,
+            VRPaymentBasicPaymentStatusResponse,
+            VRPaymentWebhookPaymentPayload,
+        ):
+            fields = ("raw_headers", "raw_content", "compressed_headers", "compressed_content")
+            for response in self.get_latest(model, fields, options["samples"]):
+                samples.extend([response.headers, response.content])
+        fields = ("raw_headers", "decrypted_body", "compressed_headers", "compressed_body")
+        for webhook in self.get_latest(VRPaymentWebhook, fields, options["samples"]):
+            samples.extend([webhook.headers, webhook.body])
+        # e.g. rows with a body but without headers
+        samples = [sample for sample in samples if sample is not None]
+
+        dictionary = train_dictionary(samples, options["size"])
+        with open(options["output"], "wb") as dictionary_file:
+            dictionary_file.write(dictionary)
+        self.stdout.write(
+            f"wrote {len(dictionary)} byte dictionary trained on {len(samples)} payloads"
+        )
@@ -2,63 +2,645 @@ import json
 import logging
 from urllib.request import Request
 
-from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
-from django.db.models import Q, QuerySet
+import datetime
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    F,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, NullIf
+from django.db.models.expressions import RawSQL
 from django.db.models.manager import Manager
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from . import settings
 
 from .utils.transaction_status import (
+    classify_result_code,
+    STATUS_CATEGORY_REGEXES,
+    STATUS_UNKNOWN,
     TRANSACTION_SUCCESSFULLY_PROCESSED_REGEX,
     TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX,
     TRANSACTION_PENDING_REGEX,
     TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX,
+    regex_to_prefixes,
 )
+from .utils.lru import LRUCache
+from .utils.pubsub import publish_status
 from .utils.webhooks import decrypt_webhook
 
 logger = logging.getLogger(__name__)
 
 
-class VRPaymentBasicPaymentManager(Manager):
-    def get(self, *args, **kwargs):
-        return super().select_related("checkout_response").get(*args, **kwargs)
+def status_category_q(*categories, field: str = "result_code") -> Q:
+    """
+    a Q object matching the result codes of the given status categories (see utils.transaction_status)
+    by prefix, which - unlike the regexes - can use an index on `field`. Like classify_result_code, the first
+    matching category wins: the codes of an earlier category that is not given are excluded, e.g. 100.380.4
+    is not rejected_risk_handling_3dsecure because 100.38 is rejected_risk_handling_external_risk_system.
+    """
+    q = Q()
+    other_prefixes = []
+    for category, regex in STATUS_CATEGORY_REGEXES:
+        prefixes = regex_to_prefixes(regex)
+        if category not in categories:
+            other_prefixes.extend(prefixes)
+            continue
+        for prefix in prefixes:
+            if any(prefix.startswith(other) for other in other_prefixes):
+                continue
+            prefix_q = Q(**{f"{field}__startswith": prefix})
+            for other in other_prefixes:
+                if other.startswith(prefix):
+                    prefix_q &= ~Q(**{f"{field}__startswith": other})
+            q |= prefix_q
+    # e.g. rejected_risk_management: all its codes belong to earlier categories
+    return q if q else Q(**{f"{field}__in": []})
+
+
+def status_category_expression(field: str = "result_code") -> Case:
+    """
+    an expression evaluating to the status category of `field` in the database, the same as
+    classify_result_code in python, e.g. to group by status with values(...).annotate(Count(...))
+    """
+    return Case(
+        *[
+            When(status_category_q(category, field=field), then=Value(category))
+            for category, _regex in STATUS_CATEGORY_REGEXES
+        ],
+        default=Value(STATUS_UNKNOWN),
+        output_field=CharField(),
+    )
+
+
+# json columns of responses that are deferred unless requested with `with_raw()`
+RAW_RESPONSE_FIELDS = (
+    "raw_headers",
+    "raw_content",
+    "compressed_headers",
+    "compressed_content",
+    "result_details",
+    "result_details_acquirer_response",
+    "other",
+)
+RAW_WEBHOOK_FIELDS = (
+    "raw_headers",
+    "decrypted_body",
+    "compressed_headers",
+    "compressed_body",
+)
+
+# VR Pay id -> basic payment id, see VRPaymentIdentifierManager.resolve
+identifier_cache = LRUCache(lambda: settings.VR_PAYMENT_IDENTIFIER_CACHE_SIZE)
+
+
+class VRPaymentBasicPaymentQuerySet(QuerySet):
+    # fields read by VRPaymentBasicCheckoutView
+    CHECKOUT_VIEW_FIELDS = (
+        "entity_id",
+        "sandbox",
+        "merchant_transaction_id",
+        "checkout_response__vr_pay_id",
+    )
+    # fields read by VRPaymentReturnView and the status calls of the wrapper, including the saving of their
+    # status responses (get_own_transaction, the daily rollup)
+    RETURN_VIEW_FIELDS = (
+        "created_at",
+        "entity_id",
+        "sandbox",
+        "merchant_transaction_id",
+        "resource_path",
+        "payment_id",
+        "payment_type",
+        "payment_brand",
+        "amount",
+        "currency",
+    )
+
+    def with_checkout_response(self) -> QuerySet:
+        """
+        join the checkout response, without its json columns
+        """
+        return self.select_related("checkout_response").defer(
+            *[f"checkout_response__{field}" for field in RAW_RESPONSE_FIELDS]
+        )
+
+    def with_raw(self) -> QuerySet:
+        """
+        join the checkout response with its json columns
+        """
+        return self.select_related("checkout_response")
+
+    def for_checkout_view(self) -> QuerySet:
+        return self.select_related("checkout_response").only(*self.CHECKOUT_VIEW_FIELDS)
+
+    def for_return_view(self) -> QuerySet:
+        return self.only(*self.RETURN_VIEW_FIELDS)
+
+    def annotate_latest_response(self, *fields) -> QuerySet:
+        """
+        annotate `latest_response_<field>` of the latest status response of each payment for all given fields;
+        "status_category" is the status category of its result_code
+        """
+        from .models import VRPaymentBasicPaymentStatusResponse
+
+        latest_response = VRPaymentBasicPaymentStatusResponse._base_manager.filter(
+            basic_payment=OuterRef("pk")
+        ).order_by("-pk")
+        if "status_category" in fields:
+            # classified inside the subquery; a Case over the annotation would repeat the subquery for every prefix
+            latest_response = latest_response.annotate(status_category=status_category_expression())
+        annotations = {
+            f"latest_response_{field}": Subquery(latest_response.values(field)[:1]) for field in fields
+        }
+        if "status_category" in fields:
+            annotations["latest_response_status_category"] = Coalesce(
+                annotations["latest_response_status_category"], Value(STATUS_UNKNOWN)
+            )
+        return self.annotate(**annotations)
+
+    def with_latest_status(self) -> QuerySet:
+        """
+        annotate `latest_response_result_code`, `latest_response_created_at` and `latest_response_status_category`
+        (see STATUS_CATEGORIES, "unknown" without status response) of every payment in the same query
+        """
+        return self.annotate_latest_response("result_code", "created_at", "status_category")
+
+
+class VRPaymentBasicPaymentManager(Manager.from_queryset(VRPaymentBasicPaymentQuerySet)):
+    def save_with_checkout_response(self, basic_payment, checkout_response=None):
+        """
+        insert an unsaved basic payment together with its unsaved checkout response, all or nothing.
+        With VR_PAYMENT_CHECKOUT_PERSISTENCE = "single_statement" both rows are inserted
+        by one statement on PostgreSQL, otherwise by two statements in one transaction.
+        """
+        from .models import VRPaymentIdentifier
+
+        connection = connections[self.db]
+        if checkout_response is None:
+            basic_payment.save(using=self.db)
+        elif (
+            settings.VR_PAYMENT_CHECKOUT_PERSISTENCE == "single_statement"
+            and connection.vendor == "postgresql"
+        ):
+            self._insert_with_checkout_response(connection, basic_payment, checkout_response)
+        else:
+            with transaction.atomic(using=self.db):
+                basic_payment.save(using=self.db)
+                checkout_response.basic_payment = basic_payment
+                checkout_response.save(using=self.db)
+                VRPaymentIdentifier.objects.db_manager(self.db).register([checkout_response])
+        return basic_payment
+
+    def _insert_with_checkout_response(self, connection, basic_payment, checkout_response):
+        """
+        WITH p AS (INSERT INTO <payments> ... RETURNING id),
+             c AS (INSERT INTO <checkout responses> ... SELECT p.id ... RETURNING ...),
+             i AS (INSERT INTO <identifiers> SELECT <ids of c> ON CONFLICT DO NOTHING)
+        SELECT id, basic_payment_id FROM c
+        """
+        from .models import VRPaymentIdentifier
+
+        checkout_response_model = type(checkout_response)
+        returning_fields = [
+            checkout_response_model._meta.get_field(name)
+            for name in ("id", "basic_payment", "vr_pay_id", "reference_id")
+        ]
+        id_column, basic_payment_column, vr_pay_id_column, reference_id_column = [
+            connection.ops.quote_name(field.column) for field in returning_fields
+        ]
+        identifier_meta = VRPaymentIdentifier._meta
+        identifier_sql = (
+            f"INSERT INTO {connection.ops.quote_name(identifier_meta.db_table)} "
+            f"({connection.ops.quote_name(identifier_meta.get_field('identifier').column)}, "
+            f"{connection.ops.quote_name(identifier_meta.get_field('basic_payment').column)}) "
+            f"SELECT ids.identifier, c.{basic_payment_column} "
+            f"FROM c, LATERAL (VALUES (c.{vr_pay_id_column}), (c.{reference_id_column})) AS ids (identifier) "
+            f"WHERE ids.identifier IS NOT NULL ON CONFLICT DO NOTHING"
+        )
+        # the payment is not inserted yet; reference the row returned by the CTE instead
+        checkout_response.basic_payment_id = RawSQL("(SELECT id FROM p)", [])
+        try:
+            payment_sql, payment_params = _insert_sql(
+                connection, self.model, basic_payment, [self.model._meta.pk]
+            )
+            response_sql, response_params = _insert_sql(
+                connection, checkout_response_model, checkout_response, returning_fields
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"WITH p AS ({payment_sql}), c AS ({response_sql}), i AS ({identifier_sql}) "
+                    f"SELECT {id_column}, {basic_payment_column} FROM c",
+                    tuple(payment_params) + tuple(response_params),
+                )
+                checkout_response.pk, basic_payment.pk = cursor.fetchone()
+        except Exception:
+            checkout_response.basic_payment_id = None
+            raise
+        for instance in (basic_payment, checkout_response):
+            instance._state.adding = False
+            instance._state.db = self.db
+        checkout_response.basic_payment = basic_payment
+
+
+def _insert_sql(connection, model, instance, returning_fields: list) -> tuple:
+    """
+    the INSERT statement Model.save() would run for `instance`, with a RETURNING clause
+    """
+    fields = [field for field in model._meta.local_concrete_fields if field is not model._meta.auto_field]
+    query = InsertQuery(model)
+    query.insert_values(fields, [instance])
+    compiler = query.get_compiler(connection=connection)
+    compiler.returning_fields = returning_fields
+    (sql, params), = compiler.as_sql()
+    return sql, params
+
+
+class VRPaymentPooledCheckoutQuerySet(QuerySet):
+    def available(self, bucket: str, entity_id: str, sandbox: bool, valid_for) -> QuerySet:
+        """
+        unclaimed checkouts of `bucket` that can still be paid for at least `valid_for` (timedelta)
+        """
+        return self.filter(
+            bucket=bucket,
+            claimed_at__isnull=True,
+            expires_at__gt=timezone.now() + valid_for,
+            basic_payment__entity_id=entity_id,
+            basic_payment__sandbox=sandbox,
+        )
+
+
+class VRPaymentPooledCheckoutManager(Manager.from_queryset(VRPaymentPooledCheckoutQuerySet)):
+    def claim(self, bucket: str, entity_id: str, sandbox: bool, valid_for):
+        """
+        take the available checkout of `bucket` expiring first out of the pool;
+        concurrent claims skip each other's rows instead of waiting
+        :return: the VRPaymentBasicPayment of the claimed checkout or None if the bucket is empty
+        """
+        with transaction.atomic(using=self.db):
+            pooled_checkout = (
+                self.available(bucket, entity_id, sandbox, valid_for)
+                .select_for_update(skip_locked=True, of=("self",))
+                .select_related("basic_payment__checkout_response")
+                .defer(*[f"basic_payment__checkout_response__{field}" for field in RAW_RESPONSE_FIELDS])
+                .order_by("expires_at")
+                .first()
+            )
+            if pooled_checkout is None:
+                return None
+            pooled_checkout.claimed_at = timezone.now()
+            pooled_checkout.save(update_fields=["claimed_at", "last_modified"])
+        return pooled_checkout.basic_payment
+
+
+class VRPaymentIdentifierManager(Manager):
+    def resolve(self, *identifiers):
+        """
+        the basic payment id of the first of `identifiers` that is known, from the in-process cache
+        or one primary key lookup
+        :return: basic payment id or None
+        """
+        identifiers = [identifier for identifier in identifiers if identifier]
+        for identifier in identifiers:
+            basic_payment_id = identifier_cache.get(identifier)
+            if basic_payment_id is not None:
+                return basic_payment_id
+        if not identifiers:
+            return None
+        found = dict(self.filter(pk__in=identifiers).values_list("identifier", "basic_payment_id"))
+        for identifier, basic_payment_id in found.items():
+            identifier_cache.set(identifier, basic_payment_id)
+        for identifier in identifiers:
+            if identifier in found:
+                return found[identifier]
+        return None
+
+    def resolve_many(self, candidates: list) -> list:
+        """
+        bulk version of resolve for many payloads, e.g. a batch of replayed webhooks, in two queries at most
+        :param candidates: list of (identifiers, merchant_transaction_id) tuples
+        :return: the basic payment id (or None) of each candidate
+        """
+        from .models import VRPaymentBasicPayment
+
+        identifiers = {identifier for ids, _ in candidates for identifier in ids if identifier}
+        found = (
+            dict(self.filter(pk__in=identifiers).values_list("identifier", "basic_payment_id"))
+            if identifiers
+            else {}
+        )
+        merchant_transaction_ids = {
+            merchant_transaction_id
+            for ids, merchant_transaction_id in candidates
+            if merchant_transaction_id and not any(identifier in found for identifier in ids)
+        }
+        found_by_merchant_transaction_id = (
+            dict(
+                VRPaymentBasicPayment.objects.filter(merchant_transaction_id__in=merchant_transaction_ids)
+                .values_list("merchant_transaction_id", "pk")
+            )
+            if merchant_transaction_ids
+            else {}
+        )
+        resolved = []
+        for ids, merchant_transaction_id in candidates:
+            basic_payment_id = next((found[identifier] for identifier in ids if identifier in found), None)
+            if basic_payment_id is None:
+                basic_payment_id = found_by_merchant_transaction_id.get(merchant_transaction_id)
+            resolved.append(basic_payment_id)
+        return resolved
+
+    def register(self, responses):
+        """
+        map the vr_pay_id and reference_id of saved responses to their basic payment; known ids are kept
+        """
+        identifiers = {}
+        for response in responses:
+            if response is None or not response.basic_payment_id:
+                continue
+            for identifier in (response.vr_pay_id, response.reference_id):
+                if identifier:
+                    identifiers.setdefault(identifier, response.basic_payment_id)
+        if identifiers:
+            self.bulk_create(
+                [
+                    self.model(identifier=identifier, basic_payment_id=basic_payment_id)
+                    for identifier, basic_payment_id in identifiers.items()
+                ],
+                ignore_conflicts=True,
+            )
+
+
+class VRPaymentAPIResponseQuerySet(QuerySet):
+    def with_raw(self) -> QuerySet:
+        """
+        load the raw json columns as well
+        """
+        return self.defer(None)
+
+    def annotate_status_category(self, name: str = "status_category") -> QuerySet:
+        """
+        annotate the status category of result_code (one of STATUS_CATEGORIES), computed in the database
+        """
+        return self.annotate(**{name: status_category_expression()})
+
+    def filter_successfully_processed_all(self) -> QuerySet:
+        return self.filter(
+            Q(result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_REGEX)
+            | Q(
+                result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX
+            )
+        )
+
+    def filter_successfully_processed(self) -> QuerySet:
+        return self.filter(result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_REGEX)
+
+    def filter_successfully_processed_needs_review(self) -> QuerySet:
+        return self.filter(
+            result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX
+        )
+
+    def filter_pending_all(self) -> QuerySet:
+        return self.filter(
+            Q(result_code__regex=TRANSACTION_PENDING_REGEX)
+            | Q(result_code__regex=TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX)
+        )
+
+    def filter_pending(self) -> QuerySet:
+        return self.filter(result_code__regex=TRANSACTION_PENDING_REGEX)
+
+    def filter_pending_might_change(self) -> QuerySet:
+        return self.filter(
+            result_code__regex=TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX
+        )
 
-    def filter(self, *args, **kwargs):
-        return super().select_related("checkout_response").filter(*args, **kwargs)
 
+class VRPaymentAPIResponseManger(Manager.from_queryset(VRPaymentAPIResponseQuerySet)):
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().defer(*RAW_RESPONSE_FIELDS)
 
-class VRPaymentAPIResponseManger(Manager):
     def create_from_response(
         self, response, basic_payment=None,
     ):
+        from .models import VRPaymentIdentifier
+
+        vr_response = self.build_from_response(response, basic_payment=basic_payment)
+        if vr_response is not None:
+            with transaction.atomic(using=self.db):
+                vr_response.save(using=self.db)
+                VRPaymentIdentifier.objects.db_manager(self.db).register([vr_response])
+                self._record_status([vr_response])
+                self._record_status_events([vr_response])
+                self._publish_status(vr_response)
+        return vr_response
+
+    def _record_status(self, vr_responses: list):
+        from .models import VRPaymentBasicPaymentStatusResponse, VRPaymentDailyRollup
+
+        if settings.VR_PAYMENT_DAILY_ROLLUP and self.model is VRPaymentBasicPaymentStatusResponse:
+            VRPaymentDailyRollup.objects.db_manager(self.db).record_status_responses(vr_responses)
+
+    def _record_status_events(self, vr_responses: list):
+        from .models import VRPaymentBasicPaymentStatusResponse, VRPaymentStatusEvent, VRPaymentWebhookPaymentPayload
+
+        if settings.VR_PAYMENT_STATUS_EVENTS and self.model in (
+            VRPaymentBasicPaymentStatusResponse,
+            VRPaymentWebhookPaymentPayload,
+        ):
+            VRPaymentStatusEvent.objects.db_manager(self.db).record_status_changes(vr_responses)
+
+    def _publish_status(self, vr_response):
+        from .models import VRPaymentBasicPaymentStatusResponse, VRPaymentWebhookPaymentPayload
+
+        if self.model in (VRPaymentBasicPaymentStatusResponse, VRPaymentWebhookPaymentPayload):
+            publish_status(vr_response, using=self.db)
+
+    def create_from_webhook(self, webhook, url: str = ""):
+        """
+        save the payload of a payment webhook, resolved to its basic payment by its ids
+        :param url: the url the webhook was sent to
+        :return: the saved payload, or None if no basic payment is known for it
+        """
+        from .models import VRPaymentIdentifier
+
+        vr_response = self.build_from_webhook(webhook, url=url)
+        if vr_response is None:
+            return None
+        with transaction.atomic(using=self.db):
+            vr_response.save(using=self.db)
+            VRPaymentIdentifier.objects.db_manager(self.db).register([vr_response])
+            self._record_status_events([vr_response])
+            self._publish_status(vr_response)
+        return vr_response
+
+    def build_from_webhook(self, webhook, url: str = "", basic_payment_id: int = None):
+        """
+        same as create_from_webhook but without saving
+        :param basic_payment_id: (optional) skip looking up the basic payment, e.g. if resolved in bulk already
+        """
+        payload = (webhook.body or {}).get("payload")
+        if not payload:
+            return None
+        vr_response = self.build_from_json(
+            dict(payload), status_code=200, url=url, headers=webhook.headers, basic_payment_id=basic_payment_id
+        )
+        if vr_response.basic_payment_id is None:
+            return None
+        vr_response.webhook = webhook
+        return vr_response
+
+    def bulk_create_from_json(self, response_jsons: list, url: str, headers: dict = None) -> list:
+        """
+        save the responses of `response_jsons`, e.g. the payments of a transaction query, that are not saved yet,
+        i.e. whose (vr_pay_id, result_code) is unknown, with one bulk insert. The responses are resolved to their
+        basic payments in bulk (see VRPaymentIdentifierManager.resolve_many); unknown payments are skipped.
+        :return: the saved responses
+        """
+        from .models import VRPaymentIdentifier
+
+        identifiers = VRPaymentIdentifier.objects.db_manager(self.db)
+        basic_payment_ids = identifiers.resolve_many(
+            [
+                (
+                    (response_json.get("id"), response_json.get("referencedId")),
+                    response_json.get("merchantTransactionId"),
+                )
+                for response_json in response_jsons
+            ]
+        )
+        known = set(
+            self.model._base_manager.using(self.db)
+            .filter(vr_pay_id__in={response_json.get("id") for response_json in response_jsons} - {None})
+            .values_list("vr_pay_id", "result_code")
+        )
+        vr_responses = []
+        for response_json, basic_payment_id in zip(response_jsons, basic_payment_ids):
+            key = (response_json.get("id"), (response_json.get("result") or {}).get("code"))
+            if basic_payment_id is None or key in known:
+                continue
+            known.add(key)
+            vr_responses.append(
+                self.build_from_json(
+                    dict(response_json),
+                    status_code=200,
+                    url=url,
+                    headers=headers or {},
+                    basic_payment_id=basic_payment_id,
+                )
+            )
+        with transaction.atomic(using=self.db):
+            self.bulk_create(vr_responses)
+            self.record_bulk_created(vr_responses)
+        return vr_responses
+
+    def record_bulk_created(self, vr_responses: list):
+        """
+        what saving a single response does besides the insert, for responses saved with bulk_create:
+        register their ids, count them in the daily rollup, record the status events and publish their status;
+        call it in the transaction of the insert
+        """
+        from .models import VRPaymentIdentifier
+
+        VRPaymentIdentifier.objects.db_manager(self.db).register(vr_responses)
+        self._record_status(vr_responses)
+        self._record_status_events(vr_responses)
+        for vr_response in vr_responses:
+            self._publish_status(vr_response)
+
+    def build_from_response(
+        self, response, basic_payment=None,
+    ):
+        """
+        same as create_from_response but without saving, e.g. to bulk_create many responses at once
+        """
         try:
             response_json = response.json()
         except json.JSONDecodeError as ex:
-            logger.error("VRPaymentAPIResponseManger response could not be parsed as JSON!", ex, response)
+            logger.error(f"VRPaymentAPIResponseManger response could not be parsed as JSON: {ex} ({response})")
             return None
+        return self.build_from_json(
+            response_json,
+            status_code=response.status_code,
+            url=response.url,
+            headers=dict(response.headers),
+            basic_payment=basic_payment,
+        )
+
+    @staticmethod
+    def get_own_transaction(payments: list, payment_type: str = None) -> dict:
+        """
+        the transaction of the payment itself among all transactions of a merchant transaction id: the latest
+        one of `payment_type`, else the latest one that does not reference another transaction (a refund,
+        capture or chargeback does), else the latest one
+        """
+        own = [payment for payment in payments if payment_type and payment.get("paymentType") == payment_type]
+        own = own or [payment for payment in payments if not payment.get("referencedId")]
+        return max(own or payments, key=lambda payment: payment.get("timestamp") or "")
+
+    def build_from_json(
+        self,
+        response_json: dict,
+        status_code: int,
+        url: str,
+        headers: dict,
+        basic_payment=None,
+        basic_payment_id: int = None,
+    ):
+        """
+        build an unsaved response from its parsed json, see build_from_response.
+        Without `basic_payment` or `basic_payment_id` it is looked up by the ids in the json,
+        see VRPaymentIdentifierManager.resolve.
+        """
+        # response_json is altered below; save the raw json!
+        raw_content = json.loads(json.dumps(response_json))
         if "payments" in response_json:
-            # querying the transaction status can return several payments, but we currently only support one
-            assert len(response_json["payments"]) == 1, "too many payments in response"
-            response_json.update(response_json["payments"].pop())
-        vr_pay_id=response_json.get("id")
-        reference_id = response_json.get("referencedId"),
+            # querying by merchantTransactionId returns all transactions of the payment, e.g. its capture or refund;
+            # its status is the one of the payment's own transaction, the others are kept in the raw content only
+            payments = response_json.pop("payments")
+            if payments:
+                response_json.update(
+                    self.get_own_transaction(payments, basic_payment.payment_type if basic_payment else None)
+                )
+        vr_pay_id = response_json.get("id")
+        reference_id = response_json.get("referencedId")
         merchant_transaction_id = response_json.get("merchantTransactionId", basic_payment.merchant_transaction_id if basic_payment else None)
-        if not basic_payment:
-            from .models import VRPaymentBasicPayment
-            try:
-                basic_payment = VRPaymentBasicPayment.objects.get(Q(
-                    Q(vr_pay_id=vr_pay_id) |
-                    Q(merchant_transaction_id=merchant_transaction_id) |
-                    Q(reference_id=reference_id))
+        if basic_payment:
+            basic_payment_id = basic_payment.pk
+        else:
+            from .models import VRPaymentBasicPayment, VRPaymentIdentifier
+
+            if basic_payment_id is None:
+                basic_payment_id = VRPaymentIdentifier.objects.resolve(vr_pay_id, reference_id)
+            if basic_payment_id is None and merchant_transaction_id:
+                # not seen before, e.g. the first webhook of a payment
+                basic_payment_id = (
+                    VRPaymentBasicPayment.objects.filter(merchant_transaction_id=merchant_transaction_id)
+                    .values_list("pk", flat=True)
+                    .first()
+                )
+            if basic_payment_id is None:
+                logger.warning(f"no {VRPaymentBasicPayment._meta.verbose_name} found for vr_pay_id: '{vr_pay_id}'")
+            elif not merchant_transaction_id:
+                merchant_transaction_id = (
+                    VRPaymentBasicPayment.objects.filter(pk=basic_payment_id)
+                    .values_list("merchant_transaction_id", flat=True)
+                    .first()
                 )
-            except MultipleObjectsReturned:
-                basic_payment = VRPaymentBasicPayment.objects.get(merchant_transaction_id=merchant_transaction_id)
-            except ObjectDoesNotExist:
-                logger.warning(f"no {VRPaymentBasicPayment.Meta.verbose_name} found for vr_pay_id: '{vr_pay_id}'")
         vr_response = self.model(
             basic_payment=basic_payment,
-            http_status_code=response.status_code,
-            url=response.url,
-            raw_headers=json.dumps(dict(response.headers)),
-            raw_content=response.json(),  # response_json might have been altered already; save the raw json!
+            http_status_code=status_code,
+            url=url,
             build_number=response_json.get("buildNumber"),
             ndc=response_json.get("ndc"),
             vr_pay_id=vr_pay_id,
@@ -119,41 +701,237 @@ class VRPaymentAPIResponseManger(Manager):
             merchant_transaction_id=merchant_transaction_id,
             other=response_json.get("Other"),
         )
-        vr_response.save()
+        if basic_payment is None:
+            vr_response.basic_payment_id = basic_payment_id
+        vr_response.set_raw_payload(headers, raw_content)
         return vr_response
 
-    def filter_successfully_processed_all(self) -> QuerySet:
-        return self.filter(
-            Q(result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_REGEX)
-            | Q(
-                result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX
-            )
+
+def get_rollup_key(day, entity_id: str, payment_brand: str, currency: str, payment_type: str, status_category: str):
+    """
+    the key of a VRPaymentDailyRollup row, as hashable tuple of (field, value); the same for the rows recorded
+    per status response and the rebuilt ones
+    """
+    return (
+        ("day", day),
+        ("entity_id", entity_id),
+        ("payment_brand", payment_brand or ""),
+        ("currency", currency),
+        ("payment_type", payment_type),
+        ("status_category", status_category),
+    )
+
+
+class VRPaymentDailyRollupManager(Manager):
+    def increment(self, key: dict, count: int = 1, amount=0):
+        """
+        add to the row of `key`, creating it if needed
+        """
+        updated = self.filter(**key).update(
+            count=F("count") + count, amount=F("amount") + amount, last_modified=timezone.now()
         )
+        if updated:
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(count=count, amount=amount, **key)
+        except IntegrityError:
+            # created concurrently
+            self.filter(**key).update(
+                count=F("count") + count, amount=F("amount") + amount, last_modified=timezone.now()
+            )
 
-    def filter_successfully_processed(self) -> QuerySet:
-        return self.filter(result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_REGEX)
+    def record_status_response(self, status_response):
+        """
+        count the payment of a just saved status response if its status category differs from the previous one
+        """
+        self.record_status_responses([status_response])
 
-    def filter_successfully_processed_needs_review(self) -> QuerySet:
-        return self.filter(
-            result_code__regex=TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX
+    def record_status_responses(self, status_responses: list):
+        """
+        record_status_response for several just saved status responses (in order), e.g. of one bulk insert:
+        the previous status of their payments is read in one query
+        """
+        from .models import VRPaymentBasicPayment
+
+        status_responses = [status_response for status_response in status_responses if status_response.basic_payment_id]
+        if not status_responses:
+            return
+        if all(status_response.pk for status_response in status_responses):
+            before_batch = Q(pk__lt=min(status_response.pk for status_response in status_responses))
+        else:
+            # bulk_create did not return the primary keys
+            before_batch = Q(created_at__lt=min(status_response.created_at for status_response in status_responses))
+        previous_response = (
+            type(status_responses[0])
+            ._base_manager.filter(before_batch, basic_payment=OuterRef("pk"))
+            .order_by("-pk")
+            .values("result_code")[:1]
         )
+        basic_payments = {
+            basic_payment["pk"]: basic_payment
+            for basic_payment in VRPaymentBasicPayment._base_manager.using(self.db)
+            .filter(pk__in={status_response.basic_payment_id for status_response in status_responses})
+            .annotate(previous_result_code=Subquery(previous_response))
+            .values("pk", "entity_id", "payment_brand", "currency", "payment_type", "amount", "previous_result_code")
+        }
+        status_categories = {
+            pk: classify_result_code(basic_payment["previous_result_code"])
+            for pk, basic_payment in basic_payments.items()
+        }
+        totals = {}
+        for status_response in status_responses:
+            basic_payment = basic_payments[status_response.basic_payment_id]
+            status_category = classify_result_code(status_response.result_code)
+            if status_category == status_categories[basic_payment["pk"]]:
+                continue
+            status_categories[basic_payment["pk"]] = status_category
+            key = get_rollup_key(
+                timezone.localdate(status_response.created_at),
+                basic_payment["entity_id"],
+                status_response.payment_brand or basic_payment["payment_brand"],
+                basic_payment["currency"],
+                basic_payment["payment_type"],
+                status_category,
+            )
+            count, amount = totals.get(key, (0, 0))
+            totals[key] = count + 1, amount + basic_payment["amount"]
+        for key, (count, amount) in totals.items():
+            self.increment(dict(key), count=count, amount=amount)
 
-    def filter_pending_all(self) -> QuerySet:
-        return self.filter(
-            Q(result_code__regex=TRANSACTION_PENDING_REGEX)
-            | Q(result_code__regex=TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX)
+    def aggregate_status_changes(self, day: datetime.date) -> QuerySet:
+        """
+        the rows of `day` computed from the status responses of that day, see record_status_response
+        """
+        from .models import VRPaymentBasicPaymentStatusResponse
+
+        start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        end = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+        previous_response = VRPaymentBasicPaymentStatusResponse._base_manager.filter(
+            basic_payment=OuterRef("basic_payment"), pk__lt=OuterRef("pk")
+        ).order_by("-pk")
+        return (
+            VRPaymentBasicPaymentStatusResponse._base_manager.using(self.db)
+            .filter(created_at__gte=start, created_at__lt=end)
+            .annotate(previous_result_code=Subquery(previous_response.values("result_code")[:1]))
+            .annotate(
+                status_category=status_category_expression(),
+                previous_status_category=status_category_expression("previous_result_code"),
+            )
+            .exclude(status_category=F("previous_status_category"))
+            .values(
+                "status_category",
+                entity_id=F("basic_payment__entity_id"),
+                # an empty brand is no brand, as in record_status_responses
+                brand=Coalesce(NullIf("payment_brand", Value("")), NullIf("basic_payment__payment_brand", Value(""))),
+                payment_currency=F("basic_payment__currency"),
+                type=F("basic_payment__payment_type"),
+            )
+            .annotate(count=Count("pk"), amount=Sum("basic_payment__amount"))
+            .order_by()
         )
 
-    def filter_pending(self) -> QuerySet:
-        return self.filter(result_code__regex=TRANSACTION_PENDING_REGEX)
+    def rebuild(self, day: datetime.date) -> int:
+        """
+        replace the rows of `day` with the ones computed from the status responses
+        :return: number of rows
+        """
+        rows = [
+            self.model(
+                count=row["count"],
+                amount=row["amount"] or 0,
+                **dict(
+                    get_rollup_key(
+                        day,
+                        row["entity_id"],
+                        row["brand"],
+                        row["payment_currency"],
+                        row["type"],
+                        row["status_category"],
+                    )
+                ),
+            )
+            for row in self.aggregate_status_changes(day)
+        ]
+        with transaction.atomic(using=self.db):
+            self.filter(day=day).delete()
+            self.bulk_create(rows)
+        return len(rows)
 
-    def filter_pending_might_change(self) -> QuerySet:
-        return self.filter(
-            result_code__regex=TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX
+
+class VRPaymentStatusEventManager(Manager):
+    def record_status_changes(self, vr_responses: list) -> list:
+        """
+        write an event for every just saved status response or webhook payload of `vr_responses` (in order) that
+        changes the status category of its payment, i.e. whose category differs from the payment's latest event.
+        Responses with an unknown status category change nothing.
+        :return: the written events
+        """
+        from .models import VRPaymentBasicPayment
+
+        vr_responses = [vr_response for vr_response in vr_responses if vr_response.basic_payment_id]
+        if not vr_responses:
+            return []
+        basic_payment_ids = {vr_response.basic_payment_id for vr_response in vr_responses}
+        # concurrent changes of a payment (e.g. a webhook and a status query) wait for each other,
+        # the latest events are read after the lock is taken
+        list(
+            VRPaymentBasicPayment._base_manager.using(self.db)
+            .select_for_update()
+            .filter(pk__in=basic_payment_ids)
+            .order_by("pk")
+            .values_list("pk")
+        )
+        latest_event = self.model._base_manager.filter(basic_payment=OuterRef("pk")).order_by("-pk")
+        status_categories = dict(
+            VRPaymentBasicPayment._base_manager.using(self.db)
+            .filter(pk__in=basic_payment_ids)
+            .annotate(latest_status_category=Subquery(latest_event.values("status_category")[:1]))
+            .values_list("pk", "latest_status_category")
+        )
+        events = []
+        for vr_response in vr_responses:
+            status_category = classify_result_code(vr_response.result_code)
+            previous_status_category = status_categories.get(vr_response.basic_payment_id) or STATUS_UNKNOWN
+            if status_category == STATUS_UNKNOWN or status_category == previous_status_category:
+                continue
+            status_categories[vr_response.basic_payment_id] = status_category
+            events.append(
+                self.model(
+                    basic_payment_id=vr_response.basic_payment_id,
+                    previous_status_category=previous_status_category,
+                    status_category=status_category,
+                    result_code=vr_response.result_code or "",
+                    source=vr_response._meta.model_name,
+                    source_id=vr_response.pk,
+                )
+            )
+        return self.bulk_create(events)
+
+    def pending(self, created_before, max_attempts: int) -> QuerySet:
+        """
+        events to send now: not dispatched yet, created before `created_before`, sent less than `max_attempts`
+        times and neither claimed by a dispatcher nor waiting for a retry; oldest first
+        """
+        return (
+            self.filter(dispatched_at__isnull=True, created_at__lt=created_before, attempts__lt=max_attempts)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+            .order_by("pk")
         )
 
 
-class VRPaymentWebhookManager(Manager):
+class VRPaymentWebhookQuerySet(QuerySet):
+    def with_raw(self) -> QuerySet:
+        """
+        load the headers and the decrypted body as well
+        """
+        return self.defer(None)
+
+
+class VRPaymentWebhookManager(Manager.from_queryset(VRPaymentWebhookQuerySet)):
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().defer(*RAW_WEBHOOK_FIELDS)
+
     def create_from_request(self, config_key: str, request: Request):
         header_dict = dict(request.headers)
 
@@ -165,12 +943,20 @@ class VRPaymentWebhookManager(Manager):
         )
         body_json = json.loads(decrypted_payload.decode(("utf8")))
         webhook = self.model(
-            raw_headers=json.dumps(header_dict),
             webhook_type=body_json.get("type").lower(),
             webhook_action=body_json.get("action").lower()
             if "action " in body_json
             else None,
-            decrypted_body=body_json,
         )
-        webhook.save()
+        webhook.set_raw_payload(header_dict, body_json)
+        with transaction.atomic(using=self.db):
+            webhook.save(using=self.db)
+            if webhook.webhook_type == "payment":
+                from .models import VRPaymentWebhookPaymentPayload
+
+                payload = VRPaymentWebhookPaymentPayload.objects.create_from_webhook(
+                    webhook, url=request.build_absolute_uri()
+                )
+                if payload is None:
+                    logger.warning(f"payment webhook {webhook.pk} does not belong to a known payment")
         return webhook
@@ -0,0 +1,53 @@
+# Generated by Django 3.1.3 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+from .. import settings
+
+
+def partition_status_responses(apps, schema_editor):
+    if not settings.VR_PAYMENT_PARTITION_STATUS_RESPONSES:
+        return
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from ..utils.partitioning import partition_status_responses as partition
+
+    partition(
+        apps.get_model('django_vr_payment', 'VRPaymentBasicPaymentStatusResponse'),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0002_add_webhooks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VRPaymentArchivedRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_modified', models.DateTimeField(auto_now=True, verbose_name='Last modified')),
+                ('archived_model', models.CharField(help_text='app_label.model_name of the archived row', max_length=128, verbose_name='Archived model')),
+                ('archived_pk', models.IntegerField(help_text='primary key of the archived row', verbose_name='Archived primary key')),
+                ('archived_created_at', models.DateTimeField(help_text='created_at of the archived row', verbose_name='Archived created at')),
+                ('content', models.BinaryField(help_text='the archived row as zlib compressed json', verbose_name='Content')),
+            ],
+            options={
+                'verbose_name': 'VR Payment Archived Record',
+                'verbose_name_plural': 'VR Payment Archived Records',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentarchivedrecord',
+            index=models.Index(fields=['archived_model', 'archived_pk'], name='django_vr_p_archive_273c34_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentarchivedrecord',
+            index=models.Index(fields=['archived_created_at'], name='django_vr_p_archive_120f4b_idx'),
+        ),
+        migrations.RunPython(partition_status_responses, migrations.RunPython.noop),
+    ]
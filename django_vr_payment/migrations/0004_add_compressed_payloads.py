@@ -0,0 +1,96 @@
+# Generated by Django 3.1.3 on 2026-10-19 11:02
+
+from ..fields import JSONField
+
+from django.db import migrations
+import django_vr_payment.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0003_add_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            name='raw_headers',
+            field=JSONField(blank=True, help_text='response header as json', null=True, verbose_name='Headers'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            name='raw_content',
+            field=JSONField(blank=True, help_text='response content as json', null=True, verbose_name='Content'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            name='compressed_headers',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response header as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed headers'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            name='compressed_content',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response content as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed content'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentcheckoutresponse',
+            name='raw_headers',
+            field=JSONField(blank=True, help_text='response header as json', null=True, verbose_name='Headers'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentcheckoutresponse',
+            name='raw_content',
+            field=JSONField(blank=True, help_text='response content as json', null=True, verbose_name='Content'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentcheckoutresponse',
+            name='compressed_headers',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response header as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed headers'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentcheckoutresponse',
+            name='compressed_content',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response content as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed content'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentwebhookpaymentpayload',
+            name='raw_headers',
+            field=JSONField(blank=True, help_text='response header as json', null=True, verbose_name='Headers'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentwebhookpaymentpayload',
+            name='raw_content',
+            field=JSONField(blank=True, help_text='response content as json', null=True, verbose_name='Content'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentwebhookpaymentpayload',
+            name='compressed_headers',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response header as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed headers'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentwebhookpaymentpayload',
+            name='compressed_content',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response content as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed content'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentwebhook',
+            name='raw_headers',
+            field=JSONField(blank=True, help_text='response header as json', null=True, verbose_name='Headers'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentwebhook',
+            name='decrypted_body',
+            field=JSONField(blank=True, help_text='The decrypted request.body in JSON', null=True, verbose_name='Decrypted body'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentwebhook',
+            name='compressed_headers',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='response header as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed headers'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentwebhook',
+            name='compressed_body',
+            field=django_vr_payment.fields.CompressedJSONField(blank=True, help_text='The decrypted request.body as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)', null=True, verbose_name='Compressed decrypted body'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.3 on 2026-10-19 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0004_add_compressed_payloads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VRPaymentPooledCheckout',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_modified', models.DateTimeField(auto_now=True, verbose_name='Last modified')),
+                ('bucket', models.CharField(help_text='<amount>-<currency>-<payment type>', max_length=64, verbose_name='Bucket')),
+                ('expires_at', models.DateTimeField(help_text='the checkout can not be paid after this time', verbose_name='Expires at')),
+                ('claimed_at', models.DateTimeField(blank=True, help_text='when the checkout was taken from the pool', null=True, verbose_name='Claimed at')),
+                ('basic_payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pooled_checkout', to='django_vr_payment.vrpaymentbasicpayment', verbose_name='VR Payment Basic Payment Checkout')),
+            ],
+            options={
+                'verbose_name': 'VR Payment Pooled Checkout',
+                'verbose_name_plural': 'VR Payment Pooled Checkouts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentpooledcheckout',
+            index=models.Index(condition=models.Q(claimed_at__isnull=True), fields=['bucket', 'expires_at'], name='django_vr_p_pool_available_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.1.3 on 2026-10-19 14:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 2000
+
+
+def backfill_identifiers(apps, schema_editor):
+    """
+    map the ids of all existing responses, checkout responses first (the first basic payment an id was seen with wins)
+    """
+    VRPaymentIdentifier = apps.get_model('django_vr_payment', 'VRPaymentIdentifier')
+    db_alias = schema_editor.connection.alias
+    for model_name in ('VRPaymentCheckoutResponse', 'VRPaymentBasicPaymentStatusResponse', 'VRPaymentWebhookPaymentPayload'):
+        model = apps.get_model('django_vr_payment', model_name)
+        rows = model.objects.using(db_alias).order_by('pk').values_list('vr_pay_id', 'reference_id', 'basic_payment_id')
+        identifiers = []
+        for vr_pay_id, reference_id, basic_payment_id in rows.iterator(chunk_size=BATCH_SIZE):
+            for identifier in (vr_pay_id, reference_id):
+                if identifier:
+                    identifiers.append(VRPaymentIdentifier(identifier=identifier, basic_payment_id=basic_payment_id))
+            if len(identifiers) >= BATCH_SIZE:
+                VRPaymentIdentifier.objects.using(db_alias).bulk_create(identifiers, ignore_conflicts=True)
+                identifiers = []
+        VRPaymentIdentifier.objects.using(db_alias).bulk_create(identifiers, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0005_add_checkout_pool'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VRPaymentIdentifier',
+            fields=[
+                ('identifier', models.CharField(help_text='VR Pay id of a checkout or payment', max_length=48, primary_key=True, serialize=False, verbose_name='Identifier')),
+                ('basic_payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiers', to='django_vr_payment.vrpaymentbasicpayment', verbose_name='VR Payment Basic Payment Checkout')),
+            ],
+            options={
+                'verbose_name': 'VR Payment Identifier',
+                'verbose_name_plural': 'VR Payment Identifiers',
+            },
+        ),
+        migrations.RunPython(backfill_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.3 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0006_add_identifiers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VRPaymentDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_modified', models.DateTimeField(auto_now=True, verbose_name='Last modified')),
+                ('day', models.DateField(help_text='day the status response was received (current time zone)', verbose_name='Day')),
+                ('entity_id', models.CharField(max_length=32, verbose_name='Entity ID')),
+                ('payment_brand', models.CharField(blank=True, default='', max_length=32, verbose_name='Payment brand')),
+                ('currency', models.CharField(max_length=3, verbose_name='Currency')),
+                ('payment_type', models.CharField(max_length=2, verbose_name='Payment type')),
+                ('status_category', models.CharField(help_text='see utils.transaction_status.STATUS_CATEGORIES', max_length=64, verbose_name='Status category')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Amount')),
+            ],
+            options={
+                'verbose_name': 'VR Payment Daily Rollup',
+                'verbose_name_plural': 'VR Payment Daily Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='vrpaymentdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'entity_id', 'payment_brand', 'currency', 'payment_type', 'status_category'), name='django_vr_p_rollup_key_uniq'),
+        ),
+    ]
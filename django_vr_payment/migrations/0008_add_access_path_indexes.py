@@ -0,0 +1,74 @@
+# Generated by Django 3.1.3 on 2026-10-19 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0007_add_daily_rollup'),
+    ]
+
+    operations = [
+        # merchant_transaction_id and merchant_invoice_id are unique, i.e. indexed twice
+        migrations.RemoveIndex(
+            model_name='vrpaymentbasicpayment',
+            name='django_vr_p_merchan_fe8f32_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vrpaymentbasicpayment',
+            name='django_vr_p_merchan_106324_idx',
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentbasicpayment',
+            index=models.Index(fields=['created_at'], name='django_vr_p_pay_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            index=models.Index(fields=['basic_payment', '-id'], name='django_vr_p_status_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            index=models.Index(fields=['vr_pay_id'], name='django_vr_p_status_vr_pay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            index=models.Index(fields=['result_code'], name='django_vr_p_status_result_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            index=models.Index(fields=['created_at'], name='django_vr_p_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            index=models.Index(condition=models.Q(('result_code__startswith', '000.200'), ('result_code__startswith', '100.400.500'), ('result_code__startswith', '800.400.5'), _connector='OR'), fields=['created_at', 'basic_payment'], name='django_vr_p_status_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentcheckoutresponse',
+            index=models.Index(fields=['vr_pay_id'], name='django_vr_p_chk_vr_pay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentwebhookpaymentpayload',
+            index=models.Index(fields=['basic_payment', '-id'], name='django_vr_p_hook_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentwebhookpaymentpayload',
+            index=models.Index(fields=['vr_pay_id'], name='django_vr_p_hook_vr_pay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentwebhookpaymentpayload',
+            index=models.Index(fields=['result_code'], name='django_vr_p_hook_result_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        # the single column indexes of the foreign keys are prefixes of the *_latest_idx indexes
+        migrations.AlterField(
+            model_name='vrpaymentbasicpaymentstatusresponse',
+            name='basic_payment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='payment_responses', to='django_vr_payment.vrpaymentbasicpayment', verbose_name='VR Payment Basic Checkouts'),
+        ),
+        migrations.AlterField(
+            model_name='vrpaymentwebhookpaymentpayload',
+            name='basic_payment',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='webhook_responses', to='django_vr_payment.vrpaymentbasicpayment', verbose_name='VR Payment Basic Checkouts'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.1.3 on 2026-10-19 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0008_add_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VRPaymentStatusEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_modified', models.DateTimeField(auto_now=True, verbose_name='Last modified')),
+                ('previous_status_category', models.CharField(help_text='see utils.transaction_status.STATUS_CATEGORIES', max_length=64, verbose_name='Previous status category')),
+                ('status_category', models.CharField(help_text='see utils.transaction_status.STATUS_CATEGORIES', max_length=64, verbose_name='Status category')),
+                ('result_code', models.CharField(blank=True, default='', max_length=11, verbose_name='VR Payment status code')),
+                ('source', models.CharField(help_text='model name of the status response or webhook payload', max_length=64, verbose_name='Source')),
+                ('source_id', models.BigIntegerField(blank=True, null=True, verbose_name='Source ID')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Dispatched at')),
+                ('basic_payment', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='django_vr_payment.vrpaymentbasicpayment', verbose_name='VR Payment Basic Payment Checkout')),
+            ],
+            options={
+                'verbose_name': 'VR Payment Status Event',
+                'verbose_name_plural': 'VR Payment Status Events',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentstatusevent',
+            index=models.Index(fields=['basic_payment', '-id'], name='django_vr_p_event_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vrpaymentstatusevent',
+            index=models.Index(condition=models.Q(dispatched_at__isnull=True), fields=['id'], name='django_vr_p_event_pending_idx'),
+        ),
+    ]
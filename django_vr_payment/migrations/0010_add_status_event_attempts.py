@@ -0,0 +1,23 @@
+# Generated by Django 3.1.3 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0009_add_status_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vrpaymentstatusevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='number of times it was sent', verbose_name='Attempts'),
+        ),
+        migrations.AddField(
+            model_name='vrpaymentstatusevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='not sent before this time: claimed by a dispatcher or waiting for a retry', null=True, verbose_name='Next attempt at'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.1.3 on 2026-10-19 21:10
+
+import json
+
+from django.db import migrations, models
+
+from django_vr_payment.utils.webhooks import get_content_hash
+
+BATCH_SIZE = 2000
+
+
+def backfill_content_hashes(apps, schema_editor):
+    """
+    hash the stored webhooks like VRPaymentWebhook.set_raw_payload, so replaying them again skips them
+    """
+    VRPaymentWebhook = apps.get_model('django_vr_payment', 'VRPaymentWebhook')
+    db_alias = schema_editor.connection.alias
+    webhooks = []
+    for webhook in VRPaymentWebhook.objects.using(db_alias).order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        headers = webhook.raw_headers if webhook.raw_headers is not None else webhook.compressed_headers
+        if isinstance(headers, str):
+            # raw_headers holds a json dump
+            headers = json.loads(headers)
+        body = webhook.decrypted_body if webhook.decrypted_body is not None else webhook.compressed_body
+        webhook.content_hash = get_content_hash(headers, body)
+        webhooks.append(webhook)
+        if len(webhooks) >= BATCH_SIZE:
+            VRPaymentWebhook.objects.using(db_alias).bulk_update(webhooks, ['content_hash'])
+            webhooks = []
+    VRPaymentWebhook.objects.using(db_alias).bulk_update(webhooks, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_vr_payment', '0010_add_status_event_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vrpaymentwebhook',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='sha256 of the headers and the decrypted body, identifies the webhook when replaying webhooks', max_length=64, null=True, verbose_name='Content hash'),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,25 @@
+from .archive import VRPaymentArchivedRecord
+from .events import VRPaymentStatusEvent
+from .identifier import VRPaymentIdentifier
 from .payment import (
     VRPaymentBasicPayment,
     VRPaymentBasicPaymentStatusResponse,
     VRPaymentCheckoutResponse,
     VRPaymentWebhookPaymentPayload,
 )
+from .pool import VRPaymentPooledCheckout
+from .rollup import VRPaymentDailyRollup
 from .webhooks import VRPaymentWebhook
 
 __all__ = [
+    "VRPaymentArchivedRecord",
     "VRPaymentBasicPayment",
     "VRPaymentBasicPaymentStatusResponse",
     "VRPaymentCheckoutResponse",
+    "VRPaymentDailyRollup",
+    "VRPaymentIdentifier",
+    "VRPaymentPooledCheckout",
+    "VRPaymentStatusEvent",
     "VRPaymentWebhookPaymentPayload",
     "VRPaymentWebhook",
 ]
@@ -0,0 +1,48 @@
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from .core import BaseModel
+
+
+class VRPaymentArchivedRecord(BaseModel):
+    """
+    a row moved out of one of the response/webhook tables by `vr_payment_archive`.
+    The original row is kept as zlib compressed json; created_at is the time of archival.
+    """
+
+    archived_model = models.CharField(
+        "Archived model",
+        help_text="app_label.model_name of the archived row",
+        max_length=128,
+    )
+    archived_pk = models.IntegerField(
+        "Archived primary key", help_text="primary key of the archived row"
+    )
+    archived_created_at = models.DateTimeField(
+        "Archived created at", help_text="created_at of the archived row"
+    )
+    content = models.BinaryField(
+        "Content", help_text="the archived row as zlib compressed json"
+    )
+
+    class Meta:
+        verbose_name = "VR Payment Archived Record"
+        verbose_name_plural = "VR Payment Archived Records"
+        indexes = [
+            models.Index(fields=["archived_model", "archived_pk"]),
+            models.Index(fields=["archived_created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.archived_model}[{self.archived_pk}]"
+
+    @staticmethod
+    def compress(row: dict) -> bytes:
+        return zlib.compress(json.dumps(row, cls=DjangoJSONEncoder).encode("utf8"))
+
+    @property
+    def data(self) -> dict:
+        return json.loads(zlib.decompress(bytes(self.content)).decode("utf8"))
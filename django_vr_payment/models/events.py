@@ -0,0 +1,58 @@
+from django.db import models
+from django.db.models import Q
+
+from .core import BaseModel
+from .payment import VRPaymentBasicPayment
+from ..managers import VRPaymentStatusEventManager
+
+
+class VRPaymentStatusEvent(BaseModel):
+    """
+    a change of the status category of a payment, written in the transaction of the status response or webhook
+    payload that changed it (transactional outbox) and sent to the receivers of signals.payment_status_changed
+    by `vr_payment_dispatch_events`; maintained with VR_PAYMENT_STATUS_EVENTS
+    """
+
+    basic_payment = models.ForeignKey(
+        VRPaymentBasicPayment,
+        on_delete=models.CASCADE,
+        related_name="status_events",
+        verbose_name=VRPaymentBasicPayment._meta.verbose_name,
+        db_index=False,  # covered by django_vr_p_event_latest_idx
+    )
+    previous_status_category = models.CharField(
+        "Previous status category", help_text="see utils.transaction_status.STATUS_CATEGORIES", max_length=64
+    )
+    status_category = models.CharField(
+        "Status category", help_text="see utils.transaction_status.STATUS_CATEGORIES", max_length=64
+    )
+    result_code = models.CharField("VR Payment status code", blank=True, default="", max_length=11)
+    source = models.CharField(
+        "Source", help_text="model name of the status response or webhook payload", max_length=64
+    )
+    source_id = models.BigIntegerField("Source ID", blank=True, null=True)
+    dispatched_at = models.DateTimeField("Dispatched at", blank=True, null=True)
+    attempts = models.PositiveIntegerField("Attempts", default=0, help_text="number of times it was sent")
+    next_attempt_at = models.DateTimeField(
+        "Next attempt at",
+        blank=True,
+        help_text="not sent before this time: claimed by a dispatcher or waiting for a retry",
+        null=True,
+    )
+
+    objects = VRPaymentStatusEventManager()
+
+    class Meta:
+        verbose_name = "VR Payment Status Event"
+        verbose_name_plural = "VR Payment Status Events"
+        indexes = [
+            # the latest event of a payment
+            models.Index(fields=["basic_payment", "-id"], name="django_vr_p_event_latest_idx"),
+            # the dispatcher's queue
+            models.Index(
+                fields=["id"], condition=Q(dispatched_at__isnull=True), name="django_vr_p_event_pending_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.basic_payment_id}: {self.previous_status_category} -> {self.status_category}"
@@ -0,0 +1,31 @@
+from django.db import models
+
+from .payment import VRPaymentBasicPayment
+from ..managers import VRPaymentIdentifierManager
+
+
+class VRPaymentIdentifier(models.Model):
+    """
+    maps every VR Pay id of a payment (checkout id, payment ids, referenced ids) to its basic payment,
+    so webhooks and status responses are resolved by one primary key lookup, see VRPaymentIdentifierManager.resolve.
+    Maintained when responses are saved; the first basic payment an id was seen with wins.
+    """
+
+    identifier = models.CharField(
+        "Identifier", help_text="VR Pay id of a checkout or payment", max_length=48, primary_key=True
+    )
+    basic_payment = models.ForeignKey(
+        VRPaymentBasicPayment,
+        on_delete=models.CASCADE,
+        related_name="identifiers",
+        verbose_name=VRPaymentBasicPayment._meta.verbose_name,
+    )
+
+    objects = VRPaymentIdentifierManager()
+
+    class Meta:
+        verbose_name = "VR Payment Identifier"
+        verbose_name_plural = "VR Payment Identifiers"
+
+    def __str__(self):
+        return f"{self.identifier} - {self.basic_payment_id}"
@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 
 try:
@@ -6,6 +8,9 @@ try:
 except ImportError:
     from django.contrib.postgres.fields import JSONField as BaseJSONField
 
+from .. import settings
+from ..fields import CompressedJSONField
+
 
 class APIResponseMixin(models.Model):
     http_status_code = models.IntegerField(
@@ -17,14 +22,49 @@ class APIResponseMixin(models.Model):
         help_text="request url")
     raw_headers = BaseJSONField(
         "Headers",
-        help_text="response header as json")
+        blank=True,
+        help_text="response header as json",
+        null=True)
     raw_content = BaseJSONField(
         "Content",
-        help_text="response content as json")
+        blank=True,
+        help_text="response content as json",
+        null=True)
+    compressed_headers = CompressedJSONField(
+        "Compressed headers",
+        blank=True,
+        help_text="response header as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)",
+        null=True)
+    compressed_content = CompressedJSONField(
+        "Compressed content",
+        blank=True,
+        help_text="response content as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)",
+        null=True)
 
     class Meta:
         abstract = True
 
+    def set_raw_payload(self, headers: dict, content):
+        """
+        store headers and content either as plain or as compressed json, see VR_PAYMENT_RAW_PAYLOAD_COMPRESSION
+        """
+        if settings.VR_PAYMENT_RAW_PAYLOAD_COMPRESSION:
+            self.compressed_headers = headers
+            self.compressed_content = content
+        else:
+            self.raw_headers = json.dumps(headers)
+            self.raw_content = content
+
+    @property
+    def headers(self) -> dict:
+        if self.raw_headers is not None:
+            return json.loads(self.raw_headers) if isinstance(self.raw_headers, str) else self.raw_headers
+        return self.compressed_headers
+
+    @property
+    def content(self):
+        return self.raw_content if self.raw_content is not None else self.compressed_content
+
 
 class VRPayApiResponseMixin(APIResponseMixin):
     build_number = models.CharField(
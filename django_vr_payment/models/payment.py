@@ -1,4 +1,4 @@
-from django.core.exceptions import MultipleObjectsReturned
+from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from django.core.validators import (
     MinLengthValidator,
     RegexValidator,
@@ -6,6 +6,7 @@ from django.core.validators import (
     MaxValueValidator,
 )
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from .core import BaseModel
@@ -20,8 +21,9 @@ from .webhooks import VRPaymentWebhook
 
 
 from ..fields import VRPaymentDecimalField, JSONField
-from ..managers import VRPaymentAPIResponseManger, VRPaymentBasicPaymentManager
+from ..managers import VRPaymentAPIResponseManger, VRPaymentBasicPaymentManager, status_category_q
 from ..utils.transaction_status import (
+    PENDING_STATUS_CATEGORIES,
     check_transaction_successful,
     check_transaction_pending,
     check_transaction_rejected,
@@ -109,10 +111,6 @@ class AbstractVRPaymentResponse(
 
     class Meta:
         abstract = True
-        indexes = [
-            models.Index(fields=["vr_pay_id"]),
-            models.Index(fields=["reference_id"]),
-        ]
 
     def __str__(self):
         return f"{self._meta.model_name}[{self.id}] - {self.http_status_code}"
@@ -150,6 +148,9 @@ class VRPaymentBasicPayment(BaseModel):
         (REVERSAL, _("Reversal")),
         (REFUND, _("Refund")),
     ]
+    # a checkout can be paid and its status retrieved for 30 minutes after its creation
+    CHECKOUT_VALIDITY = timezone.timedelta(minutes=30)
+
     entity_id = models.CharField(
         "Entity ID",
         blank=False,
@@ -262,17 +263,25 @@ class VRPaymentBasicPayment(BaseModel):
     class Meta:
         verbose_name = "VR Payment Basic Payment Checkout"
         verbose_name_plural = "VR Payment Basic Checkouts"
+        # merchant_transaction_id and merchant_invoice_id are unique, i.e. indexed already
         indexes = [
-            models.Index(fields=["merchant_transaction_id"]),
-            models.Index(fields=["merchant_invoice_id"]),
+            models.Index(fields=["created_at"], name="django_vr_p_pay_created_idx"),
         ]
 
     def __str__(self):
         return f"id: {self.id}, transaction_id: {self.merchant_transaction_id} ({self.amount} {self.currency})"
 
+    @property
+    def checkout_expires_at(self):
+        return self.created_at + self.CHECKOUT_VALIDITY
+
     @property
     def checkout_id(self):
-        return self.checkout_response.vr_pay_id
+        try:
+            return self.checkout_response.vr_pay_id
+        except ObjectDoesNotExist:
+            # the checkout response might have been archived already
+            return None
 
 
 class VRPaymentBasicPaymentStatusResponse(AbstractVRPaymentResponse):
@@ -281,11 +290,29 @@ class VRPaymentBasicPaymentStatusResponse(AbstractVRPaymentResponse):
         on_delete=models.CASCADE,
         related_name="payment_responses",
         verbose_name=VRPaymentBasicPayment._meta.verbose_name_plural,
+        db_index=False,  # covered by django_vr_p_status_latest_idx
     )
 
     class Meta:
         verbose_name = "VR Payment Payment Response"
         verbose_name_plural = "VR Payment Payment Responses"
+        indexes = [
+            # the latest status response of a payment
+            models.Index(fields=["basic_payment", "-id"], name="django_vr_p_status_latest_idx"),
+            models.Index(fields=["vr_pay_id"], name="django_vr_p_status_vr_pay_idx"),
+            # status_category_q prefix lookups (LIKE 'prefix%' needs the pattern opclass on PostgreSQL)
+            models.Index(
+                fields=["result_code"], name="django_vr_p_status_result_idx", opclasses=["varchar_pattern_ops"]
+            ),
+            # archiving and vr_payment_rollup
+            models.Index(fields=["created_at"], name="django_vr_p_status_created_idx"),
+            # payments with pending status responses, see utils.polling
+            models.Index(
+                fields=["created_at", "basic_payment"],
+                condition=status_category_q(*PENDING_STATUS_CATEGORIES),
+                name="django_vr_p_status_pending_idx",
+            ),
+        ]
 
 
 class VRPaymentCheckoutResponse(AbstractVRPaymentResponse):
@@ -299,6 +326,10 @@ class VRPaymentCheckoutResponse(AbstractVRPaymentResponse):
     class Meta:
         verbose_name = "VR Payment Checkout Reponse"
         verbose_name_plural = "VR Payment Checkout Reponses"
+        indexes = [
+            # VRPaymentReturnView looks payments up by checkout id
+            models.Index(fields=["vr_pay_id"], name="django_vr_p_chk_vr_pay_idx"),
+        ]
 
 
 class VRPaymentWebhookPaymentPayload(AbstractVRPaymentResponse):
@@ -307,6 +338,7 @@ class VRPaymentWebhookPaymentPayload(AbstractVRPaymentResponse):
         on_delete=models.CASCADE,
         related_name="webhook_responses",
         verbose_name=VRPaymentBasicPayment._meta.verbose_name_plural,
+        db_index=False,  # covered by django_vr_p_hook_latest_idx
     )
     webhook = models.OneToOneField(
         VRPaymentWebhook,
@@ -318,3 +350,10 @@ class VRPaymentWebhookPaymentPayload(AbstractVRPaymentResponse):
     class Meta:
         verbose_name = "VR Payment Webhook Payload"
         verbose_name_plural = "VR Payment Webhook Payloads"
+        indexes = [
+            models.Index(fields=["basic_payment", "-id"], name="django_vr_p_hook_latest_idx"),
+            models.Index(fields=["vr_pay_id"], name="django_vr_p_hook_vr_pay_idx"),
+            models.Index(
+                fields=["result_code"], name="django_vr_p_hook_result_idx", opclasses=["varchar_pattern_ops"]
+            ),
+        ]
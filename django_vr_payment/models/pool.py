@@ -0,0 +1,44 @@
+from django.db import models
+
+from .core import BaseModel
+from .payment import VRPaymentBasicPayment
+from ..managers import VRPaymentPooledCheckoutManager
+
+
+class VRPaymentPooledCheckout(BaseModel):
+    """
+    a checkout created ahead of time by `vr_payment_checkout_pool` for one of VR_PAYMENT_CHECKOUT_POOL_BUCKETS,
+    waiting to be claimed by utils.checkout_pool.claim_checkout
+    """
+
+    basic_payment = models.OneToOneField(
+        VRPaymentBasicPayment,
+        on_delete=models.CASCADE,
+        related_name="pooled_checkout",
+        verbose_name=VRPaymentBasicPayment._meta.verbose_name,
+    )
+    bucket = models.CharField(
+        "Bucket", help_text="<amount>-<currency>-<payment type>", max_length=64
+    )
+    expires_at = models.DateTimeField(
+        "Expires at", help_text="the checkout can not be paid after this time"
+    )
+    claimed_at = models.DateTimeField(
+        "Claimed at", blank=True, help_text="when the checkout was taken from the pool", null=True
+    )
+
+    objects = VRPaymentPooledCheckoutManager()
+
+    class Meta:
+        verbose_name = "VR Payment Pooled Checkout"
+        verbose_name_plural = "VR Payment Pooled Checkouts"
+        indexes = [
+            models.Index(
+                fields=["bucket", "expires_at"],
+                condition=models.Q(claimed_at__isnull=True),
+                name="django_vr_p_pool_available_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket} - {self.basic_payment_id}"
@@ -0,0 +1,38 @@
+from django.db import models
+
+from .core import BaseModel
+from ..managers import VRPaymentDailyRollupManager
+
+
+class VRPaymentDailyRollup(BaseModel):
+    """
+    number and amount of the payments that reached a status category on a day, per entity, brand, currency
+    and payment type. A payment is counted whenever a status response changes its status category,
+    see VRPaymentDailyRollupManager; maintained with VR_PAYMENT_DAILY_ROLLUP, rebuilt by `vr_payment_rollup`.
+    """
+
+    day = models.DateField("Day", help_text="day the status response was received (current time zone)")
+    entity_id = models.CharField("Entity ID", max_length=32)
+    payment_brand = models.CharField("Payment brand", blank=True, default="", max_length=32)
+    currency = models.CharField("Currency", max_length=3)
+    payment_type = models.CharField("Payment type", max_length=2)
+    status_category = models.CharField(
+        "Status category", help_text="see utils.transaction_status.STATUS_CATEGORIES", max_length=64
+    )
+    count = models.PositiveIntegerField("Count", default=0)
+    amount = models.DecimalField("Amount", decimal_places=2, default=0, max_digits=18)
+
+    objects = VRPaymentDailyRollupManager()
+
+    class Meta:
+        verbose_name = "VR Payment Daily Rollup"
+        verbose_name_plural = "VR Payment Daily Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "entity_id", "payment_brand", "currency", "payment_type", "status_category"],
+                name="django_vr_p_rollup_key_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status_category}: {self.count}"
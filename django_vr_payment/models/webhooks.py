@@ -1,14 +1,20 @@
+import json
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from ..fields import JSONField
+from .. import settings
+from ..fields import CompressedJSONField, JSONField
 from ..managers import VRPaymentWebhookManager
+from ..utils.webhooks import get_content_hash
 
 from .core import BaseModel
 
 
 class VRPaymentWebhook(BaseModel):
-    raw_headers = JSONField("Headers", help_text="response header as json")
+    raw_headers = JSONField(
+        "Headers", blank=True, help_text="response header as json", null=True
+    )
     webhook_type = models.CharField(
         "Webhook type",
         blank=False,
@@ -25,23 +31,52 @@ class VRPaymentWebhook(BaseModel):
     )
     decrypted_body = JSONField(
         "Decrypted body",
-        blank=False,
+        blank=True,
         help_text="The decrypted request.body in JSON",
-        null=False,
+        null=True,
+    )
+    compressed_headers = CompressedJSONField(
+        "Compressed headers",
+        blank=True,
+        help_text="response header as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)",
+        null=True,
+    )
+    compressed_body = CompressedJSONField(
+        "Compressed decrypted body",
+        blank=True,
+        help_text="The decrypted request.body as compressed json (VR_PAYMENT_RAW_PAYLOAD_COMPRESSION)",
+        null=True,
+    )
+    content_hash = models.CharField(
+        "Content hash",
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="sha256 of the headers and the decrypted body, identifies the webhook when replaying webhooks",
+        max_length=64,
+        null=True,
     )
 
     objects = VRPaymentWebhookManager()
 
-    def save(
-        self, force_insert=False, force_update=False, using=None, update_fields=None
-    ):
-        super().save(force_insert, force_update, using, update_fields)
-        if self.webhook_type == "payment":
-            if not self.payment_payload:
-                from django_vr_payment.models.payment import (
-                    VRPaymentWebhookPaymentPayload,
-                )
-
-                VRPaymentWebhookPaymentPayload.objects.create_from_response(
-                    self.decrypted_payload
-                )
+    def set_raw_payload(self, headers: dict, body):
+        """
+        store headers and body either as plain or as compressed json, see VR_PAYMENT_RAW_PAYLOAD_COMPRESSION
+        """
+        self.content_hash = get_content_hash(headers, body)
+        if settings.VR_PAYMENT_RAW_PAYLOAD_COMPRESSION:
+            self.compressed_headers = headers
+            self.compressed_body = body
+        else:
+            self.raw_headers = json.dumps(headers)
+            self.decrypted_body = body
+
+    @property
+    def headers(self) -> dict:
+        if self.raw_headers is not None:
+            return json.loads(self.raw_headers) if isinstance(self.raw_headers, str) else self.raw_headers
+        return self.compressed_headers
+
+    @property
+    def body(self):
+        return self.decrypted_body if self.decrypted_body is not None else self.compressed_body
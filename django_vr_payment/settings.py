@@ -1,43 +1,216 @@
-from django.conf import settings
+import sys
+import types
+
+from django.conf import settings as django_settings
+from django.core.signals import setting_changed
 
 DJANGO_VR_PAYMENT_VERSION = "0.2.8"
 
-# VR Payment Settings
-VR_PAYMENT_BEARER_TOKEN = getattr(
-    settings,
+"""
+app settings with their defaults; every value can be overridden in the django settings.
+
+The values are read from the django settings on first access only (importing this module does not load them)
+and cached until a `setting_changed` signal (e.g. override_settings in tests) invalidates them.
+Existing code keeps working with `settings.VR_PAYMENT_...`.
+"""
+
+DEFAULTS = {
+    # VR Payment Settings
+    "VR_PAYMENT_BEARER_TOKEN": "OGE4Mjk0MTc0ZTczNWQwYzAxNGU3OGJlYjZjNTE1NGZ8Y1RaakFtOWM4Nw==",
+    "VR_PAYMENT_ENTITY_ID": "8a8294174e735d0c014e78beb6b9154b",
+    # from https://vr-pay-ecommerce.docs.oppwa.com/tutorials/webhooks/decryption-example
+    "VR_PAYMENT_CONFIG_KEY": "000102030405060708090a0b0c0d0e0f000102030405060708090a0b0c0d0e0f",
+    "VR_PAYMENT_SANDBOX": True,
+    "VR_PAYMENT_TEST_URL": "https://test.vr-pay-ecommerce.de/",
+    "VR_PAYMENT_LIVE_URL": "https://vr-pay-ecommerce.de/",
+    # settings per entity id, e.g. {"<entity id>": {"VR_PAYMENT_BEARER_TOKEN": "...", "VR_PAYMENT_SANDBOX": False}},
+    # see VRPaymentSettings.for_entity
+    "VR_PAYMENT_ENTITY_PROFILES": {},
+    # number of keep-alive connections kept open to the VR Payment host
+    "VR_PAYMENT_CONNECTION_POOL_SIZE": 10,
+    # max requests per second and burst size per entity of the wrappers of wrapper.registry, None for no limit
+    "VR_PAYMENT_RATE_LIMIT": None,
+    "VR_PAYMENT_RATE_LIMIT_BURST": None,
+    # warm up when django starts: create the shared wrappers of wrapper.registry, prime the result code classifier
+    # and, with VR_PAYMENT_WARM_UP_CONNECT, connect to the VR Payment hosts in a background thread
+    "VR_PAYMENT_WARM_UP": False,
+    "VR_PAYMENT_WARM_UP_CONNECT": True,
+    # seconds the readiness view reuses its last check of the VR Payment hosts
+    "VR_PAYMENT_READINESS_PROBE_INTERVAL": 10,
+    # number of VR Pay ids per process whose basic payment is kept in memory, see VRPaymentIdentifier
+    "VR_PAYMENT_IDENTIFIER_CACHE_SIZE": 10000,
+    # count status changes in VRPaymentDailyRollup when a status response is saved, see `vr_payment_rollup`
+    "VR_PAYMENT_DAILY_ROLLUP": False,
+    # write a VRPaymentStatusEvent when a status response or webhook payload changes the status category of a payment,
+    # sent to the receivers of signals.payment_status_changed by `vr_payment_dispatch_events`
+    "VR_PAYMENT_STATUS_EVENTS": False,
+    # seconds `vr_payment_dispatch_events` holds back new events, changes of a payment within them are coalesced
+    "VR_PAYMENT_STATUS_EVENT_WINDOW": 5,
+    # how create_checkout saves the payment and its checkout response: "atomic" (one transaction)
+    # or "single_statement" (one INSERT ... WITH statement on PostgreSQL, "atomic" on other databases)
+    "VR_PAYMENT_CHECKOUT_PERSISTENCE": "atomic",
+    # Checkout Page Settings
+    # payment brands shown by the payment widget (data-brands)
+    "VR_PAYMENT_CHECKOUT_BRANDS": "VISA MASTER AMEX",
+    # preconnect/dns-prefetch/preload hints for the widget host, in the html and as Link header
+    "VR_PAYMENT_CHECKOUT_RESOURCE_HINTS": False,
+    # Internal Settings
+    "VR_PAYMENT_SHOPPER_RESULT_URL_NAME": "vr-payment:return",
+    "VR_PAYMENT_ERROR_URL_NAME": "vr-payment:status-error",
+    "VR_PAYMENT_REJECTED_URL_NAME": "vr-payment:status-rejected",
+    "VR_PAYMENT_PENDING_URL_NAME": "vr-payment:status-pending",
+    "VR_PAYMENT_SUCCESS_URL_NAME": "vr-payment:status-success",
+    "VR_PAYMENT_STATUS_EVENTS_URL_NAME": "vr-payment:status-events",
+    # Archival Settings
+    "VR_PAYMENT_ARCHIVE_AFTER_DAYS": 180,
+    "VR_PAYMENT_ARCHIVE_BATCH_SIZE": 1000,
+    "VR_PAYMENT_ARCHIVE_DIR": None,
+    # range partition the status response table by created_at (PostgreSQL >= 11, new installs only)
+    "VR_PAYMENT_PARTITION_STATUS_RESPONSES": False,
+    # Raw Payload Compression Settings
+    # store raw headers/content compressed: None (plain json), "zlib" or "zstd" (requires zstandard)
+    "VR_PAYMENT_RAW_PAYLOAD_COMPRESSION": None,
+    "VR_PAYMENT_COMPRESSION_DICTIONARY": None,
+    # dictionary files used before, to read the rows compressed with them
+    "VR_PAYMENT_COMPRESSION_PREVIOUS_DICTIONARIES": [],
+    # Batch Checkout Settings
+    # concurrent checkout requests of VRPaymentWrapper.create_checkouts, defaults to the connection pool size
+    "VR_PAYMENT_BATCH_MAX_IN_FLIGHT": None,
+    "VR_PAYMENT_BATCH_CHUNK_SIZE": 500,
+    # Polling Settings, see `vr_payment_poll`
+    # max concurrent status queries
+    "VR_PAYMENT_POLL_MAX_IN_FLIGHT": 4,
+    # seconds until a pending payment is checked again, doubled after every pending answer up to the max
+    "VR_PAYMENT_POLL_INITIAL_DELAY": 60,
+    "VR_PAYMENT_POLL_MAX_DELAY": 3600,
+    # payments older than this are no longer polled
+    "VR_PAYMENT_POLL_MAX_AGE_DAYS": 7,
+    # seconds between two lookups of new pending payments
+    "VR_PAYMENT_POLL_REFRESH_INTERVAL": 60,
+    # Checkout Pool Settings
+    # checkouts created ahead of time by `vr_payment_checkout_pool`, e.g.
+    # [{"amount": "49.00", "currency": "EUR", "payment_type": "DB", "size": 20}]
+    "VR_PAYMENT_CHECKOUT_POOL_BUCKETS": [],
+    # a pooled checkout is only handed out if it can be paid for at least this many more minutes
+    "VR_PAYMENT_CHECKOUT_POOL_MIN_VALIDITY_MINUTES": 15,
+    "VR_PAYMENT_CHECKOUT_POOL_CACHE": "default",
+    # Status Push Settings, see utils/pubsub.py
+    # "local" (subscribers of the same process only) or "postgresql" (LISTEN/NOTIFY across processes)
+    "VR_PAYMENT_PUBSUB_BACKEND": "local",
+    # serve the status event streams (404 otherwise); every open stream keeps a worker thread busy
+    "VR_PAYMENT_STATUS_STREAM": False,
+    # max open status event streams per process, further requests get a 503
+    "VR_PAYMENT_STATUS_STREAM_MAX_OPEN": 10,
+    # seconds a signed status event stream url is valid, see VRPaymentStatusEventsView.get_url
+    "VR_PAYMENT_STATUS_STREAM_URL_MAX_AGE": 86400,
+    # seconds until a status event stream without a final status is closed, EventSource clients reconnect
+    "VR_PAYMENT_STATUS_STREAM_TIMEOUT": 300,
+    # seconds the return view waits for a successful or rejected webhook before querying VR Pay,
+    # None to query VR Pay right away (0 only checks for saved webhooks)
+    "VR_PAYMENT_RETURN_WEBHOOK_WAIT": None,
+}
+
+# settings a profile of VR_PAYMENT_ENTITY_PROFILES can override
+ENTITY_SETTINGS = (
     "VR_PAYMENT_BEARER_TOKEN",
-    "OGE4Mjk0MTc0ZTczNWQwYzAxNGU3OGJlYjZjNTE1NGZ8Y1RaakFtOWM4Nw==",
-)
-VR_PAYMENT_ENTITY_ID = getattr(
-    settings, "VR_PAYMENT_ENTITY_ID", "8a8294174e735d0c014e78beb6b9154b"
-)
-VR_PAYMENT_CONFIG_KEY = getattr(
-    settings,
-    "VR_PAYMENT_ENTITY_ID",
-    "000102030405060708090a0b0c0d0e0f000102030405060708090a0b0c0d0e0f",  # from https://vr-pay-ecommerce.docs.oppwa.com/tutorials/webhooks/decryption-example
-)
-VR_PAYMENT_SANDBOX = getattr(settings, "VR_PAYMENT_SANDBOX", True)
-VR_PAYMENT_TEST_URL = getattr(
-    settings, "VR_PAYMENT_TEST_URL", "https://test.vr-pay-ecommerce.de/"
-)
-VR_PAYMENT_LIVE_URL = getattr(
-    settings, "VR_PAYMENT_LIVE_URL", "https://vr-pay-ecommerce.de/"
+    "VR_PAYMENT_CONFIG_KEY",
+    "VR_PAYMENT_SANDBOX",
+    "VR_PAYMENT_TEST_URL",
+    "VR_PAYMENT_LIVE_URL",
+    "VR_PAYMENT_CHECKOUT_BRANDS",
+    "VR_PAYMENT_RATE_LIMIT",
+    "VR_PAYMENT_RATE_LIMIT_BURST",
 )
 
 
-# Internal Settings
-VR_PAYMENT_SHOPPER_RESULT_URL_NAME = getattr(
-    settings, "VR_PAYMENT_SHOPPER_RESULT_URL_NAME", "vr-payment:return"
-)
-VR_PAYMENT_ERROR_URL_NAME = getattr(
-    settings, "VR_PAYMENT_ERROR_URL_NAME", "vr-payment:status-error"
-)
-VR_PAYMENT_REJECTED_URL_NAME = getattr(
-    settings, "VR_PAYMENT_REJECTED_URL_NAME", "vr-payment:status-rejected"
-)
-VR_PAYMENT_PENDING_URL_NAME = getattr(
-    settings, "VR_PAYMENT_PENDING_URL_NAME", "vr-payment:status-pending"
-)
-VR_PAYMENT_SUCCESS_URL_NAME = getattr(
-    settings, "VR_PAYMENT_SUCCESS_URL_NAME", "vr-payment:status-success"
-)
+class UnknownEntityError(ValueError):
+    pass
+
+
+class VRPaymentSettings(object):
+    """
+    lazy access to the app settings: a value is looked up on first access and then cached as instance attribute
+    """
+
+    def __init__(self, defaults: dict = None, overrides: dict = None):
+        self._defaults = defaults if defaults is not None else DEFAULTS
+        self._overrides = overrides or {}
+        self._cached = set()
+        self._entities = {}
+
+    def __getattr__(self, name: str):
+        if name not in self._defaults:
+            raise AttributeError(f"unknown setting '{name}'")
+        if name in self._overrides:
+            value = self._overrides[name]
+        else:
+            value = getattr(django_settings, name, self._defaults[name])
+        setattr(self, name, value)
+        self._cached.add(name)
+        return value
+
+    def is_entity(self, entity_id: str) -> bool:
+        """
+        whether `entity_id` is VR_PAYMENT_ENTITY_ID or has a profile in VR_PAYMENT_ENTITY_PROFILES
+        """
+        return entity_id == self.VR_PAYMENT_ENTITY_ID or entity_id in self.VR_PAYMENT_ENTITY_PROFILES
+
+    def for_entity(self, entity_id: str, fallback: bool = False) -> "VRPaymentSettings":
+        """
+        the settings of `entity_id`: VR_PAYMENT_ENTITY_ID is `entity_id`, its profile of VR_PAYMENT_ENTITY_PROFILES
+        overrides ENTITY_SETTINGS and everything else falls back to these settings
+        :param fallback: return these settings for an entity id that is not configured (see is_entity)
+            instead of raising UnknownEntityError
+        """
+        try:
+            return self._entities[entity_id]
+        except KeyError:
+            pass
+        if not self.is_entity(entity_id):
+            # never cached, the id might come from a request
+            if fallback:
+                return self
+            raise UnknownEntityError(
+                f"entity '{entity_id}' is neither VR_PAYMENT_ENTITY_ID nor in VR_PAYMENT_ENTITY_PROFILES"
+            )
+        profile = self.VR_PAYMENT_ENTITY_PROFILES.get(entity_id, {})
+        unknown = set(profile) - set(ENTITY_SETTINGS)
+        if unknown:
+            raise ValueError(
+                f"VR_PAYMENT_ENTITY_PROFILES['{entity_id}'] can not override {', '.join(sorted(unknown))}"
+            )
+        overrides = dict(self._overrides, **profile)
+        overrides["VR_PAYMENT_ENTITY_ID"] = entity_id
+        entity_settings = VRPaymentSettings(self._defaults, overrides)
+        self._entities[entity_id] = entity_settings
+        return entity_settings
+
+    def reload(self):
+        for name in self._cached:
+            delattr(self, name)
+        self._cached = set()
+        self._entities = {}
+
+
+vr_payment_settings = VRPaymentSettings()
+
+
+def reload_settings(setting: str, **kwargs):
+    if setting in DEFAULTS:
+        vr_payment_settings.reload()
+
+
+setting_changed.connect(reload_settings)
+
+
+class _SettingsModule(types.ModuleType):
+    """
+    `settings.VR_PAYMENT_...` on this module reads from `vr_payment_settings`
+    (a module level __getattr__ needs python 3.7)
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(vr_payment_settings, name)
+
+
+sys.modules[__name__].__class__ = _SettingsModule
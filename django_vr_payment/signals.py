@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+"""
+signals of django_vr_payment
+"""
+
+# sent by `vr_payment_dispatch_events` (see utils.events.StatusEventDispatcher) with `events`, a list of
+# VRPaymentStatusEvent with their basic_payment, at most one per payment. If a receiver raises, the whole list
+# is sent again later, so receivers must be idempotent.
+payment_status_changed = Signal()
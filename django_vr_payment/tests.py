@@ -1,3 +1,646 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import get_script_prefix, set_script_prefix
+from django.utils import timezone
+
+from .admin import KEYSET_VAR, VRPaymentBasicPaymentAdmin
+from .managers import identifier_cache, status_category_q
+from .models import (
+    VRPaymentArchivedRecord,
+    VRPaymentBasicPayment,
+    VRPaymentBasicPaymentStatusResponse,
+    VRPaymentDailyRollup,
+    VRPaymentIdentifier,
+    VRPaymentPooledCheckout,
+    VRPaymentStatusEvent,
+    VRPaymentWebhook,
+    VRPaymentWebhookPaymentPayload,
+)
+from .utils import compression, polling
+from .utils.archive import TableArchiveWriter, archive_model, get_archivable_models
+from .utils.checkout_page import format_link_header, get_resource_hints, get_shopper_result_url
+from .utils.checkout_pool import purge_expired_checkouts
+from .utils.compression import CompressionError, compress_json, decompress_json
+from .utils.events import coalesce_events
+from .utils.replay import WebhookReplay
+from .utils.transaction_status import (
+    STATUS_CATEGORIES,
+    STATUS_CATEGORY_REGEXES,
+    STATUS_UNKNOWN,
+    classify_result_code,
+    regex_to_prefixes,
+)
+from .wrapper import VRPaymentWrapper
+from .wrapper.checkout import CheckoutError
+
+PAYLOAD = {
+    "id": "8ac7a4a1759d4f3e01759f1b2f1d6bd8",
+    "paymentType": "DB",
+    "amount": "92.00",
+    "currency": "EUR",
+    "result": {"code": "000.100.110", "description": "Request successfully processed"},
+}
+
+# result codes whose prefix also starts a prefix of a later status category
+OVERLAPPING_RESULT_CODES = ["100.380.401", "100.380.201", "100.370.111", "100.100.701", "100.900.500"]
+
+
+def create_basic_payment(merchant_transaction_id: str, payment_type: str = "DB") -> VRPaymentBasicPayment:
+    return VRPaymentBasicPayment.objects.create(
+        entity_id="8a8294174b7ecb28014b9699220015ca",
+        amount=Decimal("92.00"),
+        tax_amount=Decimal("0.00"),
+        currency="EUR",
+        payment_type=payment_type,
+        merchant_transaction_id=merchant_transaction_id,
+        sandbox=True,
+    )
+
+
+def get_status_response(basic_payment, result_code: str = None, **kwargs) -> VRPaymentBasicPaymentStatusResponse:
+    """
+    an unsaved status response, e.g. for bulk_create
+    """
+    return VRPaymentBasicPaymentStatusResponse(
+        basic_payment=basic_payment, http_status_code=200, result_code=result_code, **kwargs
+    )
+
+
+def get_api_response(content, status_code: int = 200, url: str = "https://test.vr-pay-ecommerce.de/v1/checkouts"):
+    """
+    a requests.Response of the VR Pay api; `content` is sent as json unless it is bytes
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response._content = content if isinstance(content, bytes) else json.dumps(content).encode()
+    return response
+
+
+def get_result_code(prefix: str, rng: random.Random) -> str:
+    """
+    a result code (ddd.ddd.ddd) starting with `prefix`
+    """
+    return prefix + "".join("." if index in (3, 7) else rng.choice("0123456789") for index in range(len(prefix), 11))
+
+
+class TransactionStatusTestCase(SimpleTestCase):
+    def classify_by_prefix(self, result_code: str) -> str:
+        for category, regex in STATUS_CATEGORY_REGEXES:
+            if any(result_code.startswith(prefix) for prefix in regex_to_prefixes(regex)):
+                return category
+        return STATUS_UNKNOWN
+
+    def test_regex_to_prefixes(self):
+        self.assertEqual(regex_to_prefixes(r"^(000\.[36])"), ("000.3", "000.6"))
+        self.assertEqual(regex_to_prefixes(r"^(100\.39[765])"), ("100.395", "100.396", "100.397"))
+        self.assertEqual(regex_to_prefixes(r"^(800\.1[1-3]0|999\.)"), ("800.110", "800.120", "800.130", "999."))
+
+    def test_prefixes_classify_like_regexes(self):
+        rng = random.Random(0)
+        prefixes = [prefix for _category, regex in STATUS_CATEGORY_REGEXES for prefix in regex_to_prefixes(regex)]
+        result_codes = [get_result_code(prefix, rng) for prefix in prefixes]
+        # random codes, mostly around the known prefixes
+        result_codes += [get_result_code(rng.choice(prefixes)[: rng.randint(0, 11)], rng) for _ in range(3000)]
+        for result_code in result_codes + OVERLAPPING_RESULT_CODES:
+            with self.subTest(result_code=result_code):
+                self.assertEqual(self.classify_by_prefix(result_code), classify_result_code(result_code))
+
+
+class StatusCategoryQueryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        basic_payment = create_basic_payment("status-category-0001")
+        result_codes = OVERLAPPING_RESULT_CODES + ["123.456.789"]
+        for _category, regex in STATUS_CATEGORY_REGEXES:
+            result_codes += [get_result_code(prefix, rng) for prefix in regex_to_prefixes(regex)]
+        VRPaymentBasicPaymentStatusResponse.objects.bulk_create(
+            [
+                get_status_response(basic_payment, result_code)
+                for result_code in result_codes
+            ]
+        )
+
+    def test_status_category_expression(self):
+        for result_code, status_category in VRPaymentBasicPaymentStatusResponse.objects.annotate_status_category(
+        ).values_list("result_code", "status_category"):
+            with self.subTest(result_code=result_code):
+                self.assertEqual(status_category, classify_result_code(result_code))
+
+    def test_status_category_q(self):
+        status_responses = VRPaymentBasicPaymentStatusResponse.objects.all()
+        for category in STATUS_CATEGORIES[:-1]:
+            with self.subTest(category=category):
+                self.assertEqual(
+                    set(status_responses.filter(status_category_q(category)).values_list("result_code", flat=True)),
+                    {
+                        result_code
+                        for result_code in status_responses.values_list("result_code", flat=True)
+                        if classify_result_code(result_code) == category
+                    },
+                )
+
+
+class IdentifierTestCase(TestCase):
+    def setUp(self):
+        identifier_cache.clear()
+        self.addCleanup(identifier_cache.clear)
+        self.basic_payment = create_basic_payment("identifier-0001")
+        VRPaymentIdentifier.objects.register(
+            [
+                get_status_response(self.basic_payment, vr_pay_id="payment-id", reference_id="checkout-id"),
+                None,
+            ]
+        )
+
+    def test_resolve(self):
+        self.assertEqual(VRPaymentIdentifier.objects.resolve("unknown", "checkout-id"), self.basic_payment.pk)
+        self.assertIsNone(VRPaymentIdentifier.objects.resolve("unknown", None))
+        # served from the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(VRPaymentIdentifier.objects.resolve("checkout-id"), self.basic_payment.pk)
+
+    def test_resolve_many(self):
+        with self.assertNumQueries(2):
+            resolved = VRPaymentIdentifier.objects.resolve_many(
+                [
+                    (("refund-id", "payment-id"), None),
+                    (("unknown",), "identifier-0001"),
+                    (("unknown",), "unknown"),
+                    ((None,), None),
+                ]
+            )
+        self.assertEqual(resolved, [self.basic_payment.pk, self.basic_payment.pk, None, None])
+
+    def test_register_keeps_known_identifiers(self):
+        other_payment = create_basic_payment("identifier-0002")
+        VRPaymentIdentifier.objects.register(
+            [get_status_response(other_payment, vr_pay_id="payment-id")]
+        )
+        self.assertEqual(VRPaymentIdentifier.objects.get(pk="payment-id").basic_payment_id, self.basic_payment.pk)
+
+
+    def test_purge_expired_checkouts(self):
+        for merchant_transaction_id, claimed_at in (("pool-expired", None), ("pool-claimed", timezone.now())):
+            basic_payment = create_basic_payment(merchant_transaction_id)
+            VRPaymentPooledCheckout.objects.create(
+                basic_payment=basic_payment,
+                bucket="92.00-EUR-DB",
+                expires_at=timezone.now() - timezone.timedelta(minutes=1),
+                claimed_at=claimed_at,
+            )
+            VRPaymentIdentifier.objects.register([get_status_response(basic_payment, reference_id=merchant_transaction_id)])
+            # cached
+            VRPaymentIdentifier.objects.resolve(merchant_transaction_id)
+        self.assertEqual(purge_expired_checkouts(), 1)
+        self.assertIsNone(identifier_cache.get("pool-expired"))
+        self.assertIsNone(VRPaymentIdentifier.objects.resolve("pool-expired"))
+        self.assertIsNotNone(VRPaymentIdentifier.objects.resolve("pool-claimed"))
+
+class KeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        for number in range(7):
+            create_basic_payment(f"keyset-{number:04d}", payment_type="PA" if number % 3 else "DB")
+
+    def get_changelist(self, query: str = ""):
+        model_admin = VRPaymentBasicPaymentAdmin(VRPaymentBasicPayment, AdminSite())
+        model_admin.list_per_page = 2
+        request = RequestFactory().get(f"/admin/django_vr_payment/vrpaymentbasicpayment/{query}")
+        request.user = self.user
+        return model_admin.get_changelist_instance(request)
+
+    def get_pages(self, query: str = "") -> list:
+        pages = []
+        changelist = self.get_changelist(query)
+        while True:
+            pages.append([basic_payment.pk for basic_payment in changelist.result_list])
+            if changelist.keyset_next_url is None:
+                return pages
+            self.assertIn(KEYSET_VAR, changelist.keyset_next_url)
+            changelist = self.get_changelist(changelist.keyset_next_url)
+
+    def test_pages(self):
+        pks = list(VRPaymentBasicPayment.objects.order_by("-pk").values_list("pk", flat=True))
+        pages = self.get_pages()
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual([pk for page in pages for pk in page], pks)
+
+    def test_pages_keep_filters(self):
+        pks = list(
+            VRPaymentBasicPayment.objects.filter(payment_type="PA").order_by("-pk").values_list("pk", flat=True)
+        )
+        pages = self.get_pages("?payment_type=PA")
+        self.assertEqual([pk for page in pages for pk in page], pks)
+
+    def test_other_ordering(self):
+        changelist = self.get_changelist("?o=2")
+        self.assertFalse(changelist.keyset_enabled)
+        self.assertEqual(len(changelist.result_list), 2)
+
+
+class StatusEventTestCase(TestCase):
+    def get_event(self, pk: int, basic_payment_id: int, previous_status_category: str, status_category: str):
+        return VRPaymentStatusEvent(
+            pk=pk,
+            basic_payment_id=basic_payment_id,
+            previous_status_category=previous_status_category,
+            status_category=status_category,
+        )
+
+    def test_coalesce_events(self):
+        events = [
+            self.get_event(1, 1, "unknown", "pending"),
+            self.get_event(2, 2, "pending", "rejected_bank"),
+            self.get_event(3, 1, "pending", "successfully_processed"),
+            self.get_event(4, 3, "successfully_processed", "chargeback_related"),
+            self.get_event(5, 3, "chargeback_related", "successfully_processed"),
+        ]
+        coalesced = coalesce_events(events)
+        self.assertEqual([event.pk for event in coalesced], [2, 3])
+        self.assertEqual(coalesced[1].previous_status_category, "unknown")
+        self.assertEqual(coalesced[1].status_category, "successfully_processed")
+
+    def test_record_status_changes(self):
+        basic_payment = create_basic_payment("status-event-0001")
+        status_responses = VRPaymentBasicPaymentStatusResponse.objects.bulk_create(
+            [
+                get_status_response(basic_payment, result_code)
+                for result_code in ["000.200.100", "000.200.000", "123.456.789", "000.000.000"]
+            ]
+        )
+        VRPaymentStatusEvent.objects.record_status_changes(status_responses)
+        # the same status category again changes nothing
+        VRPaymentStatusEvent.objects.record_status_changes(status_responses[-1:])
+        self.assertEqual(
+            list(
+                VRPaymentStatusEvent.objects.order_by("pk").values_list(
+                    "previous_status_category", "status_category", "result_code"
+                )
+            ),
+            [("unknown", "pending", "000.200.100"), ("pending", "successfully_processed", "000.000.000")],
+        )
+
+
+class BatchCheckoutTestCase(TestCase):
+    def call_api(self, url_append: str, method: str, data: dict = None, **kwargs):
+        merchant_transaction_id = data["merchantTransactionId"]
+        if merchant_transaction_id.endswith("rejected"):
+            result = {"code": "200.300.404", "description": "invalid or missing parameter"}
+            return get_api_response({"result": result}, status_code=400)
+        if merchant_transaction_id.endswith("unparsable"):
+            return get_api_response(b"<html>Bad Gateway</html>", status_code=502)
+        if merchant_transaction_id.endswith("failed"):
+            raise requests.ConnectionError("connection reset")
+        result = {"code": "000.200.100", "description": "successfully created checkout"}
+        return get_api_response({"id": f"checkout-{merchant_transaction_id}", "result": result})
+
+    def test_failed_checkouts(self):
+        wrapper = VRPaymentWrapper()
+        specs = [
+            {"amount": Decimal("10.00"), "payment_type": "DB", "merchant_transaction_id": f"batch-{name}"}
+            for name in ("created", "rejected", "unparsable", "failed", "created-too")
+        ]
+        with mock.patch.object(wrapper, "_call_api", self.call_api), self.assertLogs("django_vr_payment", "ERROR"):
+            results = wrapper.create_checkouts(specs, max_in_flight=2, chunk_size=2)
+        self.assertEqual([result.spec for result in results], specs)
+        self.assertEqual(
+            [type(result.error) for result in results],
+            [type(None), CheckoutError, CheckoutError, requests.ConnectionError, type(None)],
+        )
+        self.assertEqual(
+            set(VRPaymentBasicPayment.objects.values_list("merchant_transaction_id", flat=True)),
+            {"batch-created", "batch-created-too"},
+        )
+        for result in (results[0], results[4]):
+            self.assertEqual(result.basic_payment.checkout_id, f"checkout-{result.spec['merchant_transaction_id']}")
+
+
+class ArchiveTestCase(TestCase):
+    def create_webhook(self, basic_payment, created_at, payload_created_at):
+        webhook = VRPaymentWebhook(webhook_type="PAYMENT")
+        webhook.set_raw_payload({}, {"type": "PAYMENT", "payload": PAYLOAD})
+        webhook.save()
+        payload = VRPaymentWebhookPaymentPayload.objects.create(
+            basic_payment=basic_payment, webhook=webhook, http_status_code=200, result_code="000.100.110"
+        )
+        VRPaymentWebhook._base_manager.filter(pk=webhook.pk).update(created_at=created_at)
+        VRPaymentWebhookPaymentPayload._base_manager.filter(pk=payload.pk).update(created_at=payload_created_at)
+        return webhook, payload
+
+    def test_cascaded_rows_are_archived_first(self):
+        basic_payment = create_basic_payment("archive-0001")
+        before = timezone.now() - timezone.timedelta(days=30)
+        old = before - timezone.timedelta(days=1)
+        archived_webhook, archived_payload = self.create_webhook(basic_payment, old, old)
+        # e.g. re-derived from an old webhook by vr_payment_replay_webhooks
+        kept_webhook, kept_payload = self.create_webhook(basic_payment, old, before)
+
+        writer = TableArchiveWriter()
+        archived = [archive_model(model, before, writer) for model in get_archivable_models()]
+
+        self.assertEqual(archived, [1, 0, 0, 1])
+        self.assertEqual(
+            set(VRPaymentArchivedRecord.objects.values_list("archived_model", "archived_pk")),
+            {
+                (VRPaymentWebhookPaymentPayload._meta.label_lower, archived_payload.pk),
+                (VRPaymentWebhook._meta.label_lower, archived_webhook.pk),
+            },
+        )
+        self.assertTrue(VRPaymentWebhook._base_manager.filter(pk=kept_webhook.pk).exists())
+        self.assertTrue(VRPaymentWebhookPaymentPayload._base_manager.filter(pk=kept_payload.pk).exists())
+
+
+class WebhookReplayTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.basic_payment = create_basic_payment("replay-0001")
+
+    def write_export(self, bodies: list) -> str:
+        path = os.path.join(self.directory, "webhooks.jsonl")
+        with open(path, "w", encoding="utf8") as export:
+            export.writelines(json.dumps(body) + "\n" for body in bodies)
+        return path
+
+    def get_payment_webhook(self, result_code: str) -> dict:
+        return {
+            "type": "PAYMENT",
+            "payload": dict(
+                PAYLOAD, merchantTransactionId="replay-0001", result={"code": result_code, "description": ""}
+            ),
+        }
+
+    @override_settings(VR_PAYMENT_STATUS_EVENTS=True)
+    def test_status_events(self):
+        path = self.write_export([self.get_payment_webhook("000.200.000"), self.get_payment_webhook("000.100.110")])
+        with mock.patch("django_vr_payment.managers.publish_status") as publish_status:
+            stats = WebhookReplay(path, workers=1).run()
+        self.assertEqual(stats["replayed"], 2)
+        self.assertEqual(
+            list(
+                VRPaymentStatusEvent.objects.filter(basic_payment=self.basic_payment)
+                .order_by("pk")
+                .values_list("previous_status_category", "status_category", "source")
+            ),
+            [
+                ("unknown", "pending", "vrpaymentwebhookpaymentpayload"),
+                ("pending", "successfully_processed", "vrpaymentwebhookpaymentpayload"),
+            ],
+        )
+        self.assertEqual(
+            [args[0].result_code for args, _kwargs in publish_status.call_args_list], ["000.200.000", "000.100.110"]
+        )
+
+    def test_replay_twice(self):
+        registration_webhook = {
+            "type": "REGISTRATION",
+            "action": "CREATED",
+            "payload": {"id": "8ac7a4a1759d4f3e0175a0c2d3e47f01"},
+        }
+        unknown_payment_webhook = {
+            "type": "PAYMENT",
+            "payload": dict(PAYLOAD, id="8ac7a4a1759d4f3e0175a0c2d3e47f02", merchantTransactionId="replay-unknown"),
+        }
+        path = self.write_export(
+            [self.get_payment_webhook("000.100.110"), registration_webhook, registration_webhook, unknown_payment_webhook]
+        )
+        with mock.patch("django_vr_payment.managers.publish_status"):
+            stats = WebhookReplay(path, workers=1).run()
+            self.assertEqual((stats["replayed"], stats["skipped"]), (1, 2))
+            stats = WebhookReplay(path, workers=1).run()
+        self.assertEqual((stats["replayed"], stats["skipped"]), (0, 4))
+        self.assertEqual(
+            sorted(VRPaymentWebhook.objects.values_list("webhook_type", flat=True)), ["payment", "payment", "registration"]
+        )
+        self.assertEqual(VRPaymentWebhookPaymentPayload.objects.count(), 1)
+
+
+@override_settings(VR_PAYMENT_DAILY_ROLLUP=True)
+class DailyRollupTestCase(TestCase):
+    def get_rollup(self) -> set:
+        return set(
+            VRPaymentDailyRollup.objects.values_list(
+                "day", "entity_id", "payment_brand", "currency", "payment_type", "status_category", "count", "amount"
+            )
+        )
+
+    def get_response_json(self, basic_payment, result_code: str, payment_brand: str = None) -> dict:
+        return {
+            "id": f"{basic_payment.merchant_transaction_id}-{result_code}",
+            "merchantTransactionId": basic_payment.merchant_transaction_id,
+            "paymentBrand": payment_brand,
+            "result": {"code": result_code, "description": ""},
+        }
+
+    def test_incremental_equals_rebuild(self):
+        card_payment = create_basic_payment("rollup-0001")
+        VRPaymentBasicPayment.objects.filter(pk=card_payment.pk).update(payment_brand="VISA")
+        card_payment.refresh_from_db()
+        other_payment = create_basic_payment("rollup-0002", payment_type="PA")
+        bulk_payment = create_basic_payment("rollup-0003")
+
+        # one at a time
+        for payment_brand, result_code in ((None, "000.200.000"), ("", "000.100.110"), ("", "000.100.112")):
+            VRPaymentBasicPaymentStatusResponse.objects.create_from_response(
+                get_api_response(self.get_response_json(card_payment, result_code, payment_brand)),
+                basic_payment=card_payment,
+            )
+        # in bulk, e.g. by the transaction sync, several changes of a payment in one batch
+        VRPaymentBasicPaymentStatusResponse.objects.bulk_create_from_json(
+            [
+                self.get_response_json(other_payment, "000.200.000", "MASTER"),
+                self.get_response_json(bulk_payment, "000.200.000", ""),
+                self.get_response_json(other_payment, "800.100.151", "MASTER"),
+                self.get_response_json(bulk_payment, "000.100.110", "PAYPAL"),
+            ],
+            url="https://test.vr-pay-ecommerce.de/v1/query",
+        )
+        VRPaymentBasicPaymentStatusResponse.objects.bulk_create_from_json(
+            [self.get_response_json(bulk_payment, "000.100.112", "PAYPAL")],
+            url="https://test.vr-pay-ecommerce.de/v1/query",
+        )
+
+        incremental = self.get_rollup()
+        self.assertEqual(
+            {(row[2], row[4], row[5], row[6]) for row in incremental},
+            {
+                ("VISA", "DB", "pending", 1),
+                ("VISA", "DB", "successfully_processed", 1),
+                ("MASTER", "PA", "pending", 1),
+                ("MASTER", "PA", "rejected_bank", 1),
+                ("", "DB", "pending", 1),
+                ("PAYPAL", "DB", "successfully_processed", 1),
+            },
+        )
+        VRPaymentDailyRollup.objects.rebuild(timezone.localdate())
+        self.assertEqual(self.get_rollup(), incremental)
+
+
+class ReturnViewQueryTestCase(TestCase):
+    @override_settings(VR_PAYMENT_DAILY_ROLLUP=True, VR_PAYMENT_STATUS_EVENTS=True)
+    def test_status_query_reads_no_deferred_field(self):
+        create_basic_payment("return-view-0001")
+        basic_payment = VRPaymentBasicPayment.objects.for_return_view().get(merchant_transaction_id="return-view-0001")
+        deferred_fields = basic_payment.get_deferred_fields()
+        transactions = [
+            dict(PAYLOAD, merchantTransactionId="return-view-0001", timestamp="2026-10-01 10:00:00+0000"),
+            dict(
+                PAYLOAD,
+                id="8ac7a4a1759d4f3e01759f1b2f1d6bd9",
+                paymentType="RF",
+                referencedId=PAYLOAD["id"],
+                merchantTransactionId="return-view-0001",
+                timestamp="2026-10-02 10:00:00+0000",
+            ),
+        ]
+        wrapper = VRPaymentWrapper()
+        with mock.patch.object(wrapper, "_call_api", return_value=get_api_response({"payments": transactions})):
+            status_response = wrapper.get_transaction_by_merchant_transaction_id(basic_payment)
+        self.assertEqual(status_response.vr_pay_id, PAYLOAD["id"])
+        self.assertEqual(basic_payment.get_deferred_fields(), deferred_fields)
+
+
+class ExportCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            create_basic_payment(f"export-{number:04d}")
+
+    def test_csv(self):
+        stdout = io.StringIO()
+        call_command("vr_payment_export", stdout=stdout)
+        rows = list(csv.DictReader(io.StringIO(stdout.getvalue())))
+        self.assertEqual(
+            sorted(row["merchant_transaction_id"] for row in rows), ["export-0000", "export-0001", "export-0002"]
+        )
+
+    def test_jsonl_gzip(self):
+        stdout = io.BytesIO()
+        call_command("vr_payment_export", "--format", "jsonl", "--gzip", "--chunk-size", "2", stdout=stdout)
+        lines = gzip.decompress(stdout.getvalue()).decode("utf8").splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)["merchant_transaction_id"] for line in lines),
+            ["export-0000", "export-0001", "export-0002"],
+        )
+
+
+class TrainDictionaryCommandTestCase(TestCase):
+    def test_skip_rows_without_payload(self):
+        basic_payment = create_basic_payment("train-dictionary-0001")
+        status_responses = [get_status_response(basic_payment, "000.100.110") for _ in range(5)]
+        for status_response in status_responses[:2]:
+            status_response.set_raw_payload({"Content-Type": "application/json"}, PAYLOAD)
+        VRPaymentBasicPaymentStatusResponse.objects.bulk_create(status_responses)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        stdout = io.StringIO()
+        call_command(
+            "vr_payment_train_dictionary", os.path.join(directory.name, "payloads.dict"), samples=3, stdout=stdout
+        )
+        self.assertIn("trained on 4 payloads", stdout.getvalue())
+
+
+class PollerLockTestCase(TestCase):
+    def test_holds_lock_without_advisory_locks(self):
+        self.assertTrue(polling.holds_advisory_lock(polling.POLLER_LOCK_KEY))
+
+    def test_stop_on_lost_lock(self):
+        basic_payment = create_basic_payment("poller-lock")
+        get_status_response(basic_payment, result_code="000.200.000").save()
+        poller = polling.PendingPaymentPoller(max_in_flight=1)
+        with mock.patch.object(polling, "holds_advisory_lock", side_effect=[True, False]) as holds_advisory_lock:
+            with mock.patch.object(polling, "poll_payment", return_value="pending") as poll_payment:
+                with self.assertLogs("django_vr_payment", "WARNING"):
+                    poller.run(lock_key=polling.POLLER_LOCK_KEY)
+        self.assertTrue(poller.lock_lost)
+        self.assertEqual(holds_advisory_lock.call_count, 2)
+        poll_payment.assert_called_once_with(basic_payment.pk)
+
+
+class CheckoutPageTestCase(SimpleTestCase):
+    def test_resource_hints_are_opt_in(self):
+        self.assertEqual(get_resource_hints(True, "checkout-id"), [])
+
+    @override_settings(VR_PAYMENT_CHECKOUT_RESOURCE_HINTS=True, VR_PAYMENT_TEST_URL="https://test.vr-pay-ecommerce.de/")
+    def test_resource_hints(self):
+        resource_hints = get_resource_hints(True, "checkout-id")
+        self.assertEqual(
+            format_link_header(resource_hints),
+            "<https://test.vr-pay-ecommerce.de>; rel=preconnect, <https://test.vr-pay-ecommerce.de>; rel=dns-prefetch, "
+            "<https://test.vr-pay-ecommerce.de/v1/paymentWidgets.js?checkoutId=checkout-id>; rel=preload; as=script",
+        )
+
+    @override_settings(ALLOWED_HOSTS=["shop.example.com"])
+    def test_shopper_result_url_per_script_prefix(self):
+        request = RequestFactory().get("/", HTTP_HOST="shop.example.com")
+        script_prefix = get_script_prefix()
+        self.addCleanup(set_script_prefix, script_prefix)
+        url = get_shopper_result_url(request)
+        set_script_prefix("/shop/")
+        self.assertEqual(get_shopper_result_url(request), url.replace("shop.example.com/", "shop.example.com/shop/", 1))
+
+
+class CompressionTestCase(SimpleTestCase):
+    def setUp(self):
+        compression._dictionaries.clear()
+        self.addCleanup(compression._dictionaries.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_dictionary(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as dictionary_file:
+            dictionary_file.write(content)
+        return path
+
+    def test_round_trip(self):
+        codecs = ["zlib"] + (["zstd"] if compression.zstandard is not None else [])
+        for codec in codecs:
+            with self.subTest(codec=codec):
+                blob = compress_json(PAYLOAD, codec=codec)
+                self.assertEqual(decompress_json(blob), PAYLOAD)
+                self.assertEqual(decompress_json(memoryview(blob)), PAYLOAD)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(CompressionError):
+            compress_json(PAYLOAD, codec="lzma")
+
+    def test_previous_dictionary(self):
+        old_path = self.write_dictionary("old.dict", b'{"result": {"code": "000.000.000"}, "currency": "EUR"}')
+        new_path = self.write_dictionary("new.dict", b'{"paymentType": "PA", "amount": "10.00"}')
+        with override_settings(VR_PAYMENT_COMPRESSION_DICTIONARY=old_path):
+            blob = compress_json(PAYLOAD, codec="zlib")
+
+        # a restarted process that only knows the new dictionary
+        compression._dictionaries.clear()
+        with override_settings(VR_PAYMENT_COMPRESSION_DICTIONARY=new_path):
+            with self.assertRaises(CompressionError):
+                decompress_json(blob)
+
+        compression._dictionaries.clear()
+        with override_settings(
+            VR_PAYMENT_COMPRESSION_DICTIONARY=new_path, VR_PAYMENT_COMPRESSION_PREVIOUS_DICTIONARIES=[old_path]
+        ):
+            self.assertEqual(decompress_json(blob), PAYLOAD)
+            new_blob = compress_json(PAYLOAD, codec="zlib")
+            self.assertNotEqual(new_blob[: compression.HEADER_LENGTH], blob[: compression.HEADER_LENGTH])
+            self.assertEqual(decompress_json(new_blob), PAYLOAD)
@@ -44,5 +44,16 @@ urlpatterns = [
         ),
         name="status-error",
     ),
+    path(
+        "status/<str:token>/events/",
+        views.VRPaymentStatusEventsView.as_view(),
+        name="status-events",
+    ),
+    path("ready/", views.VRPaymentReadinessView.as_view(), name="ready"),
     path("webhooks/", views.VRPaymentWebhookView.as_view(), name="webhook"),
+    path(
+        "webhooks/<str:entity_id>/",
+        views.VRPaymentWebhookView.as_view(),
+        name="entity-webhook",
+    ),
 ]
@@ -0,0 +1,122 @@
+import gzip
+import json
+import logging
+import os
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+
+from ..fields import CompressedJSONField
+from .compression import decompress_json
+
+logger = logging.getLogger(__name__)
+
+
+def get_archivable_models() -> list:
+    """
+    models that can be archived, dependent models first,
+    so deleting a row never cascades into rows that have not been archived yet
+    """
+    from ..models import (
+        VRPaymentBasicPaymentStatusResponse,
+        VRPaymentCheckoutResponse,
+        VRPaymentWebhook,
+        VRPaymentWebhookPaymentPayload,
+    )
+
+    return [
+        VRPaymentWebhookPaymentPayload,
+        VRPaymentBasicPaymentStatusResponse,
+        VRPaymentCheckoutResponse,
+        VRPaymentWebhook,
+    ]
+
+
+class TableArchiveWriter(object):
+    """
+    writes archived rows as compressed json into VRPaymentArchivedRecord
+    """
+
+    def write(self, model, rows: list):
+        from ..models import VRPaymentArchivedRecord
+
+        VRPaymentArchivedRecord.objects.bulk_create(
+            [
+                VRPaymentArchivedRecord(
+                    archived_model=model._meta.label_lower,
+                    archived_pk=row["id"],
+                    archived_created_at=row["created_at"],
+                    content=VRPaymentArchivedRecord.compress(row),
+                )
+                for row in rows
+            ]
+        )
+
+    def close(self):
+        pass
+
+
+class JSONLGzipArchiveWriter(object):
+    """
+    writes archived rows as json lines into one <app_label.model_name>-<timestamp>.jsonl.gz file per model
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.timestamp = timezone.now().strftime("%Y%m%d%H%M%S")
+        self.files = {}
+
+    def get_path(self, model) -> str:
+        return os.path.join(
+            self.directory, f"{model._meta.label_lower}-{self.timestamp}.jsonl.gz"
+        )
+
+    def write(self, model, rows: list):
+        if model not in self.files:
+            os.makedirs(self.directory, exist_ok=True)
+            self.files[model] = gzip.open(self.get_path(model), "at", encoding="utf8")
+        archive_file = self.files[model]
+        for row in rows:
+            archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        # make sure the rows are on disk before they get deleted
+        archive_file.flush()
+
+    def close(self):
+        for archive_file in self.files.values():
+            archive_file.close()
+        self.files = {}
+
+
+def archive_model(model, before, writer, batch_size: int = 1000) -> int:
+    """
+    move all rows of `model` created before `before` into `writer`, `batch_size` rows per transaction.
+    Rows whose deletion would cascade into rows that are not archived by this cutoff, e.g. a webhook whose
+    payload was re-derived by vr_payment_replay_webhooks later on, are kept.
+    :return: number of archived rows
+    """
+    queryset = model._base_manager.filter(created_at__lt=before).order_by("pk")
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            queryset = queryset.exclude(**{f"{relation.name}__created_at__gte": before})
+    compressed_fields = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if isinstance(field, CompressedJSONField)
+    ]
+    archived = 0
+    while True:
+        rows = list(queryset.values()[:batch_size])
+        if not rows:
+            break
+        for row in rows:
+            # archive rows are self-contained json
+            for field_name in compressed_fields:
+                if row[field_name] is not None:
+                    row[field_name] = decompress_json(row[field_name])
+        with transaction.atomic():
+            writer.write(model, rows)
+            model._base_manager.filter(pk__in=[row["id"] for row in rows]).delete()
+        archived += len(rows)
+        logger.debug(f"archived {archived} {model._meta.verbose_name_plural}")
+    return archived
@@ -0,0 +1,93 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils.translation import get_language
+
+from .. import settings
+
+"""
+urls and resource hints of the checkout page
+
+Everything that does not depend on the checkout is computed once per host (shopper result url)
+or per VR Payment url (widget host) instead of on every request.
+"""
+
+
+def get_vr_payment_url(sandbox: bool, entity_id: str = None) -> str:
+    entity_settings = settings.for_entity(entity_id, fallback=True) if entity_id else settings
+    return entity_settings.VR_PAYMENT_TEST_URL if sandbox else entity_settings.VR_PAYMENT_LIVE_URL
+
+
+@lru_cache(maxsize=16)
+def _get_origin(url: str) -> str:
+    url = urlsplit(url)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def get_widget_origin(sandbox: bool, entity_id: str = None) -> str:
+    """
+    scheme and host serving paymentWidgets.js, e.g. https://test.vr-pay-ecommerce.de
+    """
+    return _get_origin(get_vr_payment_url(sandbox, entity_id))
+
+
+def get_widget_url(sandbox: bool, checkout_id: str, entity_id: str = None) -> str:
+    return f"{get_vr_payment_url(sandbox, entity_id)}v1/paymentWidgets.js?checkoutId={checkout_id}"
+
+
+@lru_cache(maxsize=64)
+def _get_absolute_url(scheme: str, host: str, url_name: str, script_prefix: str, language: str, urlconf) -> str:
+    # script_prefix, language and urlconf only key the cache: reverse() reads them from the current thread
+    return f"{scheme}://{host}{reverse(url_name, urlconf=urlconf)}"
+
+
+@receiver(setting_changed)
+def clear_url_cache(setting: str, **kwargs):
+    if setting == "ROOT_URLCONF":
+        _get_absolute_url.cache_clear()
+
+
+def get_shopper_result_url(request) -> str:
+    """
+    absolute VR_PAYMENT_SHOPPER_RESULT_URL_NAME url, cached per scheme, host, script prefix, language and urlconf
+    """
+    return _get_absolute_url(
+        request.scheme,
+        request.get_host(),
+        settings.VR_PAYMENT_SHOPPER_RESULT_URL_NAME,
+        get_script_prefix(),
+        get_language(),
+        get_urlconf(),
+    )
+
+
+def get_resource_hints(sandbox: bool, checkout_id: str, entity_id: str = None) -> list:
+    """
+    let the browser connect to the widget host and fetch paymentWidgets.js as early as possible
+    :return: list of dicts with rel, href and optionally as
+    """
+    if not settings.VR_PAYMENT_CHECKOUT_RESOURCE_HINTS:
+        return []
+    origin = get_widget_origin(sandbox, entity_id)
+    # all without CORS like the <script> of the widget, so the browser uses the preconnected connection
+    return [
+        {"rel": "preconnect", "href": origin},
+        {"rel": "dns-prefetch", "href": origin},
+        {"rel": "preload", "href": get_widget_url(sandbox, checkout_id, entity_id), "as": "script"},
+    ]
+
+
+def format_link_header(resource_hints: list) -> str:
+    """
+    resource hints as value of an HTTP Link header, so they work before the html is parsed (or with 103 Early Hints)
+    """
+    links = []
+    for hint in resource_hints:
+        link = f"<{hint['href']}>; rel={hint['rel']}"
+        if hint.get("as"):
+            link += f"; as={hint['as']}"
+        links.append(link)
+    return ", ".join(links)
@@ -0,0 +1,190 @@
+import logging
+import uuid
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .. import settings
+
+"""
+pool of checkouts created ahead of time, so the checkout page does not wait for `POST /v1/checkouts`
+
+`vr_payment_checkout_pool` keeps VR_PAYMENT_CHECKOUT_POOL_BUCKETS filled, `claim_checkout` takes a checkout
+out of the pool and falls back to creating one if the bucket is empty. Hits and misses are counted in the cache.
+"""
+
+logger = logging.getLogger(__name__)
+
+POOL_MERCHANT_TRANSACTION_ID_PREFIX = "pool-"
+
+
+def get_bucket(amount, currency: str = "EUR", payment_type: str = "DB") -> str:
+    return f"{Decimal(amount):.2f}-{currency}-{payment_type}"
+
+
+def get_pool_buckets() -> list:
+    """
+    :return: VR_PAYMENT_CHECKOUT_POOL_BUCKETS with defaults and their bucket key
+    """
+    buckets = []
+    for config in settings.VR_PAYMENT_CHECKOUT_POOL_BUCKETS:
+        bucket = {"currency": "EUR", "payment_type": "DB", "size": 10}
+        bucket.update(config)
+        bucket["amount"] = Decimal(bucket["amount"])
+        bucket["key"] = get_bucket(bucket["amount"], bucket["currency"], bucket["payment_type"])
+        buckets.append(bucket)
+    return buckets
+
+
+def generate_merchant_transaction_id() -> str:
+    return f"{POOL_MERCHANT_TRANSACTION_ID_PREFIX}{uuid.uuid4().hex}"
+
+
+def get_min_validity():
+    return timezone.timedelta(minutes=settings.VR_PAYMENT_CHECKOUT_POOL_MIN_VALIDITY_MINUTES)
+
+
+def _get_counter_key(bucket: str, counter: str) -> str:
+    return f"vr_payment:checkout_pool:{bucket}:{counter}"
+
+
+def record_claim(bucket: str, hit: bool):
+    cache = caches[settings.VR_PAYMENT_CHECKOUT_POOL_CACHE]
+    key = _get_counter_key(bucket, "hits" if hit else "misses")
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted in between
+        cache.add(key, 1, timeout=None)
+
+
+def claim_checkout(
+    amount,
+    currency: str = "EUR",
+    payment_type: str = "DB",
+    merchant_transaction_id: str = None,
+    wrapper=None,
+):
+    """
+    get a checkout for the given amount: from the pool if possible, otherwise a new one
+    :param merchant_transaction_id: (optional) used for a new checkout only;
+        pooled checkouts have a generated merchant_transaction_id (POOL_MERCHANT_TRANSACTION_ID_PREFIX)
+    :param wrapper: (optional) VRPaymentWrapper for the entity and sandbox mode of the checkout,
+        defaults to the shared wrapper of the default entity
+    :return: VRPaymentBasicPayment with a valid checkout_id
+    """
+    from ..models import VRPaymentPooledCheckout
+    from ..wrapper.registry import get_wrapper
+
+    wrapper = wrapper or get_wrapper()
+    bucket = get_bucket(amount, currency, payment_type)
+    basic_payment = VRPaymentPooledCheckout.objects.claim(
+        bucket, wrapper.entity_id, wrapper.sandbox, get_min_validity()
+    )
+    record_claim(bucket, hit=basic_payment is not None)
+    if basic_payment is None:
+        logger.info(f"checkout pool {bucket} is empty")
+        basic_payment = wrapper.create_checkout(
+            amount=amount,
+            currency=currency,
+            payment_type=payment_type,
+            merchant_transaction_id=merchant_transaction_id or generate_merchant_transaction_id(),
+        )
+    return basic_payment
+
+
+def replenish_pool(wrapper=None) -> dict:
+    """
+    create checkouts until every bucket holds `size` available checkouts
+    :return: number of created checkouts per bucket
+    """
+    from ..models import VRPaymentPooledCheckout
+    from ..wrapper.registry import get_wrapper
+
+    wrapper = wrapper or get_wrapper()
+    min_validity = get_min_validity()
+    created = {}
+    for bucket in get_pool_buckets():
+        available = VRPaymentPooledCheckout.objects.available(
+            bucket["key"], wrapper.entity_id, wrapper.sandbox, min_validity
+        ).count()
+        missing = bucket["size"] - available
+        if missing <= 0:
+            created[bucket["key"]] = 0
+            continue
+        results = wrapper.create_checkouts(
+            [
+                {
+                    "amount": bucket["amount"],
+                    "currency": bucket["currency"],
+                    "payment_type": bucket["payment_type"],
+                    "merchant_transaction_id": generate_merchant_transaction_id(),
+                }
+                for _ in range(missing)
+            ]
+        )
+        basic_payments = [result.basic_payment for result in results if result.basic_payment]
+        if len(basic_payments) < len(results):
+            logger.error(f"{len(results) - len(basic_payments)} checkouts for pool {bucket['key']} failed")
+        VRPaymentPooledCheckout.objects.bulk_create(
+            [
+                VRPaymentPooledCheckout(
+                    basic_payment=basic_payment,
+                    bucket=bucket["key"],
+                    expires_at=basic_payment.checkout_expires_at,
+                )
+                for basic_payment in basic_payments
+            ]
+        )
+        created[bucket["key"]] = len(basic_payments)
+    return created
+
+
+def purge_expired_checkouts() -> int:
+    """
+    delete the payments of pooled checkouts that expired unclaimed, their ids are evicted from the identifier cache
+    :return: number of deleted payments
+    """
+    from ..managers import identifier_cache
+    from ..models import VRPaymentBasicPayment, VRPaymentIdentifier
+
+    with transaction.atomic(using=VRPaymentBasicPayment.objects.db):
+        expired = VRPaymentBasicPayment.objects.filter(
+            pooled_checkout__claimed_at__isnull=True,
+            pooled_checkout__expires_at__lte=timezone.now(),
+        )
+        # the identifiers are deleted with their payment
+        identifiers = list(
+            VRPaymentIdentifier.objects.filter(basic_payment__in=expired).values_list("identifier", flat=True)
+        )
+        _, deleted = expired.delete()
+    identifier_cache.delete(*identifiers)
+    return deleted.get(VRPaymentBasicPayment._meta.label, 0)
+
+
+def get_pool_stats(wrapper=None) -> dict:
+    """
+    :return: available checkouts, hits, misses and hit rate per bucket
+    """
+    from ..models import VRPaymentPooledCheckout
+    from ..wrapper.registry import get_wrapper
+
+    wrapper = wrapper or get_wrapper()
+    cache = caches[settings.VR_PAYMENT_CHECKOUT_POOL_CACHE]
+    stats = {}
+    for bucket in get_pool_buckets():
+        hits = cache.get(_get_counter_key(bucket["key"], "hits"), 0)
+        misses = cache.get(_get_counter_key(bucket["key"], "misses"), 0)
+        stats[bucket["key"]] = {
+            "available": VRPaymentPooledCheckout.objects.available(
+                bucket["key"], wrapper.entity_id, wrapper.sandbox, get_min_validity()
+            ).count(),
+            "size": bucket["size"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else None,
+        }
+    return stats
@@ -0,0 +1,169 @@
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+compression of raw json payloads
+
+Every blob starts with a 5 byte header: the codec (b"z" = zlib, b"s" = zstd) followed by the
+crc32 of the dictionary it was compressed with, so blobs stay readable after the configured
+codec or dictionary changed.
+"""
+
+ZLIB = b"z"
+ZSTD = b"s"
+HEADER_LENGTH = 5
+
+# typical VR Pay responses and headers; zlib prefers the most common strings at the end
+BUILTIN_DICTIONARY = (
+    b'{"Content-Type": "application/json;charset=UTF-8", "Transfer-Encoding": "chunked", '
+    b'"Connection": "keep-alive", "Server": "", "Cache-Control": "max-age=0, no-cache, no-store", '
+    b'"Pragma": "no-cache", "Expires": "0", "Strict-Transport-Security": "max-age=31536000; includeSubDomains", '
+    b'"X-Content-Type-Options": "nosniff", "X-XSS-Protection": "1; mode=block", "X-Frame-Options": "DENY", '
+    b'"Date": "", "Content-Encoding": "gzip", "Vary": "Accept-Encoding"}'
+    b'{"type": "PAYMENT", "action": "", "payload": {'
+    b'"paymentType": "PA", "paymentType": "DB", "paymentType": "CP", "paymentType": "RF", '
+    b'"paymentBrand": "VISA", "paymentBrand": "MASTER", "paymentBrand": "AMEX", "paymentBrand": "PAYPAL", '
+    b'"paymentBrand": "SOFORTUEBERWEISUNG", "paymentBrand": "GIROPAY", "paymentBrand": "DIRECTDEBIT_SEPA", '
+    b'"card": {"bin": "", "binCountry": "DE", "last4Digits": "", "holder": "", "expiryMonth": "", "expiryYear": ""}, '
+    b'"customer": {"givenName": "", "surname": "", "email": "", "ip": ""}, '
+    b'"billing": {"street1": "", "city": "", "postcode": "", "country": "DE"}, '
+    b'"customParameters": {"SHOPPER_EndToEndIdentity": "", "CTPE_DESCRIPTOR_TEMPLATE": ""}, '
+    b'"risk": {"score": "0"}, "threeDSecure": {"eci": "05", "verificationId": "", "version": "2.1.0"}, '
+    b'"redirect": {"url": "", "parameters": []}, "shortId": "", '
+    b'"presentationAmount": "", "presentationCurrency": "EUR", "authentication": {"entityId": ""}, '
+    b'"resultDetails": {"ExtendedDescription": "", "AcquirerResponse": "00", "ConnectorTxID1": "", '
+    b'"clearingInstituteName": "", "reconciliationId": ""}, '
+    b'"result": {"code": "000.000.000", "description": "Transaction succeeded"}, '
+    b'"result": {"code": "000.100.110", "description": "Request successfully processed in \'Merchant in Integrator Test Mode\'"}, '
+    b'"result": {"code": "000.200.100", "description": "successfully created checkout"}, '
+    b'"result": {"code": "000.200.000", "description": "transaction pending"}, '
+    b'"result": {"code": "800.400.500", "description": "Waiting for confirmation of non-instant payment. Denied for now."}, '
+    b'"result": {"code": "200.300.404", "description": "invalid or missing parameter"}, '
+    b'"merchantTransactionId": "", "merchantInvoiceId": "", "referencedId": "", '
+    b'"amount": "0.00", "currency": "EUR", "descriptor": "", '
+    b'"buildNumber": "", "timestamp": "", "ndc": "", "id": ""}}'
+)
+
+
+class CompressionError(Exception):
+    pass
+
+
+def _crc(dictionary: bytes) -> bytes:
+    return (zlib.crc32(dictionary) if dictionary else 0).to_bytes(4, "big")
+
+
+# dictionary by file path (None: the builtin one) and by crc
+_dictionaries = {}
+
+
+def _load_dictionary(path: str) -> bytes:
+    if path not in _dictionaries:
+        if path:
+            with open(path, "rb") as dictionary_file:
+                _dictionaries[path] = dictionary_file.read()
+        else:
+            _dictionaries[path] = BUILTIN_DICTIONARY
+        # register the dictionary under its crc so blobs can find it again
+        _dictionaries[_crc(_dictionaries[path])] = _dictionaries[path]
+    return _dictionaries[path]
+
+
+def get_dictionary() -> bytes:
+    """
+    the dictionary used for new blobs; VR_PAYMENT_COMPRESSION_DICTIONARY can point to a file
+    written by `vr_payment_train_dictionary`
+    """
+    from .. import settings
+
+    return _load_dictionary(settings.VR_PAYMENT_COMPRESSION_DICTIONARY)
+
+
+def _get_dictionary_by_crc(crc: bytes) -> bytes:
+    """
+    the dictionary of a blob: the empty or builtin dictionary, VR_PAYMENT_COMPRESSION_DICTIONARY
+    or one of VR_PAYMENT_COMPRESSION_PREVIOUS_DICTIONARIES
+    """
+    from .. import settings
+
+    if crc == _crc(b""):
+        return b""
+    if crc == _crc(BUILTIN_DICTIONARY):
+        return BUILTIN_DICTIONARY
+    if crc not in _dictionaries:
+        paths = [settings.VR_PAYMENT_COMPRESSION_DICTIONARY] + list(
+            settings.VR_PAYMENT_COMPRESSION_PREVIOUS_DICTIONARIES
+        )
+        for path in paths:
+            if _crc(_load_dictionary(path)) == crc:
+                break
+    try:
+        return _dictionaries[crc]
+    except KeyError:
+        raise CompressionError(
+            f"unknown compression dictionary {crc.hex()}, "
+            "add its file to VR_PAYMENT_COMPRESSION_PREVIOUS_DICTIONARIES"
+        )
+
+
+def compress_json(value, codec: str = None) -> bytes:
+    """
+    :param value: any json serializable value
+    :param codec: "zlib" or "zstd"; defaults to VR_PAYMENT_RAW_PAYLOAD_COMPRESSION (or zlib)
+    """
+    from .. import settings
+
+    codec = codec or settings.VR_PAYMENT_RAW_PAYLOAD_COMPRESSION or "zlib"
+    data = json.dumps(value, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf8")
+    dictionary = get_dictionary()
+    if codec == "zstd":
+        if zstandard is None:
+            raise CompressionError("zstd compression requires the 'zstandard' package")
+        compressor = zstandard.ZstdCompressor(
+            dict_data=zstandard.ZstdCompressionDict(dictionary)
+        )
+        return ZSTD + _crc(dictionary) + compressor.compress(data)
+    if codec == "zlib":
+        compressor = zlib.compressobj(level=9, zdict=dictionary)
+        return ZLIB + _crc(dictionary) + compressor.compress(data) + compressor.flush()
+    raise CompressionError(f"unknown compression codec '{codec}'")
+
+
+def decompress_json(blob):
+    blob = bytes(blob)
+    codec, crc = blob[:1], blob[1:HEADER_LENGTH]
+    dictionary = _get_dictionary_by_crc(crc)
+    if codec == ZSTD:
+        if zstandard is None:
+            raise CompressionError("zstd compressed payload requires the 'zstandard' package")
+        decompressor = zstandard.ZstdDecompressor(
+            dict_data=zstandard.ZstdCompressionDict(dictionary)
+        )
+        data = decompressor.decompress(blob[HEADER_LENGTH:])
+    elif codec == ZLIB:
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        data = decompressor.decompress(blob[HEADER_LENGTH:]) + decompressor.flush()
+    else:
+        raise CompressionError(f"unknown compression codec {codec!r}")
+    return json.loads(data.decode("utf8"))
+
+
+def train_dictionary(samples: list, size: int = 32768) -> bytes:
+    """
+    build a dictionary from sample payloads: a trained zstd dictionary if zstandard is installed,
+    otherwise the most recent samples (zlib only uses the last 32KB of a dictionary)
+    """
+    encoded = [
+        json.dumps(sample, cls=DjangoJSONEncoder, separators=(",", ":")).encode("utf8")
+        for sample in samples
+    ]
+    if zstandard is not None and len(encoded) >= 8:
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+    return b"".join(encoded)[-size:]
@@ -0,0 +1,155 @@
+import logging
+import time
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .. import settings
+from ..signals import payment_status_changed
+from .polling import get_backoff
+
+"""
+dispatch of the status change events of the outbox table VRPaymentStatusEvent, see `vr_payment_dispatch_events`
+
+Events are written in the transaction that saves a status response or webhook payload, so an event exists if and
+only if its status change was committed. The dispatcher claims a batch of events for a while (a short transaction,
+SKIP LOCKED on PostgreSQL, so several dispatchers can run), sends it to the receivers of
+signals.payment_status_changed without holding locks and then marks it dispatched (at least once delivery).
+A batch whose receiver raises is sent again after an exponential backoff, in the meantime later events go out;
+after `max_attempts` its events are given up. Events are held back for VR_PAYMENT_STATUS_EVENT_WINDOW seconds,
+so that e.g. pending -> successful within a few seconds arrives as one event.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def coalesce_events(events: list) -> list:
+    """
+    one event per payment of `events` (in order): its last event, with the previous status category of its first.
+    Payments whose status category ends up where it was are left out.
+    """
+    first_events = {}
+    last_events = {}
+    for event in events:
+        first_events.setdefault(event.basic_payment_id, event)
+        last_events[event.basic_payment_id] = event
+    coalesced = []
+    for basic_payment_id, event in sorted(last_events.items(), key=lambda item: item[1].pk):
+        event.previous_status_category = first_events[basic_payment_id].previous_status_category
+        if event.previous_status_category != event.status_category:
+            coalesced.append(event)
+    return coalesced
+
+
+class StatusEventDispatcher(object):
+    def __init__(
+        self,
+        batch_size: int = 500,
+        window: float = None,
+        interval: float = 1,
+        max_attempts: int = 10,
+        retry_delay: float = 60,
+        max_retry_delay: float = 3600,
+        lease: float = 300,
+        using: str = "default",
+    ):
+        """
+        :param batch_size: max events per signal (before coalescing)
+        :param window: defaults to VR_PAYMENT_STATUS_EVENT_WINDOW
+        :param interval: seconds to sleep when there are no more events to dispatch
+        :param max_attempts: events that failed this many times are given up (and stay undispatched)
+        :param retry_delay: seconds until failed events are sent again, doubled after every attempt up to
+            `max_retry_delay`
+        :param lease: seconds other dispatchers skip claimed events, i.e. until they are sent again
+            if this dispatcher dies while sending them
+        """
+        self.batch_size = batch_size
+        self.window = settings.VR_PAYMENT_STATUS_EVENT_WINDOW if window is None else window
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lease = lease
+        self.using = using
+        self.stats = {"batches": 0, "events": 0, "dispatched": 0, "failed": 0, "given_up": 0}
+
+    def claim_batch(self) -> list:
+        """
+        the oldest pending events, claimed for `lease` seconds in a short transaction
+        """
+        from ..models import VRPaymentStatusEvent
+
+        now = timezone.now()
+        with transaction.atomic(using=self.using):
+            events = list(
+                VRPaymentStatusEvent.objects.db_manager(self.using)
+                .pending(now - timezone.timedelta(seconds=self.window), self.max_attempts)
+                .select_related("basic_payment")
+                .select_for_update(skip_locked=True, of=("self",))[: self.batch_size]
+            )
+            if events:
+                VRPaymentStatusEvent._base_manager.using(self.using).filter(
+                    pk__in=[event.pk for event in events]
+                ).update(attempts=F("attempts") + 1, next_attempt_at=now + timezone.timedelta(seconds=self.lease))
+        for event in events:
+            event.attempts += 1
+        return events
+
+    def dispatch_batch(self) -> int:
+        """
+        send the oldest batch of pending events, outside of any transaction, and mark them dispatched;
+        if a receiver raises, the batch is sent again after a backoff
+        :return: the number of events sent, coalesced and failed ones included
+        """
+        from ..models import VRPaymentStatusEvent
+
+        events = self.claim_batch()
+        if not events:
+            return 0
+        coalesced = coalesce_events(events)
+        try:
+            if coalesced:
+                payment_status_changed.send(sender=VRPaymentStatusEvent, events=coalesced)
+        except Exception:
+            logger.exception(f"sending {len(events)} status events failed")
+            self.stats["failed"] += len(events)
+            self.schedule_retry(events)
+            return len(events)
+        event_ids = [event.pk for event in events]
+        VRPaymentStatusEvent._base_manager.using(self.using).filter(pk__in=event_ids).update(
+            dispatched_at=timezone.now(), next_attempt_at=None
+        )
+        self.stats["batches"] += 1
+        self.stats["events"] += len(events)
+        self.stats["dispatched"] += len(coalesced)
+        return len(events)
+
+    def schedule_retry(self, events: list):
+        from ..models import VRPaymentStatusEvent
+
+        event_ids_by_attempts = {}
+        for event in events:
+            event_ids_by_attempts.setdefault(event.attempts, []).append(event.pk)
+        for attempts, event_ids in event_ids_by_attempts.items():
+            if attempts >= self.max_attempts:
+                logger.error(f"giving up status events {event_ids} after {attempts} attempts")
+                self.stats["given_up"] += len(event_ids)
+            delay = get_backoff(attempts - 1, self.retry_delay, self.max_retry_delay)
+            VRPaymentStatusEvent._base_manager.using(self.using).filter(pk__in=event_ids).update(
+                next_attempt_at=timezone.now() + timezone.timedelta(seconds=delay)
+            )
+
+    def run(self, should_stop=lambda: False):
+        """
+        dispatch until `should_stop` returns True
+        """
+        while not should_stop():
+            try:
+                dispatched = self.dispatch_batch()
+            except Exception:
+                logger.exception("dispatching status events failed")
+                dispatched = 0
+            if dispatched < self.batch_size:
+                close_old_connections()
+                time.sleep(self.interval)
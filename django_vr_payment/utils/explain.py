@@ -0,0 +1,168 @@
+import re
+
+from django.db import connections
+from django.utils import timezone
+
+from .transaction_status import PENDING_STATUS_CATEGORIES
+
+"""
+query plans of the queries the app runs, see `vr_payment_explain`
+
+A sequential scan of a small table is fine; run it against a realistic amount of data
+to see which queries will not scale, e.g. generated by `vr_payment_generate`.
+"""
+
+# tables with fewer rows than this are expected to be scanned, planner statistics permitting
+SMALL_TABLE_ROWS = 1000
+
+
+def _sample(queryset, field: str, default):
+    value = queryset.exclude(**{f"{field}__isnull": True}).values_list(field, flat=True).first()
+    return value if value is not None else default
+
+
+def get_app_queries() -> list:
+    """
+    :return: (name, queryset) of every query the views, managers and commands run, with sample values from the database
+    """
+    from ..managers import status_category_q
+    from ..models import (
+        VRPaymentBasicPayment,
+        VRPaymentBasicPaymentStatusResponse,
+        VRPaymentCheckoutResponse,
+        VRPaymentDailyRollup,
+        VRPaymentIdentifier,
+        VRPaymentPooledCheckout,
+        VRPaymentStatusEvent,
+        VRPaymentWebhook,
+        VRPaymentWebhookPaymentPayload,
+    )
+    from .checkout_pool import get_min_validity
+    from .polling import PendingPaymentPoller
+
+    basic_payments = VRPaymentBasicPayment._base_manager
+    status_responses = VRPaymentBasicPaymentStatusResponse._base_manager
+    basic_payment_id = _sample(basic_payments, "pk", 0)
+    merchant_transaction_id = _sample(basic_payments, "merchant_transaction_id", "-")
+    checkout_id = _sample(VRPaymentCheckoutResponse._base_manager, "vr_pay_id", "-")
+    payment_id = _sample(status_responses, "vr_pay_id", "-")
+    bucket = _sample(VRPaymentPooledCheckout._base_manager, "bucket", "-")
+    now = timezone.now()
+
+    return [
+        (
+            "checkout view: payment by merchant_transaction_id",
+            VRPaymentBasicPayment.objects.for_checkout_view().filter(merchant_transaction_id=merchant_transaction_id),
+        ),
+        (
+            "return view: payment by checkout id",
+            VRPaymentBasicPayment.objects.for_return_view().filter(checkout_response__vr_pay_id=checkout_id),
+        ),
+        (
+            "latest status response of a payment",
+            status_responses.filter(basic_payment_id=basic_payment_id).order_by("-pk")[:1],
+        ),
+        (
+            "payments with their latest status (admin, export)",
+            VRPaymentBasicPayment.objects.with_latest_status().order_by("-pk")[:50],
+        ),
+        ("poller: pending payments", PendingPaymentPoller().get_pending_payments()),
+        (
+            "webhook resolution: basic payment by VR Pay id",
+            VRPaymentIdentifier.objects.filter(pk__in=[payment_id, checkout_id]),
+        ),
+        (
+            "webhook resolution: basic payment by merchant_transaction_id",
+            basic_payments.filter(merchant_transaction_id=merchant_transaction_id).values_list("pk"),
+        ),
+        (
+            "admin: pending status responses",
+            status_responses.filter(status_category_q(*PENDING_STATUS_CATEGORIES)).order_by("-pk")[:50],
+        ),
+        (
+            "admin: status responses by VR Pay id",
+            status_responses.filter(vr_pay_id=payment_id),
+        ),
+        (
+            "checkout pool: available checkouts",
+            VRPaymentPooledCheckout.objects.available(bucket, "-", True, get_min_validity()),
+        ),
+        (
+            "rollup: status changes of a day",
+            VRPaymentDailyRollup.objects.aggregate_status_changes(timezone.localdate()),
+        ),
+        (
+            "archive: old status responses",
+            status_responses.filter(created_at__lt=now - timezone.timedelta(days=180)).order_by("pk")[:1000],
+        ),
+        (
+            "replay: stored payment webhooks",
+            VRPaymentWebhook._base_manager.filter(webhook_type="payment", pk__gt=0).order_by("pk")[:500],
+        ),
+        (
+            "replay: known webhook payloads",
+            VRPaymentWebhookPaymentPayload._base_manager.filter(vr_pay_id__in=[payment_id]),
+        ),
+        (
+            "status events: pending events",
+            VRPaymentStatusEvent.objects.pending(now, 10)[:500],
+        ),
+        (
+            "export: payments created in a range",
+            basic_payments.filter(created_at__gte=now - timezone.timedelta(days=30)).order_by("pk")[:2000],
+        ),
+    ]
+
+
+def get_table_rows(using: str = "default") -> dict:
+    """
+    estimated row count per table of the app, PostgreSQL and SQLite (exact) only
+    """
+    from django.apps import apps
+
+    connection = connections[using]
+    tables = [model._meta.db_table for model in apps.get_app_config("django_vr_payment").get_models()]
+    rows = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", [table])
+                row = cursor.fetchone()
+                rows[table] = int(row[0]) if row else 0
+            elif connection.vendor == "sqlite":
+                cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+                rows[table] = cursor.fetchone()[0]
+    return rows
+
+
+def find_full_scans(plan: str, vendor: str) -> list:
+    """
+    tables read without an index according to the plan (PostgreSQL and SQLite plans only)
+    """
+    if vendor == "postgresql":
+        return re.findall(r"Seq Scan on (\w+)", plan)
+    if vendor == "sqlite":
+        return [
+            table
+            for table, rest in re.findall(r"\bSCAN (?:TABLE )?(\w+)(.*)", plan)
+            if "INDEX" not in rest
+        ]
+    return []
+
+
+def explain_app_queries(using: str = "default", analyze: bool = False):
+    """
+    yield (name, plan, tables scanned without index) for every query of get_app_queries.
+    Full scans of tables with fewer than SMALL_TABLE_ROWS rows are not reported.
+    """
+    vendor = connections[using].vendor
+    table_rows = get_table_rows(using)
+    options = {"analyze": True} if analyze and vendor == "postgresql" else {}
+    for name, queryset in get_app_queries():
+        plan = queryset.using(using).explain(**options)
+        full_scans = [
+            table
+            for table in find_full_scans(plan, vendor)
+            if table_rows.get(table, SMALL_TABLE_ROWS) >= SMALL_TABLE_ROWS
+        ]
+        yield name, plan, full_scans
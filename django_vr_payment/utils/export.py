@@ -0,0 +1,120 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+"""
+streaming export of payments with their latest status response
+
+Rows are read page by page (keyset pagination on the primary key), each page through a server side cursor
+where the database supports it, so the export runs with constant memory for any number of payments.
+"""
+
+EXPORT_PAYMENT_FIELDS = (
+    "id",
+    "created_at",
+    "entity_id",
+    "merchant_transaction_id",
+    "merchant_invoice_id",
+    "amount",
+    "tax_amount",
+    "currency",
+    "payment_brand",
+    "payment_type",
+    "payment_id",
+    "sandbox",
+)
+EXPORT_LATEST_RESPONSE_FIELDS = (
+    "created_at",
+    "vr_pay_id",
+    "payment_brand",
+    "result_code",
+    "result_description",
+    "status_category",
+)
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+def get_export_columns() -> list:
+    return list(EXPORT_PAYMENT_FIELDS) + [
+        f"latest_response_{field}" for field in EXPORT_LATEST_RESPONSE_FIELDS
+    ]
+
+
+def iter_export_rows(queryset, chunk_size: int = 2000):
+    """
+    yield one dict per payment of `queryset`, joined with its latest status response
+    """
+    queryset = (
+        queryset.select_related(None)
+        .defer(None)
+        .annotate_latest_response(*EXPORT_LATEST_RESPONSE_FIELDS)
+        .order_by("pk")
+        .values(*get_export_columns())
+    )
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = 0
+        for row in page[:chunk_size].iterator(chunk_size=chunk_size):
+            last_pk = row["id"]
+            rows += 1
+            yield row
+        if rows < chunk_size:
+            break
+
+
+class _Echo(object):
+    """a file-like object that returns what is written, see django docs on streaming large CSV files"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, columns: list):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_gzip(chunks, flush_size: int = 65536):
+    """
+    gzip a stream of str chunks on the fly; yields bytes roughly every `flush_size` compressed bytes
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf8"))
+        if data:
+            buffer.append(data)
+            buffered += len(data)
+            if buffered >= flush_size:
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+    buffer.append(compressor.flush())
+    yield b"".join(buffer)
+
+
+def export_payments(queryset, export_format: str = "csv", compress: bool = False, chunk_size: int = 2000):
+    """
+    :param queryset: a VRPaymentBasicPayment queryset
+    :param export_format: one of EXPORT_FORMATS
+    :param compress: gzip the output
+    :return: an iterator of str chunks, bytes if compressed
+    """
+    rows = iter_export_rows(queryset, chunk_size=chunk_size)
+    if export_format == "csv":
+        chunks = iter_csv(rows, get_export_columns())
+    elif export_format == "jsonl":
+        chunks = iter_jsonl(rows)
+    else:
+        raise ValueError(f"unknown export format '{export_format}'")
+    return iter_gzip(chunks) if compress else chunks
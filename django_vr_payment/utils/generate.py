@@ -0,0 +1,409 @@
+import datetime
+import io
+import itertools
+import json
+import math
+import random
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import BinaryField, BooleanField, DateTimeField, Max
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+try:
+    # Django 3.1
+    from django.db.models import JSONField as BaseJSONField
+except ImportError:
+    from django.contrib.postgres.fields import JSONField as BaseJSONField
+
+"""
+synthetic payments for scale testing, see `vr_payment_generate`
+
+Payments are generated together with their checkout response, status responses, webhooks with payloads
+and identifiers, as the views, the poller and the webhook view would have saved them. Result codes, brands
+and amounts are drawn from the distributions below. The same seed, count, days and end generate the same
+rows into the same (e.g. empty) database, so benchmark runs can be compared.
+"""
+
+CHECKOUT_RESULT = ("000.200.100", "successfully created checkout")
+PENDING_RESULT = ("000.200.000", "transaction pending")
+CHARGEBACK_RESULT = ("000.100.220", "Dispute reversal")
+# (result code, description, weight) of the last status of a paid checkout; one common code of most groups
+# of transaction_status, weighted roughly like production traffic
+FINAL_RESULTS = [
+    ("000.000.000", "Transaction succeeded", 720),
+    ("000.100.110", "Request successfully processed in 'Merchant in Integrator Test Mode'", 40),
+    ("000.400.000", "Transaction succeeded (please review manually due to fraud suspicion)", 8),
+    ("000.200.000", "transaction pending", 15),
+    ("800.400.500", "Waiting for confirmation of non-instant payment. Denied for now.", 10),
+    ("100.396.101", "Cancelled by user", 60),
+    ("100.380.401", "User Authentication Failed", 35),
+    ("800.100.151", "transaction declined (invalid card)", 25),
+    ("800.100.171", "transaction declined (pick up card)", 8),
+    ("100.100.101", "invalid creditcard, bank account number or bank name", 20),
+    ("800.110.100", "duplicate transaction", 8),
+    ("100.400.311", "transaction declined (format error)", 5),
+    ("800.400.100", "AVS Check Failed", 4),
+    ("800.300.101", "account or user is blacklisted (card blacklisted)", 3),
+    ("100.550.310", "amount exceeds limit for the registered account.", 3),
+    ("200.300.404", "invalid or missing parameter", 3),
+    ("900.100.300", "timeout, uncertain result", 4),
+    ("800.500.100", "direct debit transaction declined for unknown reason", 2),
+    ("300.100.100", "Transaction declined (additional customer authentication required)", 5),
+]
+BRANDS = [("VISA", 45), ("MASTER", 35), ("PAYPAL", 10), ("AMEX", 5), ("SOFORTUEBERWEISUNG", 5)]
+CARD_BRANDS = {"VISA", "MASTER", "AMEX"}
+CURRENCIES = [("EUR", 95), ("CHF", 3), ("USD", 2)]
+PAYMENT_TYPES = [("DB", 80), ("PA", 20)]
+# number of pending status responses before the last one
+PENDING_RESPONSES = [(0, 70), (1, 20), (2, 10)]
+# checkouts the shopper never paid, i.e. without status responses
+ABANDONED_SHARE = 0.12
+# paid checkouts with a payment webhook
+WEBHOOK_SHARE = 0.7
+# successful payments charged back later
+CHARGEBACK_SHARE = 0.003
+# amounts are log-normal with median exp(AMOUNT_MU), clamped to AMOUNT_RANGE
+AMOUNT_MU, AMOUNT_SIGMA = 3.6, 1.0
+AMOUNT_RANGE = (Decimal("0.50"), Decimal("9999.99"))
+
+BUILD_NUMBER = "b4508276fd1d0a5d3f8a2a6e8e3d9e2c0d4b7c1e@2026-10-01 08:00:00 +0000"
+JSON_HEADERS = {"Content-Type": "application/json;charset=UTF-8"}
+WEBHOOK_URL = "https://shop.example.com/vr-payment/webhooks/"
+
+
+def _cumulative(choices: list) -> tuple:
+    """
+    values and cumulative weights of (value..., weight) tuples for random.choices
+    """
+    values = [choice[0] if len(choice) == 2 else choice[:-1] for choice in choices]
+    return values, list(itertools.accumulate(choice[-1] for choice in choices))
+
+
+class SyntheticDataGenerator(object):
+    def __init__(
+        self,
+        seed: int = 0,
+        days: int = 30,
+        end: datetime.datetime = None,
+        entity_id: str = None,
+        sandbox: bool = None,
+        batch_size: int = 5000,
+        using: str = "default",
+    ):
+        """
+        :param days: payments are created evenly over this many days before `end`
+        :param end: defaults to the start of today, i.e. runs on the same day generate the same timestamps
+        :param entity_id: defaults to VR_PAYMENT_ENTITY_ID
+        :param sandbox: defaults to VR_PAYMENT_SANDBOX
+        :param batch_size: payments per transaction
+        """
+        from .. import settings
+
+        self.seed = seed
+        self.random = random.Random(seed)
+        if end is None:
+            end = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time()))
+        self.end = end
+        self.start = end - datetime.timedelta(days=days)
+        self.entity_id = entity_id or settings.VR_PAYMENT_ENTITY_ID
+        self.sandbox = settings.VR_PAYMENT_SANDBOX if sandbox is None else sandbox
+        self.base_url = settings.VR_PAYMENT_TEST_URL if self.sandbox else settings.VR_PAYMENT_LIVE_URL
+        self.batch_size = batch_size
+        self.using = using
+        self.next_pks = {}
+        self.final_results = _cumulative(FINAL_RESULTS)
+        self.brands = _cumulative(BRANDS)
+        self.currencies = _cumulative(CURRENCIES)
+        self.payment_types = _cumulative(PAYMENT_TYPES)
+        self.pending_responses = _cumulative(PENDING_RESPONSES)
+
+    def get_models(self) -> list:
+        """
+        generated models in insert order
+        """
+        from ..models import (
+            VRPaymentBasicPayment,
+            VRPaymentBasicPaymentStatusResponse,
+            VRPaymentCheckoutResponse,
+            VRPaymentIdentifier,
+            VRPaymentWebhook,
+            VRPaymentWebhookPaymentPayload,
+        )
+
+        return [
+            VRPaymentBasicPayment,
+            VRPaymentCheckoutResponse,
+            VRPaymentBasicPaymentStatusResponse,
+            VRPaymentWebhook,
+            VRPaymentWebhookPaymentPayload,
+            VRPaymentIdentifier,
+        ]
+
+    def get_merchant_transaction_id(self, number: int) -> str:
+        return f"synthetic-{self.seed}-{number:09d}"
+
+    def exists(self) -> bool:
+        """
+        whether payments of this seed have been generated into the database already
+        """
+        from ..models import VRPaymentBasicPayment
+
+        return (
+            VRPaymentBasicPayment._base_manager.using(self.using)
+            .filter(merchant_transaction_id=self.get_merchant_transaction_id(0))
+            .exists()
+        )
+
+    def run(self, count: int, progress=None) -> dict:
+        """
+        generate `count` payments, `batch_size` per transaction
+        :param progress: called with the number of generated payments after every batch
+        :return: number of generated rows per model name
+        """
+        models = self.get_models()
+        self.next_pks = {
+            model: (model._base_manager.using(self.using).aggregate(max_pk=Max("pk"))["max_pk"] or 0) + 1
+            for model in models
+            if model._meta.auto_field
+        }
+        stats = {model._meta.model_name: 0 for model in models}
+        for offset in range(0, count, self.batch_size):
+            rows = {model: [] for model in models}
+            for number in range(offset, min(count, offset + self.batch_size)):
+                self.generate_payment(number, count, rows)
+            with transaction.atomic(using=self.using):
+                for model in models:
+                    insert_rows(connections[self.using], model, rows[model])
+                    stats[model._meta.model_name] += len(rows[model])
+            if progress:
+                progress(min(count, offset + self.batch_size))
+        self.reset_sequences(models)
+        return stats
+
+    def reset_sequences(self, models: list):
+        """
+        move the id sequences past the generated ids (PostgreSQL)
+        """
+        connection = connections[self.using]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    def choose(self, distribution: tuple):
+        values, cum_weights = distribution
+        return self.random.choices(values, cum_weights=cum_weights)[0]
+
+    def next_pk(self, model) -> int:
+        pk = self.next_pks[model]
+        self.next_pks[model] = pk + 1
+        return pk
+
+    def get_vr_pay_id(self) -> str:
+        return f"{self.random.getrandbits(128):032x}"
+
+    def get_amount(self) -> Decimal:
+        amount = Decimal(math.exp(self.random.gauss(AMOUNT_MU, AMOUNT_SIGMA))).quantize(Decimal("0.01"))
+        return min(max(amount, AMOUNT_RANGE[0]), AMOUNT_RANGE[1])
+
+    def get_response_json(self, basic_payment, checkout_id: str, vr_pay_id: str, result: tuple, created_at) -> dict:
+        code, description = result
+        response_json = {
+            "id": vr_pay_id,
+            "paymentType": basic_payment.payment_type,
+            "paymentBrand": basic_payment.payment_brand,
+            "amount": f"{basic_payment.amount:.2f}",
+            "currency": basic_payment.currency,
+            "descriptor": f"{vr_pay_id[:4]}.{vr_pay_id[4:8]}.{vr_pay_id[8:12]} Synthetic Shop",
+            "merchantTransactionId": basic_payment.merchant_transaction_id,
+            "result": {"code": code, "description": description},
+            "resultDetails": {"ExtendedDescription": description, "AcquirerResponse": code[:3]},
+            "risk": {"score": str(self.random.choice([0, 0, 0, 20, 100]))},
+            "buildNumber": BUILD_NUMBER,
+            "timestamp": created_at.strftime("%Y-%m-%d %H:%M:%S+0000"),
+            "ndc": checkout_id,
+        }
+        if basic_payment.payment_brand in CARD_BRANDS:
+            response_json["card"] = {
+                "bin": str(self.random.randrange(400000, 560000)),
+                "last4Digits": f"{self.random.randrange(10000):04d}",
+                "holder": "Jane Jones",
+                "expiryMonth": f"{self.random.randrange(1, 13):02d}",
+                "expiryYear": str(created_at.year + self.random.randrange(1, 6)),
+            }
+        return response_json
+
+    def generate_payment(self, number: int, count: int, rows: dict):
+        """
+        append a payment of `count` and its dependent rows to `rows` (model -> instances)
+        """
+        from ..models import (
+            VRPaymentBasicPayment,
+            VRPaymentBasicPaymentStatusResponse,
+            VRPaymentCheckoutResponse,
+            VRPaymentIdentifier,
+            VRPaymentWebhook,
+            VRPaymentWebhookPaymentPayload,
+        )
+
+        rng = self.random
+        created_at = self.start + (self.end - self.start) * ((number + rng.random()) / count)
+        amount = self.get_amount()
+        checkout_id = f"{rng.getrandbits(128):032X}.uat01-vm-tx0{rng.randrange(1, 5)}"
+        basic_payment = VRPaymentBasicPayment(
+            pk=self.next_pk(VRPaymentBasicPayment),
+            entity_id=self.entity_id,
+            amount=amount,
+            tax_amount=(amount * 19 / 119).quantize(Decimal("0.01")),
+            currency=self.choose(self.currencies),
+            payment_brand=self.choose(self.brands),
+            payment_type=self.choose(self.payment_types),
+            merchant_transaction_id=self.get_merchant_transaction_id(number),
+            merchant_invoice_id=f"synthetic-invoice-{self.seed}-{number:09d}",
+            sandbox=self.sandbox,
+            resource_path=f"/v1/checkouts/{checkout_id}/payment",
+            payment_id="",
+            created_at=created_at,
+            last_modified=created_at,
+        )
+        checkout_response = VRPaymentCheckoutResponse.objects.build_from_json(
+            {
+                "result": {"code": CHECKOUT_RESULT[0], "description": CHECKOUT_RESULT[1]},
+                "buildNumber": BUILD_NUMBER,
+                "timestamp": created_at.strftime("%Y-%m-%d %H:%M:%S+0000"),
+                "ndc": checkout_id,
+                "id": checkout_id,
+            },
+            status_code=200,
+            url=f"{self.base_url}v1/checkouts",
+            headers=JSON_HEADERS,
+            basic_payment=basic_payment,
+        )
+        checkout_response.pk = self.next_pk(VRPaymentCheckoutResponse)
+        checkout_response.created_at = checkout_response.last_modified = created_at
+        rows[VRPaymentBasicPayment].append(basic_payment)
+        rows[VRPaymentCheckoutResponse].append(checkout_response)
+        rows[VRPaymentIdentifier].append(VRPaymentIdentifier(identifier=checkout_id, basic_payment_id=basic_payment.pk))
+        if rng.random() < ABANDONED_SHARE:
+            return
+
+        payment_id = self.get_vr_pay_id()
+        basic_payment.payment_id = payment_id
+        rows[VRPaymentIdentifier].append(VRPaymentIdentifier(identifier=payment_id, basic_payment_id=basic_payment.pk))
+        final_result = self.choose(self.final_results)
+        results = [PENDING_RESULT] * self.choose(self.pending_responses) + [final_result]
+        if final_result[0].startswith("000.000.") and rng.random() < CHARGEBACK_SHARE:
+            results.append(CHARGEBACK_RESULT)
+        responded_at = created_at
+        for result in results:
+            if result is CHARGEBACK_RESULT:
+                responded_at += datetime.timedelta(days=rng.uniform(5, 40))
+            else:
+                responded_at += datetime.timedelta(seconds=rng.uniform(20, 900))
+            response_json = self.get_response_json(basic_payment, checkout_id, payment_id, result, responded_at)
+            status_response = VRPaymentBasicPaymentStatusResponse.objects.build_from_json(
+                dict(response_json),
+                status_code=200,
+                url=f"{self.base_url}v1/checkouts/{checkout_id}/payment",
+                headers=JSON_HEADERS,
+                basic_payment=basic_payment,
+            )
+            status_response.pk = self.next_pk(VRPaymentBasicPaymentStatusResponse)
+            status_response.created_at = status_response.last_modified = responded_at
+            rows[VRPaymentBasicPaymentStatusResponse].append(status_response)
+            if result is PENDING_RESULT or rng.random() >= WEBHOOK_SHARE:
+                continue
+
+            webhook_at = responded_at + datetime.timedelta(seconds=rng.uniform(1, 30))
+            webhook = VRPaymentWebhook(
+                pk=self.next_pk(VRPaymentWebhook),
+                webhook_type="payment",
+                created_at=webhook_at,
+                last_modified=webhook_at,
+            )
+            webhook.set_raw_payload(
+                {
+                    "Content-Type": "text/plain",
+                    "X-Initialization-Vector": f"{rng.getrandbits(96):024X}",
+                    "X-Authentication-Tag": f"{rng.getrandbits(128):032X}",
+                },
+                {"type": "PAYMENT", "payload": response_json},
+            )
+            payment_payload = VRPaymentWebhookPaymentPayload.objects.build_from_webhook(
+                webhook, url=WEBHOOK_URL, basic_payment_id=basic_payment.pk
+            )
+            payment_payload.pk = self.next_pk(VRPaymentWebhookPaymentPayload)
+            payment_payload.created_at = payment_payload.last_modified = webhook_at
+            rows[VRPaymentWebhook].append(webhook)
+            rows[VRPaymentWebhookPaymentPayload].append(payment_payload)
+
+
+def insert_rows(connection, model, instances: list, chunk_size: int = 1000):
+    """
+    insert instances with all their values as they are, i.e. including primary keys and
+    timestamps (auto_now and auto_now_add are not applied): by COPY on PostgreSQL, by executemany otherwise
+    """
+    if not instances:
+        return
+    fields = model._meta.local_concrete_fields
+    if connection.vendor == "postgresql":
+        _copy_rows(connection, model, fields, instances)
+        return
+    # the INSERT statement of one row, executed for all rows
+    query = InsertQuery(model)
+    query.insert_values(fields, instances[:1], raw=True)
+    compiler = query.get_compiler(connection=connection)
+    (sql, _params), = compiler.as_sql()
+    with connection.cursor() as cursor:
+        for start in range(0, len(instances), chunk_size):
+            cursor.executemany(
+                sql,
+                [
+                    [compiler.prepare_value(field, getattr(instance, field.attname)) for field in fields]
+                    for instance in instances[start:start + chunk_size]
+                ],
+            )
+
+
+def _copy_value(field, value) -> str:
+    """
+    `value` in the text format of COPY
+    """
+    if value is None:
+        return r"\N"
+    if isinstance(field, BinaryField):
+        # CompressedJSONField compresses here
+        text = "\\x" + bytes(field.get_prep_value(value)).hex()
+    elif isinstance(field, BaseJSONField):
+        text = json.dumps(value, cls=field.encoder or DjangoJSONEncoder)
+    elif isinstance(field, BooleanField):
+        text = "t" if value else "f"
+    elif isinstance(field, DateTimeField):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_rows(connection, model, fields: list, instances: list):
+    data = io.StringIO()
+    for instance in instances:
+        data.write("\t".join(_copy_value(field, getattr(instance, field.attname)) for field in fields))
+        data.write("\n")
+    data.seek(0)
+    quote_name = connection.ops.quote_name
+    sql = (
+        f"COPY {quote_name(model._meta.db_table)} "
+        f"({', '.join(quote_name(field.column) for field in fields)}) FROM STDIN"
+    )
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, "copy_expert"):
+            # psycopg2
+            cursor.cursor.copy_expert(sql, data)
+        else:
+            # psycopg 3
+            with cursor.cursor.copy(sql) as copy:
+                copy.write(data.getvalue())
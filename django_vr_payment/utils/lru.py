@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    a thread-safe in-process mapping that drops the least recently used key beyond `maxsize` entries.
+    Unlike functools.lru_cache, misses are not cached and keys can be set from outside.
+    """
+
+    def __init__(self, maxsize=None):
+        """
+        :param maxsize: int or a callable returning the current max size, e.g. to read it from the settings lazily
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_maxsize(self) -> int:
+        return self.maxsize() if callable(self.maxsize) else self.maxsize
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        maxsize = self.get_maxsize()
+        if not maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
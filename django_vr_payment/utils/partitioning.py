@@ -0,0 +1,105 @@
+import logging
+
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _get_status_response_model():
+    from ..models import VRPaymentBasicPaymentStatusResponse
+
+    return VRPaymentBasicPaymentStatusResponse
+
+
+def is_partitioned(table: str, using: str = "default") -> bool:
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def partition_status_responses(model=None, using: str = "default"):
+    """
+    recreate the (empty) status response table as a table range partitioned by created_at.
+    Only meant for new installs on PostgreSQL >= 11; the primary key becomes (id, created_at).
+    :param using: alias of the database, e.g. schema_editor.connection.alias in a migration
+    """
+    connection = connections[using]
+    model = model or _get_status_response_model()
+    table = model._meta.db_table
+    old_table = f"{table}_unpartitioned"
+    quote = connection.ops.quote_name
+    payment_table = model._meta.get_field("basic_payment").related_model._meta.db_table
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(table)})")
+        if cursor.fetchone()[0]:
+            raise DatabaseError(
+                f"{table} is not empty; partitioning is only supported for new installs"
+            )
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        # serial columns keep using the old sequence; hand it over before dropping the old table
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [old_table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'",
+            [table],
+        )
+        if sequence and not cursor.fetchone()[0]:
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id")
+        cursor.execute(f"DROP TABLE {quote(old_table)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, created_at)")
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table[:50] + '_bp_fk')} "
+            f"FOREIGN KEY (basic_payment_id) REFERENCES {quote(payment_table)} (id) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            f"CREATE INDEX {quote(table[:50] + '_bp_idx')} ON {quote(table)} (basic_payment_id)"
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT"
+        )
+    ensure_monthly_partitions(model=model, using=using)
+
+
+def ensure_monthly_partitions(months_ahead: int = 3, model=None, using: str = "default") -> list:
+    """
+    create monthly partitions <table>_pYYYYMM from the current month up to `months_ahead` months ahead
+    :return: names of the created partitions
+    """
+    model = model or _get_status_response_model()
+    table = model._meta.db_table
+    if not is_partitioned(table, using):
+        return []
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    created = []
+    month_start = timezone.now().date().replace(day=1)
+    for _ in range(months_ahead + 1):
+        next_month_start = (month_start + timezone.timedelta(days=32)).replace(day=1)
+        partition = f"{table}_p{month_start:%Y%m}"
+        try:
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(partition)} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    [month_start.isoformat(), next_month_start.isoformat()],
+                )
+            created.append(partition)
+        except DatabaseError as e:
+            # rows for this range already ended up in the default partition
+            logger.warning(f"could not create partition {partition}: {e}")
+        month_start = next_month_start
+    return created
@@ -0,0 +1,238 @@
+import heapq
+import logging
+import random
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, close_old_connections, connections
+from django.utils import timezone
+
+from .. import settings
+from .transaction_status import PENDING_STATUS_CATEGORIES, classify_result_code
+
+"""
+polling of pending payments
+
+Payments whose latest status response is pending only change when the shopper returns or a webhook arrives.
+`PendingPaymentPoller` keeps them in a priority queue ordered by the time of their next check and queries
+their status until it is final, waiting exponentially longer after every pending answer.
+Only one poller should run at a time, see `advisory_lock`; it stops once it no longer holds the lock.
+"""
+
+logger = logging.getLogger(__name__)
+
+POLLER_LOCK_KEY = zlib.crc32(b"django_vr_payment.poller")
+
+
+@contextmanager
+def advisory_lock(key: int, using: str = "default"):
+    """
+    try to take a session level advisory lock on PostgreSQL; yields whether it was taken.
+    Other databases have no advisory locks, there the lock is always taken.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+            except DatabaseError as e:
+                # the session is gone and so is its lock
+                logger.warning(f"could not release advisory lock {key}: {e}")
+
+
+def holds_advisory_lock(key: int, using: str = "default") -> bool:
+    """
+    whether the session of `using` still holds the advisory lock `key`, it is lost with the session,
+    e.g. when the connection was closed and reopened. Always True on other databases than PostgreSQL.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return True
+    try:
+        with connection.cursor() as cursor:
+            # a bigint key is stored split into classid and objid, objsubid 1 tells it from a pair of int keys
+            cursor.execute(
+                "SELECT EXISTS(SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted "
+                "AND pid = pg_backend_pid() AND objsubid = 1 AND ((classid::bigint << 32) | objid::bigint) = %s)",
+                [key],
+            )
+            return cursor.fetchone()[0]
+    except DatabaseError as e:
+        logger.warning(f"could not check advisory lock {key}: {e}")
+        return False
+
+
+def get_backoff(attempt: int, initial_delay: float, max_delay: float) -> float:
+    """
+    seconds until the next check after `attempt` pending answers, with +-10% jitter
+    """
+    delay = min(max_delay, initial_delay * 2 ** attempt)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def poll_payment(basic_payment_id: int) -> str:
+    """
+    query the status of one payment, by payment_id if known, by merchant_transaction_id otherwise
+    :return: the status category of the new status response
+    :raises ValueError: if no status response could be created from the answer
+    """
+    from ..models import VRPaymentBasicPayment
+    from ..wrapper.registry import get_wrapper
+
+    try:
+        basic_payment = VRPaymentBasicPayment.objects.for_return_view().get(pk=basic_payment_id)
+        wrapper = get_wrapper(basic_payment.entity_id, basic_payment.sandbox)
+        if basic_payment.payment_id:
+            status_response = wrapper.get_transaction_by_payment_id(basic_payment)
+        else:
+            status_response = wrapper.get_transaction_by_merchant_transaction_id(basic_payment)
+        if status_response is None:
+            # the response could not be parsed; not a final "unknown" status
+            raise ValueError("no status response could be created")
+        return classify_result_code(status_response.result_code)
+    finally:
+        # runs in a worker thread with its own connection
+        close_old_connections()
+
+
+class PendingPaymentPoller(object):
+    def __init__(
+        self,
+        max_in_flight: int = None,
+        initial_delay: float = None,
+        max_delay: float = None,
+        max_age_days: int = None,
+        refresh_interval: float = None,
+    ):
+        """
+        :param max_in_flight: max concurrent status queries, defaults to VR_PAYMENT_POLL_MAX_IN_FLIGHT
+        :param initial_delay: seconds before the second check, doubled after every pending answer
+        :param max_delay: max seconds between two checks
+        :param max_age_days: payments older than this are no longer polled
+        :param refresh_interval: seconds between two lookups of new pending payments in the database
+        """
+        self.max_in_flight = max_in_flight or settings.VR_PAYMENT_POLL_MAX_IN_FLIGHT
+        self.initial_delay = initial_delay or settings.VR_PAYMENT_POLL_INITIAL_DELAY
+        self.max_delay = max_delay or settings.VR_PAYMENT_POLL_MAX_DELAY
+        self.max_age = timezone.timedelta(
+            days=max_age_days or settings.VR_PAYMENT_POLL_MAX_AGE_DAYS
+        )
+        self.refresh_interval = refresh_interval or settings.VR_PAYMENT_POLL_REFRESH_INTERVAL
+        # heap of (next check as time.monotonic(), basic payment id, attempt, created_at)
+        self.queue = []
+        self.scheduled = set()
+        self.refreshed_at = None
+        self.lock_lost = False
+        self.stats = {"polled": 0, "final": 0, "errors": 0, "expired": 0}
+
+    def get_pending_payments(self):
+        from ..managers import status_category_q
+        from ..models import VRPaymentBasicPayment, VRPaymentBasicPaymentStatusResponse
+
+        since = timezone.now() - self.max_age
+        # a payment whose latest status is pending has a pending status response (django_vr_p_status_pending_idx)
+        with_pending_response = VRPaymentBasicPaymentStatusResponse._base_manager.filter(
+            status_category_q(*PENDING_STATUS_CATEGORIES), created_at__gte=since
+        ).values("basic_payment_id")
+        return (
+            VRPaymentBasicPayment.objects.filter(created_at__gte=since, pk__in=with_pending_response)
+            .annotate_latest_response("status_category")
+            .filter(latest_response_status_category__in=PENDING_STATUS_CATEGORIES)
+            .values_list("pk", "created_at")
+        )
+
+    def refresh(self) -> int:
+        """
+        add pending payments that are not scheduled yet; they are checked right away
+        :return: number of added payments
+        """
+        now = time.monotonic()
+        added = 0
+        for pk, created_at in self.get_pending_payments().iterator():
+            if pk not in self.scheduled:
+                self.schedule(pk, created_at, now, 0)
+                added += 1
+        self.refreshed_at = now
+        return added
+
+    def schedule(self, pk: int, created_at, at: float, attempt: int):
+        self.scheduled.add(pk)
+        heapq.heappush(self.queue, (at, pk, attempt, created_at))
+
+    def reschedule(self, pk: int, created_at, attempt: int):
+        if created_at < timezone.now() - self.max_age:
+            self.scheduled.discard(pk)
+            self.stats["expired"] += 1
+            return
+        at = time.monotonic() + get_backoff(attempt, self.initial_delay, self.max_delay)
+        heapq.heappush(self.queue, (at, pk, attempt + 1, created_at))
+
+    def run(self, should_stop=lambda: False, lock_key: int = None):
+        """
+        poll until `should_stop()` returns True
+        :param lock_key: advisory lock held by the caller, polling stops and `lock_lost` is set once it is lost
+        """
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while not should_stop():
+                if lock_key is not None and not holds_advisory_lock(lock_key):
+                    logger.warning("lost the poller lock, stopping")
+                    self.lock_lost = True
+                    break
+                if (
+                    self.refreshed_at is None
+                    or time.monotonic() - self.refreshed_at > self.refresh_interval
+                ):
+                    self.refresh()
+                while (
+                    self.queue
+                    and self.queue[0][0] <= time.monotonic()
+                    and len(in_flight) < self.max_in_flight
+                ):
+                    _at, pk, attempt, created_at = heapq.heappop(self.queue)
+                    in_flight[executor.submit(poll_payment, pk)] = (pk, attempt, created_at)
+                # wake up for the next due payment, unless all slots are taken anyway
+                timeout = 1
+                if self.queue and len(in_flight) < self.max_in_flight:
+                    timeout = min(timeout, max(0, self.queue[0][0] - time.monotonic()))
+                if not in_flight:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.handle_result(future, *in_flight.pop(future))
+            for future in wait(in_flight).done:
+                self.handle_result(future, *in_flight.pop(future))
+
+    def handle_result(self, future, pk: int, attempt: int, created_at):
+        self.stats["polled"] += 1
+        try:
+            category = future.result()
+        except ObjectDoesNotExist:
+            # deleted in the meantime
+            self.scheduled.discard(pk)
+            return
+        except Exception as e:
+            # e.g. requests.RequestException or an unparsable answer; try again later
+            logger.warning(f"polling payment {pk} failed: {e}")
+            self.stats["errors"] += 1
+            self.reschedule(pk, created_at, attempt)
+            return
+        if category in PENDING_STATUS_CATEGORIES:
+            self.reschedule(pk, created_at, attempt)
+        else:
+            logger.info(f"payment {pk} is {category}")
+            self.scheduled.discard(pk)
+            self.stats["final"] += 1
@@ -0,0 +1,224 @@
+import json
+import logging
+import queue
+import select
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+
+from .. import settings
+from .transaction_status import PENDING_STATUS_CATEGORIES, STATUS_UNKNOWN, classify_result_code
+
+"""
+publish/subscribe of payment status changes, e.g. for VRPaymentStatusEventsView
+
+Every saved status response and webhook payload is published on the channel of its merchant transaction id
+once its transaction commits (see publish_status). Subscribers get the messages of their channel through a
+queue. The "local" backend only reaches subscribers of the same process; with several processes (e.g. gunicorn
+workers) use the "postgresql" backend: messages are sent with NOTIFY and every process receives them on
+one LISTEN connection, opened by the first subscriber.
+"""
+
+logger = logging.getLogger(__name__)
+
+# the one NOTIFY channel of the postgresql backend; the payload names the channel of the message
+NOTIFY_CHANNEL = "django_vr_payment_status"
+
+
+class Subscription(object):
+    """
+    the messages of one channel for one subscriber; close it (or use it as context manager) when done
+    """
+
+    def __init__(self, broker, channel: str):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue()
+
+    def get(self, timeout: float = None):
+        """
+        :return: the next message, or None if there was none within `timeout` seconds
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LocalBroker(object):
+    """
+    delivers messages to the subscribers of this process
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel: str, message: dict):
+        self.deliver(channel, message)
+
+    def deliver(self, channel: str, message: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.queue.put(message)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    publishes with NOTIFY, so the subscribers of all processes get the message; a daemon thread per process
+    LISTENs on its own connection and delivers to the local subscribers
+    """
+
+    def __init__(self, using: str = "default"):
+        super().__init__()
+        self.using = using
+        self._listener = None
+
+    def publish(self, channel: str, message: dict):
+        payload = json.dumps({"channel": channel, "message": message}, cls=DjangoJSONEncoder)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+
+    def subscribe(self, channel: str) -> Subscription:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="vr-payment-listen", daemon=True)
+                self._listener.start()
+        return super().subscribe(channel)
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_on_new_connection()
+            except Exception as e:
+                logger.warning(f"LISTEN {NOTIFY_CHANNEL} failed, reconnecting: {e}")
+                threading.Event().wait(1)
+
+    def _listen_on_new_connection(self, timeout: float = 5):
+        database = connections[self.using]
+        # a plain driver connection: django's connection of this thread is not meant to be kept busy forever
+        connection = database.get_new_connection(database.get_connection_params())
+        payloads = []
+        try:
+            connection.autocommit = True
+            if hasattr(connection, "add_notify_handler"):
+                # psycopg 3 passes notifications to its handlers while a statement runs
+                connection.add_notify_handler(lambda notify: payloads.append(notify.payload))
+            cursor = connection.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while True:
+                if select.select([connection], [], [], timeout) == ([], [], []):
+                    continue
+                if hasattr(connection, "poll"):
+                    # psycopg2
+                    connection.poll()
+                    while connection.notifies:
+                        payloads.append(connection.notifies.pop(0).payload)
+                else:
+                    cursor.execute("SELECT 1")
+                for payload in payloads:
+                    data = json.loads(payload)
+                    self.deliver(data["channel"], data["message"])
+                del payloads[:]
+        finally:
+            connection.close()
+
+
+BROKERS = {"local": LocalBroker, "postgresql": PostgresBroker}
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    the broker of VR_PAYMENT_PUBSUB_BACKEND of this process
+    """
+    backend = settings.VR_PAYMENT_PUBSUB_BACKEND
+    with _brokers_lock:
+        if backend not in _brokers:
+            if backend not in BROKERS:
+                raise ValueError(f"unknown VR_PAYMENT_PUBSUB_BACKEND '{backend}'")
+            _brokers[backend] = BROKERS[backend]()
+        return _brokers[backend]
+
+
+def get_status_channel(merchant_transaction_id: str) -> str:
+    return f"status:{merchant_transaction_id}"
+
+
+def get_status_message(vr_response) -> dict:
+    """
+    the status of a status response or webhook payload as published
+    """
+    status_category = classify_result_code(vr_response.result_code)
+    return {
+        "source": vr_response._meta.model_name,
+        "id": vr_response.pk,
+        "result_code": vr_response.result_code,
+        "status_category": status_category,
+        "final": status_category not in PENDING_STATUS_CATEGORIES and status_category != STATUS_UNKNOWN,
+    }
+
+
+def publish_status(vr_response, using: str = "default"):
+    """
+    publish the status of a just saved status response or webhook payload on the channel of its
+    merchant transaction id once the current transaction commits
+    """
+    if not vr_response.merchant_transaction_id:
+        return
+    channel = get_status_channel(vr_response.merchant_transaction_id)
+    message = get_status_message(vr_response)
+
+    def publish():
+        try:
+            get_broker().publish(channel, message)
+        except Exception as e:
+            # subscribers catch up from the database, see VRPaymentStatusEventsView
+            logger.warning(f"publishing the status of {channel} failed: {e}")
+
+    transaction.on_commit(publish, using=using)
+
+
+def get_latest_status(basic_payment_id: int):
+    """
+    the message of the latest status response or webhook payload of a payment, None if there is none
+    """
+    from ..models import VRPaymentBasicPaymentStatusResponse, VRPaymentWebhookPaymentPayload
+
+    latest = None
+    for model in (VRPaymentBasicPaymentStatusResponse, VRPaymentWebhookPaymentPayload):
+        vr_response = (
+            model._base_manager.filter(basic_payment_id=basic_payment_id)
+            .only("pk", "result_code", "created_at", "merchant_transaction_id")
+            .order_by("-pk")
+            .first()
+        )
+        if vr_response is not None and (latest is None or vr_response.created_at > latest.created_at):
+            latest = vr_response
+    return get_status_message(latest) if latest is not None else None
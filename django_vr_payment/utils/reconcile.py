@@ -0,0 +1,295 @@
+import csv
+import json
+from array import array
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from .transaction_status import SUCCESSFUL_STATUS_CATEGORIES, STATUS_UNKNOWN, classify_result_code
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+"""
+reconciliation of VR Pay transaction or settlement reports with the basic payments
+
+The report is streamed in chunks: the payments of a chunk are resolved by their payment id (identifier table)
+or merchant transaction id and loaded with their latest status in bulk, i.e. a few queries per chunk instead
+of one per line, and the lines are matched against them in memory. Only mismatches are yielded. The ids of
+matched payments are kept in a compact array, so payments missing in the report are found by one merge
+with the payments of the reported period in the end.
+"""
+
+MISSING_PAYMENT = "missing_payment"
+MISSING_IN_REPORT = "missing_in_report"
+AMOUNT_MISMATCH = "amount"
+STATUS_MISMATCH = "status"
+INVALID_LINE = "invalid"
+
+# report field -> column (csv header or json key, dotted for nested json objects)
+DEFAULT_REPORT_COLUMNS = {
+    "payment_id": "id",
+    "merchant_transaction_id": "merchantTransactionId",
+    "amount": "amount",
+    "currency": "currency",
+    "result_code": "result.code",
+    "payment_type": "paymentType",
+}
+REPORT_FORMATS = ("csv", "jsonl", "json")
+MISMATCH_COLUMNS = [
+    "mismatch",
+    "line",
+    "basic_payment_id",
+    "merchant_transaction_id",
+    "payment_id",
+    "report_amount",
+    "amount",
+    "report_currency",
+    "currency",
+    "report_result_code",
+    "result_code",
+    "report_status_category",
+    "status_category",
+]
+
+
+class ReportError(ValueError):
+    pass
+
+
+def read_report(path: str, report_format: str, delimiter: str = ",", json_prefix: str = "item"):
+    """
+    stream the lines of a report as dicts; a line that cannot be parsed is yielded as ReportError, so
+    Reconciliation reports it as INVALID_LINE and goes on with the next one
+    :param report_format: one of REPORT_FORMATS; json (a document with an array of lines at `json_prefix`,
+        see ijson.items) requires the 'ijson' package
+    """
+    if report_format == "csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as report:
+            reader = csv.DictReader(report, delimiter=delimiter)
+            while True:
+                try:
+                    yield next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    yield ReportError(f"line {reader.line_num}: {e}")
+    elif report_format == "jsonl":
+        with open(path, "r", encoding="utf8") as report:
+            for number, line in enumerate(report, 1):
+                if not line.strip():
+                    continue
+                try:
+                    line = json.loads(line)
+                except ValueError as e:
+                    yield ReportError(f"line {number}: {e}")
+                    continue
+                yield line if isinstance(line, dict) else ReportError(f"line {number}: not an object")
+    elif report_format == "json":
+        if ijson is None:
+            raise ReportError("json reports require the 'ijson' package; convert the report to jsonl otherwise")
+        with open(path, "rb") as report:
+            yield from ijson.items(report, json_prefix)
+    else:
+        raise ReportError(f"unknown report format '{report_format}'")
+
+
+def get_report_value(line: dict, column: str):
+    if column in line:
+        return line[column]
+    value = line
+    for key in column.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def parse_amount(value):
+    """
+    the amount of a report line as Decimal, None if empty. A single comma is the decimal separator,
+    of "." and "," the last one is, e.g. "1.234,50" and "1,234.50" are both 1234.50
+    """
+    if value is None or value == "":
+        return None
+    value = str(value).strip()
+    if "," in value and "." in value:
+        value = value.replace("," if value.rindex(".") > value.rindex(",") else ".", "")
+    try:
+        return Decimal(value.replace(",", "."))
+    except InvalidOperation:
+        raise ReportError(f"invalid amount '{value}'")
+
+
+class Reconciliation(object):
+    def __init__(self, columns: dict = None, chunk_size: int = 5000, date_from=None, date_to=None):
+        """
+        :param columns: report columns of the fields of DEFAULT_REPORT_COLUMNS that differ from the defaults
+        :param chunk_size: report lines matched at once
+        :param date_from: with `date_to`: payments created in [date_from, date_to) with a successful latest status
+            that are not in the report are yielded as MISSING_IN_REPORT
+        """
+        self.columns = dict(DEFAULT_REPORT_COLUMNS, **(columns or {}))
+        self.chunk_size = chunk_size
+        self.date_from = date_from
+        self.date_to = date_to
+        self.matched_ids = array("q")
+        self.stats = {
+            "lines": 0,
+            "matched": 0,
+            "referenced": 0,
+            MISSING_PAYMENT: 0,
+            AMOUNT_MISMATCH: 0,
+            STATUS_MISMATCH: 0,
+            INVALID_LINE: 0,
+            MISSING_IN_REPORT: 0,
+        }
+
+    def run(self, lines):
+        """
+        match the report lines with the basic payments
+        :return: an iterator of mismatches, dicts with MISMATCH_COLUMNS
+        """
+        lines = enumerate(lines, 1)
+        while True:
+            chunk = list(islice(lines, self.chunk_size))
+            if not chunk:
+                break
+            yield from self.reconcile_chunk(chunk)
+        if self.date_from is not None and self.date_to is not None:
+            yield from self.iter_missing_in_report()
+
+    def read_line(self, line: dict) -> dict:
+        values = {}
+        for field, column in self.columns.items():
+            value = get_report_value(line, column)
+            values[field] = (str(value).strip() if value is not None else "") or None
+        return values
+
+    def get_payments(self, basic_payment_ids) -> dict:
+        """
+        the basic payments with their latest status by id, one query
+        """
+        from ..models import VRPaymentBasicPayment
+
+        if not basic_payment_ids:
+            return {}
+        payments = (
+            VRPaymentBasicPayment.objects.filter(pk__in=basic_payment_ids)
+            .annotate_latest_response("result_code", "status_category")
+            .values(
+                "pk",
+                "merchant_transaction_id",
+                "payment_id",
+                "amount",
+                "currency",
+                "payment_type",
+                "latest_response_result_code",
+                "latest_response_status_category",
+            )
+        )
+        return {payment["pk"]: payment for payment in payments}
+
+    def reconcile_chunk(self, chunk: list):
+        from ..models import VRPaymentIdentifier
+
+        report_lines = []
+        for number, line in chunk:
+            self.stats["lines"] += 1
+            if isinstance(line, ReportError):
+                self.stats[INVALID_LINE] += 1
+                yield self.get_mismatch(INVALID_LINE, number, {})
+                continue
+            values = self.read_line(line)
+            try:
+                values["amount"] = parse_amount(values["amount"])
+            except ReportError:
+                values["amount"] = None
+                self.stats[INVALID_LINE] += 1
+                yield self.get_mismatch(INVALID_LINE, number, values)
+                continue
+            if not values["payment_id"] and not values["merchant_transaction_id"]:
+                self.stats[INVALID_LINE] += 1
+                yield self.get_mismatch(INVALID_LINE, number, values)
+                continue
+            report_lines.append((number, values))
+
+        basic_payment_ids = VRPaymentIdentifier.objects.resolve_many(
+            [((values["payment_id"],), values["merchant_transaction_id"]) for _, values in report_lines]
+        )
+        payments = self.get_payments({pk for pk in basic_payment_ids if pk is not None})
+        for (number, values), basic_payment_id in zip(report_lines, basic_payment_ids):
+            payment = payments.get(basic_payment_id)
+            if payment is None:
+                self.stats[MISSING_PAYMENT] += 1
+                yield self.get_mismatch(MISSING_PAYMENT, number, values)
+                continue
+            self.matched_ids.append(basic_payment_id)
+            if values["payment_type"] and values["payment_type"] != payment["payment_type"]:
+                # e.g. a refund or capture referencing the payment
+                self.stats["referenced"] += 1
+                continue
+            self.stats["matched"] += 1
+            if values["amount"] is not None and (
+                values["amount"] != payment["amount"]
+                or (values["currency"] and values["currency"] != payment["currency"])
+            ):
+                self.stats[AMOUNT_MISMATCH] += 1
+                yield self.get_mismatch(AMOUNT_MISMATCH, number, values, payment)
+            if values["result_code"] and classify_result_code(values["result_code"]) != (
+                payment["latest_response_status_category"] or STATUS_UNKNOWN
+            ):
+                self.stats[STATUS_MISMATCH] += 1
+                yield self.get_mismatch(STATUS_MISMATCH, number, values, payment)
+
+    def iter_missing_in_report(self, chunk_size: int = 2000):
+        """
+        successful payments of the period that were not matched, by merging the sorted matched ids
+        with the payments of the period in primary key order
+        """
+        from ..models import VRPaymentBasicPayment
+
+        matched_ids = array("q", sorted(set(self.matched_ids)))
+        payments = (
+            VRPaymentBasicPayment.objects.filter(created_at__gte=self.date_from, created_at__lt=self.date_to)
+            .annotate_latest_response("result_code", "status_category")
+            .filter(latest_response_status_category__in=SUCCESSFUL_STATUS_CATEGORIES)
+            .order_by("pk")
+            .values(
+                "pk",
+                "merchant_transaction_id",
+                "payment_id",
+                "amount",
+                "currency",
+                "latest_response_result_code",
+                "latest_response_status_category",
+            )
+        )
+        index = 0
+        for payment in payments.iterator(chunk_size=chunk_size):
+            while index < len(matched_ids) and matched_ids[index] < payment["pk"]:
+                index += 1
+            if index < len(matched_ids) and matched_ids[index] == payment["pk"]:
+                continue
+            self.stats[MISSING_IN_REPORT] += 1
+            yield self.get_mismatch(MISSING_IN_REPORT, None, {}, payment)
+
+    def get_mismatch(self, mismatch: str, number, values: dict, payment: dict = None) -> dict:
+        payment = payment or {}
+        report_result_code = values.get("result_code")
+        return {
+            "mismatch": mismatch,
+            "line": number,
+            "basic_payment_id": payment.get("pk"),
+            "merchant_transaction_id": values.get("merchant_transaction_id") or payment.get("merchant_transaction_id"),
+            "payment_id": values.get("payment_id") or payment.get("payment_id"),
+            "report_amount": values.get("amount"),
+            "amount": payment.get("amount"),
+            "report_currency": values.get("currency"),
+            "currency": payment.get("currency"),
+            "report_result_code": report_result_code,
+            "result_code": payment.get("latest_response_result_code"),
+            "report_status_category": classify_result_code(report_result_code) if report_result_code else None,
+            "status_category": payment.get("latest_response_status_category"),
+        }
@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.db import connections, transaction
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+from .compression import decompress_json
+from .webhooks import decrypt_webhook
+
+"""
+replay of webhooks, e.g. after an outage
+
+Webhooks are read from a jsonl export (one encrypted webhook `{"headers": {...}, "body": "<hex>"}`
+or one decrypted webhook body per line) or from the stored VRPaymentWebhooks, and their
+VRPaymentWebhookPaymentPayloads are derived again. Records are streamed in batches: a process pool
+decrypts and parses one batch while the previous one is written with bulk inserts, and the position
+of the last written batch is saved in a checkpoint file to resume an interrupted replay.
+"""
+
+logger = logging.getLogger(__name__)
+
+STORED_SOURCE = "stored"
+
+
+def _setup_worker():
+    # workers never touch the database (a forked worker shares the connection of its parent),
+    # but spawned workers need django for the compression dictionary setting
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _load_json(text, blob):
+    if text is not None:
+        return json.loads(text)
+    if blob is not None:
+        _setup_worker()
+        return decompress_json(blob)
+    return None
+
+
+def decode_record(record: tuple) -> tuple:
+    """
+    decrypt and parse one record in a worker process
+    :param record: (position, "line", (line, config key)) or (position, "stored", (headers text, headers blob, body text, body blob))
+    :return: (position, headers, body, error)
+    """
+    position, kind, data = record
+    try:
+        if kind == STORED_SOURCE:
+            headers_text, headers_blob, body_text, body_blob = data
+            headers = _load_json(headers_text, headers_blob)
+            if isinstance(headers, str):
+                # raw_headers holds a json dump
+                headers = json.loads(headers)
+            return position, headers, _load_json(body_text, body_blob), None
+        line, config_key = data
+        value = json.loads(line)
+        if "body" in value and "headers" in value:
+            headers = value["headers"]
+            decrypted = decrypt_webhook(
+                config_key=config_key,
+                Initialization_vector=headers["X-Initialization-Vector"],
+                auth_tag=headers["X-Authentication-Tag"],
+                http_body=value["body"],
+            )
+            return position, headers, json.loads(decrypted.decode("utf8")), None
+        return position, {}, value, None
+    except Exception as e:
+        return position, None, None, f"{type(e).__name__}: {e}"
+
+
+def iter_file_records(path: str, config_key: str, start: int = 0):
+    """
+    stream the lines of a jsonl export; the position is the line number
+    """
+    with open(path, "r", encoding="utf8") as export:
+        for position, line in enumerate(export, 1):
+            if position <= start or not line.strip():
+                continue
+            yield position, "line", (line, config_key)
+
+
+def iter_stored_records(start: int = 0, rederive: bool = False, chunk_size: int = 2000):
+    """
+    stream the raw json of stored payment webhooks without a payload (all payment webhooks with `rederive`);
+    the position is the webhook's primary key
+    """
+    from ..models import VRPaymentWebhook
+
+    queryset = VRPaymentWebhook.objects.filter(webhook_type="payment", pk__gt=start)
+    if not rederive:
+        queryset = queryset.filter(payment_payload__isnull=True)
+    rows = (
+        queryset.order_by("pk")
+        .annotate(
+            headers_text=Cast("raw_headers", TextField()),
+            body_text=Cast("decrypted_body", TextField()),
+        )
+        .values_list("pk", "headers_text", "compressed_headers", "body_text", "compressed_body")
+    )
+    for pk, headers_text, headers_blob, body_text, body_blob in rows.iterator(chunk_size=chunk_size):
+        yield pk, STORED_SOURCE, (
+            headers_text,
+            bytes(headers_blob) if headers_blob is not None else None,
+            body_text,
+            bytes(body_blob) if body_blob is not None else None,
+        )
+
+
+class ReplayCheckpoint(object):
+    """
+    the last written position per source in a json file, written atomically
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.positions = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf8") as checkpoint_file:
+                self.positions = json.load(checkpoint_file)
+
+    def get(self, source: str) -> int:
+        return self.positions.get(source, 0)
+
+    def save(self, source: str, position: int):
+        self.positions[source] = position
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as checkpoint_file:
+            json.dump(self.positions, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class WebhookReplay(object):
+    def __init__(
+        self,
+        source: str = STORED_SOURCE,
+        config_key: str = None,
+        checkpoint: ReplayCheckpoint = None,
+        workers: int = None,
+        batch_size: int = 500,
+        rederive: bool = False,
+        url: str = "",
+    ):
+        """
+        :param source: path of a jsonl export or STORED_SOURCE
+        :param config_key: key to decrypt encrypted webhooks of the export, defaults to VR_PAYMENT_CONFIG_KEY
+        :param workers: processes decrypting and parsing, defaults to the number of cpus; 1 decodes in this process
+        :param rederive: replace existing payloads of stored webhooks
+        :param url: stored as url of the derived payloads
+        """
+        from .. import settings
+
+        self.source = source
+        self.config_key = config_key or settings.VR_PAYMENT_CONFIG_KEY
+        self.checkpoint = checkpoint or ReplayCheckpoint()
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.rederive = rederive
+        self.url = url
+        self.stats = {"read": 0, "replayed": 0, "skipped": 0, "errors": 0}
+
+    def get_records(self):
+        start = self.checkpoint.get(self.source)
+        if self.source == STORED_SOURCE:
+            return iter_stored_records(start, rederive=self.rederive)
+        return iter_file_records(self.source, self.config_key, start)
+
+    def run(self) -> dict:
+        """
+        decode batch n+1 in the worker processes while batch n is written
+        :return: stats
+        """
+        if self.workers <= 1:
+            for batch in _batched(self.get_records(), self.batch_size):
+                self.write(batch, list(map(decode_record, batch)))
+            return self.stats
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            previous = None
+            for batch in _batched(self.get_records(), self.batch_size):
+                decoded = executor.map(
+                    decode_record, batch, chunksize=max(1, len(batch) // (self.workers * 4))
+                )
+                if previous is not None:
+                    self.write(*previous)
+                previous = batch, decoded
+            if previous is not None:
+                self.write(*previous)
+        return self.stats
+
+    def write(self, batch: list, decoded):
+        """
+        save the webhooks (export only) and payloads of one batch, then move the checkpoint past it
+        """
+        from ..models import VRPaymentWebhook
+
+        webhooks = []
+        for position, headers, body, error in decoded:
+            self.stats["read"] += 1
+            if error:
+                logger.error(f"webhook {position} of {self.source} could not be decoded: {error}")
+                self.stats["errors"] += 1
+                continue
+            if self.source == STORED_SOURCE:
+                webhook = VRPaymentWebhook(pk=position, webhook_type="payment")
+                webhook._state.adding = False
+            else:
+                webhook = VRPaymentWebhook(
+                    webhook_type=(body.get("type") or "").lower(),
+                    webhook_action=body["action"].lower() if body.get("action") else None,
+                )
+            webhook.set_raw_payload(headers, body)
+            webhooks.append(webhook)
+
+        with transaction.atomic():
+            if self.source != STORED_SOURCE:
+                webhooks = self.skip_known(webhooks)
+                self.save_webhooks(webhooks)
+            self.save_payloads([webhook for webhook in webhooks if webhook.webhook_type == "payment"])
+        self.checkpoint.save(self.source, batch[-1][0])
+
+    def skip_known(self, webhooks: list) -> list:
+        """
+        drop webhooks that are stored already, e.g. when the same export is replayed twice, or that occur twice in the batch;
+        webhooks of any type are identified by the hash of their headers and body
+        """
+        from ..models import VRPaymentWebhook
+
+        known = set(
+            VRPaymentWebhook.objects.filter(
+                content_hash__in={webhook.content_hash for webhook in webhooks}
+            ).values_list("content_hash", flat=True)
+        )
+        unknown = []
+        for webhook in webhooks:
+            if webhook.content_hash in known:
+                continue
+            known.add(webhook.content_hash)
+            unknown.append(webhook)
+        self.stats["skipped"] += len(webhooks) - len(unknown)
+        return unknown
+
+    def save_webhooks(self, webhooks: list):
+        from ..models import VRPaymentWebhook
+
+        if connections[VRPaymentWebhook.objects.db].features.can_return_rows_from_bulk_insert:
+            VRPaymentWebhook.objects.bulk_create(webhooks)
+        else:
+            # the payloads need the primary keys of the webhooks
+            for webhook in webhooks:
+                webhook.save()
+
+    def save_payloads(self, webhooks: list):
+        from ..models import VRPaymentIdentifier, VRPaymentWebhookPaymentPayload
+
+        payloads = [(webhook.body or {}).get("payload") or {} for webhook in webhooks]
+        basic_payment_ids = VRPaymentIdentifier.objects.resolve_many(
+            [
+                ((payload.get("id"), payload.get("referencedId")), payload.get("merchantTransactionId"))
+                for payload in payloads
+            ]
+        )
+        payment_payloads = []
+        for webhook, basic_payment_id in zip(webhooks, basic_payment_ids):
+            if basic_payment_id is None:
+                self.stats["skipped"] += 1
+                continue
+            payment_payload = VRPaymentWebhookPaymentPayload.objects.build_from_webhook(
+                webhook, url=self.url, basic_payment_id=basic_payment_id
+            )
+            if payment_payload is None:
+                self.stats["skipped"] += 1
+                continue
+            payment_payloads.append(payment_payload)
+        if self.rederive:
+            VRPaymentWebhookPaymentPayload.objects.filter(
+                webhook__in=[payment_payload.webhook_id for payment_payload in payment_payloads]
+            ).delete()
+        VRPaymentWebhookPaymentPayload.objects.bulk_create(payment_payloads)
+        # status events and status messages of the replayed status changes
+        VRPaymentWebhookPaymentPayload.objects.record_bulk_created(payment_payloads)
+        self.stats["replayed"] += len(payment_payloads)
@@ -1,4 +1,6 @@
+import itertools
 import re
+from functools import lru_cache
 
 """
 checks for VR Payment result codes
@@ -13,6 +15,29 @@ TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX = (
 TRANSACTION_PENDING_REGEX = r"^(000\.200)"
 TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX = r"^(800\.400\.5|100\.400\.500)"
 
+TRANSACTION_REJECTED_3DSECURE_RISK_REGEX = r"^(000\.400\.[1][0-9][1-9]|000\.400\.2)"
+TRANSACTION_REJECTED_BANK_REGEX = r"^(800\.[17]00|800\.800\.[123])"
+TRANSACTION_REJECTED_COMMUNICATIONS_ERROR_REGEX = r"^(900\.[1234]00|000\.400\.030)"
+TRANSACTION_REJECTED_SYSTEMS_ERROR_REGEX = r"^(800\.[56]|999\.|600\.1|800\.800\.[84])"
+TRANSACTION_REJECTED_ASYNC_ERROR_REGEX = r"^(100\.39[765])"
+TRANSACTION_REJECTED_SOFT_DECLINE_REGEX = r"^(300\.100\.100)"
+TRANSACTION_REJECTED_RISK_HANDLING_EXTERNAL_RISK_SYSTEM_REGEX = r"^(100\.400\.[0-3]|100\.38|100\.370\.100|100\.370\.11)"
+TRANSACTION_REJECTED_RISK_HANDLING_ADDRESS_VALIDATION_REGEX = r"^(800\.400\.1)"
+TRANSACTION_REJECTED_RISK_HANDLING_3DSECURE_REGEX = r"^(800\.400\.2|100\.380\.4|100\.390)"
+TRANSACTION_REJECTED_RISK_HANDLING_BLACKLIST_VALIDATION_REGEX = r"^(100\.100\.701|800\.[32])"
+TRANSACTION_REJECTED_RISK_HANDLING_RISK_VALIDATION_REGEX = r"^(800\.1[123456]0)"
+TRANSACTION_REJECTED_CONFIGURATION_VALIDATION_REGEX = r"^(600\.[23]|500\.[12]|800\.121)"
+TRANSACTION_REJECTED_REGISTRATION_VALIDATION_REGEX = r"^(100\.[13]50)"
+TRANSACTION_REJECTED_JOB_VALIDATION_REGEX = r"^(100\.250|100\.360)"
+TRANSACTION_REJECTED_REFERENCE_VALIDATION_REGEX = r"^(700\.[1345][05]0)"
+TRANSACTION_REJECTED_FORMAT_VALIDATION_REGEX = r"^(200\.[123]|100\.[53][07]|800\.900|100\.[69]00\.500)"
+TRANSACTION_REJECTED_ADDRESS_VALIDATION_REGEX = r"^(100\.800)"
+TRANSACTION_REJECTED_CONTACT_VALIDATION_REGEX = r"^(100\.[97]00)"
+TRANSACTION_REJECTED_ACCOUNT_VALIDATION_REGEX = r"^(100\.100|100.2[01])"
+TRANSACTION_REJECTED_AMOUNT_VALIDATION_REGEX = r"^(100\.55)"
+TRANSACTION_REJECTED_RISK_MANAGEMENT_REGEX = r"^(100\.380\.[23]|100\.380\.101)"
+TRANSACTION_CHARGEBACK_RELATED_REGEX = r"^(000\.100\.2)"
+
 
 def check_transaction_status(regex, result_code: str) -> bool:
     return True if re.search(regex, result_code) else False
@@ -126,8 +151,7 @@ def check_transaction_rejected_3dsecure_risk(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(000\.400\.[1][0-9][1-9]|000\.400\.2)/
     """
-    regex = r"^(000\.400\.[1][0-9][1-9]|000\.400\.2)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_3DSECURE_RISK_REGEX, result_code)
 
 
 def check_transaction_rejected_bank(result_code: str) -> bool:
@@ -136,8 +160,7 @@ def check_transaction_rejected_bank(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(800\.[17]00|800\.800\.[123])/
     """
-    regex = r"^(800\.[17]00|800\.800\.[123])"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_BANK_REGEX, result_code)
 
 
 def check_transaction_rejected_communications_error(result_code: str) -> bool:
@@ -146,8 +169,7 @@ def check_transaction_rejected_communications_error(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(900\.[1234]00|000\.400\.030)/
     """
-    regex = r"^(900\.[1234]00|000\.400\.030)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_COMMUNICATIONS_ERROR_REGEX, result_code)
 
 
 def check_transaction_rejected_systems_error(result_code: str) -> bool:
@@ -156,8 +178,7 @@ def check_transaction_rejected_systems_error(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(800\.[56]|999\.|600\.1|800\.800\.[84])/
     """
-    regex = r"^(800\.[56]|999\.|600\.1|800\.800\.[84])"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_SYSTEMS_ERROR_REGEX, result_code)
 
 
 def check_transaction_rejected_async_error(result_code: str) -> bool:
@@ -166,8 +187,7 @@ def check_transaction_rejected_async_error(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.39[765])/
     """
-    regex = r"^(100\.39[765])"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_ASYNC_ERROR_REGEX, result_code)
 
 
 def check_transaction_rejected_soft_decline(result_code: str) -> bool:
@@ -176,8 +196,7 @@ def check_transaction_rejected_soft_decline(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(300\.100\.100)/
     """
-    regex = r"^(300\.100\.100)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_SOFT_DECLINE_REGEX, result_code)
 
 
 ########################################
@@ -195,8 +214,7 @@ def check_transaction_rejected_risk_handling_external_risk_system(
 
     The regular expression pattern for filtering out this group is: /^(100\.400\.[0-3]|100\.38|100\.370\.100|100\.370\.11)/
     """
-    regex = r"^(100\.400\.[0-3]|100\.38|100\.370\.100|100\.370\.11)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_RISK_HANDLING_EXTERNAL_RISK_SYSTEM_REGEX, result_code)
 
 
 def check_transaction_rejected_risk_handling_address_validation(
@@ -207,8 +225,7 @@ def check_transaction_rejected_risk_handling_address_validation(
 
     The regular expression pattern for filtering out this group is: /^(800\.400\.1)/
     """
-    regex = r"^(800\.400\.1)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_RISK_HANDLING_ADDRESS_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_risk_handling_3dsecure(result_code: str) -> bool:
@@ -217,8 +234,7 @@ def check_transaction_rejected_risk_handling_3dsecure(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(800\.400\.2|100\.380\.4|100\.390)/
     """
-    regex = r"^(800\.400\.2|100\.380\.4|100\.390)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_RISK_HANDLING_3DSECURE_REGEX, result_code)
 
 
 def check_transaction_rejected_risk_handling_blacklist_validation(
@@ -229,8 +245,7 @@ def check_transaction_rejected_risk_handling_blacklist_validation(
 
     The regular expression pattern for filtering out this group is: /^(100\.100\.701|800\.[32])/
     """
-    regex = r"^(100\.100\.701|800\.[32])"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_RISK_HANDLING_BLACKLIST_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_risk_handling_risk_validation(result_code: str) -> bool:
@@ -239,8 +254,7 @@ def check_transaction_rejected_risk_handling_risk_validation(result_code: str) -
 
     The regular expression pattern for filtering out this group is: /^(800\.1[123456]0)/
     """
-    regex = r"^(800\.1[123456]0)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_RISK_HANDLING_RISK_VALIDATION_REGEX, result_code)
 
 
 #################################################
@@ -256,8 +270,7 @@ def check_transaction_rejected_configuration_validation(result_code: str) -> boo
 
     The regular expression pattern for filtering out this group is: /^(600\.[23]|500\.[12]|800\.121)/
     """
-    regex = r"^(600\.[23]|500\.[12]|800\.121)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_CONFIGURATION_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_registration_validation(result_code: str) -> bool:
@@ -266,8 +279,7 @@ def check_transaction_rejected_registration_validation(result_code: str) -> bool
 
     The regular expression pattern for filtering out this group is: /^(100\.[13]50)/
     """
-    regex = r"^(100\.[13]50)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_REGISTRATION_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_job_validation(result_code: str) -> bool:
@@ -276,8 +288,7 @@ def check_transaction_rejected_job_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.250|100\.360)/
     """
-    regex = r"^(100\.250|100\.360)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_JOB_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_reference_validation(result_code: str) -> bool:
@@ -286,8 +297,7 @@ def check_transaction_rejected_reference_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(700\.[1345][05]0)/
     """
-    regex = r"^(700\.[1345][05]0)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_REFERENCE_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_format_validation(result_code: str) -> bool:
@@ -296,8 +306,7 @@ def check_transaction_rejected_format_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(200\.[123]|100\.[53][07]|800\.900|100\.[69]00\.500)/
     """
-    regex = r"^(200\.[123]|100\.[53][07]|800\.900|100\.[69]00\.500)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_FORMAT_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_address_validation(result_code: str) -> bool:
@@ -306,8 +315,7 @@ def check_transaction_rejected_address_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.800)/
     """
-    regex = r"^(100\.800)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_ADDRESS_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_contact_validation(result_code: str) -> bool:
@@ -316,8 +324,7 @@ def check_transaction_rejected_contact_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.[97]00)/
     """
-    regex = r"^(100\.[97]00)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_CONTACT_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_account_validation(result_code: str) -> bool:
@@ -326,8 +333,7 @@ def check_transaction_rejected_account_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.100|100.2[01])/
     """
-    regex = r"^(100\.100|100.2[01])"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_ACCOUNT_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_amount_validation(result_code: str) -> bool:
@@ -336,8 +342,7 @@ def check_transaction_rejected_amount_validation(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.55)/
     """
-    regex = r"^(100\.55)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_AMOUNT_VALIDATION_REGEX, result_code)
 
 
 def check_transaction_rejected_risk_management(result_code: str) -> bool:
@@ -346,8 +351,7 @@ def check_transaction_rejected_risk_management(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(100\.380\.[23]|100\.380\.101)/
     """
-    regex = r"^(100\.380\.[23]|100\.380\.101)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_REJECTED_RISK_MANAGEMENT_REGEX, result_code)
 
 
 ###################################
@@ -363,5 +367,112 @@ def check_chargeback_related(result_code: str) -> bool:
 
     The regular expression pattern for filtering out this group is: /^(000\.100\.2)/
     """
-    regex = r"^(000\.100\.2)"
-    return check_transaction_status(regex, result_code)
+    return check_transaction_status(TRANSACTION_CHARGEBACK_RELATED_REGEX, result_code)
+
+
+##############################
+#                            #
+# Result code classification #
+#                            #
+##############################
+
+STATUS_SUCCESSFULLY_PROCESSED = "successfully_processed"
+STATUS_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW = "successfully_processed_needs_review"
+STATUS_PENDING = "pending"
+STATUS_PENDING_MIGHT_CHANGE_EXTERNALLY = "pending_might_change_externally"
+STATUS_CHARGEBACK_RELATED = "chargeback_related"
+STATUS_UNKNOWN = "unknown"
+
+# the status category of a result code is the first matching group
+STATUS_CATEGORY_REGEXES = [
+    (STATUS_SUCCESSFULLY_PROCESSED, TRANSACTION_SUCCESSFULLY_PROCESSED_REGEX),
+    (STATUS_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW, TRANSACTION_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW_REGEX),
+    (STATUS_PENDING, TRANSACTION_PENDING_REGEX),
+    (STATUS_PENDING_MIGHT_CHANGE_EXTERNALLY, TRANSACTION_PENDING_MIGHT_CHANGE_EXTERNALLY_REGEX),
+    (STATUS_CHARGEBACK_RELATED, TRANSACTION_CHARGEBACK_RELATED_REGEX),
+    ("rejected_3dsecure_risk", TRANSACTION_REJECTED_3DSECURE_RISK_REGEX),
+    ("rejected_bank", TRANSACTION_REJECTED_BANK_REGEX),
+    ("rejected_communications_error", TRANSACTION_REJECTED_COMMUNICATIONS_ERROR_REGEX),
+    ("rejected_systems_error", TRANSACTION_REJECTED_SYSTEMS_ERROR_REGEX),
+    ("rejected_async_error", TRANSACTION_REJECTED_ASYNC_ERROR_REGEX),
+    ("rejected_soft_decline", TRANSACTION_REJECTED_SOFT_DECLINE_REGEX),
+    ("rejected_risk_handling_external_risk_system", TRANSACTION_REJECTED_RISK_HANDLING_EXTERNAL_RISK_SYSTEM_REGEX),
+    ("rejected_risk_handling_address_validation", TRANSACTION_REJECTED_RISK_HANDLING_ADDRESS_VALIDATION_REGEX),
+    ("rejected_risk_handling_3dsecure", TRANSACTION_REJECTED_RISK_HANDLING_3DSECURE_REGEX),
+    ("rejected_risk_handling_blacklist_validation", TRANSACTION_REJECTED_RISK_HANDLING_BLACKLIST_VALIDATION_REGEX),
+    ("rejected_risk_handling_risk_validation", TRANSACTION_REJECTED_RISK_HANDLING_RISK_VALIDATION_REGEX),
+    ("rejected_configuration_validation", TRANSACTION_REJECTED_CONFIGURATION_VALIDATION_REGEX),
+    ("rejected_registration_validation", TRANSACTION_REJECTED_REGISTRATION_VALIDATION_REGEX),
+    ("rejected_job_validation", TRANSACTION_REJECTED_JOB_VALIDATION_REGEX),
+    ("rejected_reference_validation", TRANSACTION_REJECTED_REFERENCE_VALIDATION_REGEX),
+    ("rejected_format_validation", TRANSACTION_REJECTED_FORMAT_VALIDATION_REGEX),
+    ("rejected_address_validation", TRANSACTION_REJECTED_ADDRESS_VALIDATION_REGEX),
+    ("rejected_contact_validation", TRANSACTION_REJECTED_CONTACT_VALIDATION_REGEX),
+    ("rejected_account_validation", TRANSACTION_REJECTED_ACCOUNT_VALIDATION_REGEX),
+    ("rejected_amount_validation", TRANSACTION_REJECTED_AMOUNT_VALIDATION_REGEX),
+    ("rejected_risk_management", TRANSACTION_REJECTED_RISK_MANAGEMENT_REGEX),
+]
+
+SUCCESSFUL_STATUS_CATEGORIES = [
+    STATUS_SUCCESSFULLY_PROCESSED,
+    STATUS_SUCCESSFULLY_PROCESSED_NEEDS_REVIEW,
+]
+PENDING_STATUS_CATEGORIES = [STATUS_PENDING, STATUS_PENDING_MIGHT_CHANGE_EXTERNALLY]
+REJECTED_STATUS_CATEGORIES = [
+    category for category, _ in STATUS_CATEGORY_REGEXES if category.startswith("rejected_")
+]
+STATUS_CATEGORIES = [category for category, _ in STATUS_CATEGORY_REGEXES] + [STATUS_UNKNOWN]
+
+_COMPILED_STATUS_CATEGORY_REGEXES = [
+    (category, re.compile(regex)) for category, regex in STATUS_CATEGORY_REGEXES
+]
+
+
+@lru_cache(maxsize=4096)
+def classify_result_code(result_code: str) -> str:
+    """
+    the status category (one of STATUS_CATEGORIES) of a result code
+    """
+    if result_code:
+        for category, regex in _COMPILED_STATUS_CATEGORY_REGEXES:
+            if regex.search(result_code):
+                return category
+    return STATUS_UNKNOWN
+
+
+@lru_cache(maxsize=None)
+def regex_to_prefixes(regex: str) -> tuple:
+    """
+    expand one of the result code regexes above (^(alternative|...) with literals, escaped dots and
+    character classes only) into the list of plain result code prefixes it matches,
+    e.g. r"^(000\.[36])" -> ["000.3", "000.6"]. Prefixes can be matched by an index, regexes can not.
+    """
+    digits = "0123456789"
+    prefixes = []
+    for alternative in regex.lstrip("^").strip("()").split("|"):
+        positions = []
+        index = 0
+        while index < len(alternative):
+            char = alternative[index]
+            if char == "\\":
+                positions.append(alternative[index + 1])
+                index += 2
+            elif char == "[":
+                end = alternative.index("]", index)
+                members = alternative[index + 1:end]
+                negated = members.startswith("^")
+                members = re.sub(
+                    r"(\d)-(\d)",
+                    lambda m: digits[int(m.group(1)):int(m.group(2)) + 1],
+                    members.lstrip("^"),
+                )
+                positions.append(
+                    "".join(d for d in digits if d not in members) if negated else members
+                )
+                index = end + 1
+            else:
+                # an unescaped "." only ever stands for the dot of a result code
+                positions.append(char)
+                index += 1
+        prefixes.extend("".join(chars) for chars in itertools.product(*positions))
+    return tuple(sorted(set(prefixes)))
@@ -0,0 +1,198 @@
+import logging
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.apps import apps
+
+from .. import settings
+
+"""
+warm-up of a worker and its readiness
+
+`warm_up` creates the shared wrappers (wrapper.registry), resolves and connects to their VR Payment hosts,
+so the first checkout does not pay for DNS, TCP and TLS, and loads everything that is built lazily
+(result code classifier, model meta). `get_readiness` reports whether this has happened, see
+VRPaymentReadinessView, and separately whether the hosts are reachable, as probed in the background.
+"""
+
+logger = logging.getLogger(__name__)
+
+_state = {"started_at": None, "finished_at": None, "errors": []}
+_state_lock = threading.Lock()
+_probe = {"checked_at": None, "result": None, "running": False}
+_probe_lock = threading.Lock()
+
+
+def prime_classifier():
+    """
+    compile and cache the result code groups used by classify_result_code and status_category_q
+    """
+    from ..managers import status_category_q
+    from .transaction_status import STATUS_CATEGORIES, classify_result_code
+
+    classify_result_code("000.000.000")
+    status_category_q(*STATUS_CATEGORIES)
+
+
+def prime_models():
+    """
+    build the (lazily cached) field lists and relation trees of all models of the app
+    """
+    for model in apps.get_app_config("django_vr_payment").get_models():
+        model._meta.get_fields()
+        model._meta.concrete_fields
+
+
+def resolve_host(url: str) -> list:
+    """
+    :return: the addresses of the host of `url`; also fills the resolver cache of the system, if any
+    """
+    url = urlsplit(url)
+    port = url.port or (443 if url.scheme == "https" else 80)
+    return [info[4][0] for info in socket.getaddrinfo(url.hostname, port, type=socket.SOCK_STREAM)]
+
+
+def preconnect(wrapper, timeout: float = 5) -> float:
+    """
+    open a keep-alive connection from the pool of `wrapper` to its VR Payment host
+    :return: seconds it took
+    """
+    started = time.monotonic()
+    resolve_host(wrapper.url)
+    # any response means DNS, TCP and TLS are done and the connection is back in the pool
+    wrapper.session.head(wrapper.url, timeout=timeout, allow_redirects=False)
+    return time.monotonic() - started
+
+
+def warm_up(connect: bool = True) -> dict:
+    """
+    :param connect: also connect to the VR Payment hosts
+    :return: the warm-up state, see get_warm_up_state
+    """
+    from ..wrapper.registry import registry
+
+    with _state_lock:
+        _state.update(started_at=time.time(), finished_at=None, errors=[])
+    prime_classifier()
+    prime_models()
+    wrappers = registry.warm_up()
+    if connect:
+        for url, wrapper in {wrapper.url: wrapper for wrapper in wrappers}.items():
+            try:
+                logger.debug(f"connected to {url} in {preconnect(wrapper):.3f}s")
+            except (OSError, requests.RequestException) as e:
+                logger.warning(f"warm-up could not connect to {url}: {e}")
+                with _state_lock:
+                    _state["errors"].append(f"{url}: {e}")
+    with _state_lock:
+        _state["finished_at"] = time.time()
+    return get_warm_up_state()
+
+
+def warm_up_in_background(connect: bool = True) -> threading.Thread:
+    """
+    run warm_up in a daemon thread, so the worker can start while connecting
+    """
+    thread = threading.Thread(
+        target=warm_up, kwargs={"connect": connect}, name="vr-payment-warm-up", daemon=True
+    )
+    with _state_lock:
+        _state.update(started_at=time.time(), finished_at=None, errors=[])
+    thread.start()
+    return thread
+
+
+def get_warm_up_state() -> dict:
+    with _state_lock:
+        return dict(_state, errors=list(_state["errors"]))
+
+
+def get_pool_state() -> dict:
+    """
+    :return: open and idle connections per host of the shared sessions
+    """
+    from ..wrapper.registry import registry
+
+    state = {}
+    for host, session in registry.sessions.items():
+        adapter = session.get_adapter(f"https://{host}")
+        pools = adapter.poolmanager.pools
+        connections = {"pools": len(pools), "opened": 0, "idle": 0}
+        for key in pools.keys():
+            pool = pools[key]
+            connections["opened"] += pool.num_connections
+            # the pool queue holds None for slots without a connection
+            connections["idle"] += sum(1 for connection in list(pool.pool.queue) if connection)
+        state[host] = connections
+    return state
+
+
+def probe_upstream(timeout: float = 2) -> dict:
+    """
+    :return: per VR Payment host of the shared wrappers whether it answered and how fast
+    """
+    from ..wrapper.registry import registry
+
+    result = {}
+    wrappers = {wrapper.url: wrapper for wrapper in registry.warm_up()}
+    for url, wrapper in wrappers.items():
+        started = time.monotonic()
+        try:
+            wrapper.session.head(url, timeout=timeout, allow_redirects=False)
+        except requests.RequestException as e:
+            result[url] = {"reachable": False, "error": str(e)}
+        else:
+            result[url] = {"reachable": True, "seconds": round(time.monotonic() - started, 3)}
+    return result
+
+
+def _run_probe():
+    result = None
+    try:
+        result = probe_upstream()
+    except Exception:
+        logger.exception("probing the VR Payment hosts failed")
+    finally:
+        with _probe_lock:
+            _probe.update(checked_at=time.monotonic(), result=result, running=False)
+
+
+def get_upstream_state():
+    """
+    the last result of probe_upstream, None before the first one finished; starts a probe in a daemon thread
+    if the last one is older than VR_PAYMENT_READINESS_PROBE_INTERVAL seconds and none is running
+    """
+    with _probe_lock:
+        stale = (
+            _probe["checked_at"] is None
+            or time.monotonic() - _probe["checked_at"] > settings.VR_PAYMENT_READINESS_PROBE_INTERVAL
+        )
+        start = stale and not _probe["running"]
+        if start:
+            _probe["running"] = True
+        result = _probe["result"]
+    if start:
+        threading.Thread(target=_run_probe, name="vr-payment-probe", daemon=True).start()
+    return result
+
+
+def get_readiness(details: bool = False) -> dict:
+    """
+    ready once the warm-up is done; whether the VR Payment hosts are reachable is reported separately
+    (None until probed), an outage of VR Payment does not make the worker unready
+    :param details: add the probe result per host, the warm-up errors and the connection pool state
+        of this process (not for anonymous users: contains upstream error messages)
+    """
+    warm_up_state = get_warm_up_state()
+    warm = not settings.VR_PAYMENT_WARM_UP or warm_up_state["finished_at"] is not None
+    upstream = get_upstream_state()
+    upstream_reachable = None
+    if upstream is not None:
+        upstream_reachable = all(host["reachable"] for host in upstream.values())
+    readiness = {"ready": warm, "warm": warm, "upstream_reachable": upstream_reachable}
+    if details:
+        readiness.update(upstream=upstream, warm_up_errors=warm_up_state["errors"], pools=get_pool_state())
+    return readiness
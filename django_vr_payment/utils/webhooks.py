@@ -1,5 +1,7 @@
 import os
 import binascii
+import hashlib
+import json
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 
@@ -22,3 +24,11 @@ def decrypt_webhook(
     # Decrypt
     result = decryptor.update(cipher_text) + decryptor.finalize()
     return result
+
+
+def get_content_hash(headers: dict, body) -> str:
+    """
+    sha256 of the headers and the decrypted body as canonical json; the same webhook always has the same hash
+    """
+    content = json.dumps({"headers": headers or {}, "body": body}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
@@ -1,10 +1,18 @@
 # Create your views here.
+import json
+import threading
+import time
 
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
 from django.http import (
     HttpResponseBadRequest,
     Http404,
     HttpResponseRedirect,
     HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
 )
 from django.urls import reverse
 from django.utils.datastructures import MultiValueDictKeyError
@@ -16,15 +24,28 @@ from django.views.generic import TemplateView
 from . import settings
 from .models import VRPaymentBasicPayment
 from .models.webhooks import VRPaymentWebhook
+from .utils.checkout_page import (
+    format_link_header,
+    get_resource_hints,
+    get_shopper_result_url,
+    get_vr_payment_url,
+    get_widget_url,
+)
+from .utils.pubsub import get_broker, get_latest_status, get_status_channel
+from .utils.transaction_status import REJECTED_STATUS_CATEGORIES, SUCCESSFUL_STATUS_CATEGORIES
+from .utils.warmup import get_readiness
 from .utils.webhooks import decrypt_webhook
 from .wrapper import VRPaymentWrapper
+from .wrapper.registry import get_wrapper
 
 
 class VRPaymentBasicCheckoutView(TemplateView):
     template_name = "vr_payment/checkout.html"
+    # space separated payment brands of the widget, defaults to VR_PAYMENT_CHECKOUT_BRANDS
+    brands = None
 
     def get(self, request, *args, **kwargs):
-        basic_payment = VRPaymentBasicPayment.objects.get(
+        basic_payment = VRPaymentBasicPayment.objects.for_checkout_view().get(
             merchant_transaction_id=kwargs.get("merchant_transaction_id")
         )
         if basic_payment.payment_responses.exists():
@@ -32,7 +53,14 @@ class VRPaymentBasicCheckoutView(TemplateView):
                 "This merchant_transaction_id has already been used."
             )
         kwargs.update({"basic_payment": basic_payment})
-        return super(VRPaymentBasicCheckoutView, self).get(request, *args, **kwargs)
+        response = super(VRPaymentBasicCheckoutView, self).get(request, *args, **kwargs)
+        resource_hints = response.context_data["resource_hints"]
+        if resource_hints:
+            response["Link"] = format_link_header(resource_hints)
+        return response
+
+    def get_brands(self, entity_id: str) -> str:
+        return self.brands or settings.for_entity(entity_id, fallback=True).VR_PAYMENT_CHECKOUT_BRANDS
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -40,11 +68,16 @@ class VRPaymentBasicCheckoutView(TemplateView):
         context.update(
             {
                 "basic_payment": basic_payment,
-                "vr_payment_src_url": settings.VR_PAYMENT_TEST_URL
-                if basic_payment.sandbox
-                else settings.VR_PAYMENT_LIVE_URL,
-                "shopper_result_url": self.request.build_absolute_uri(
-                    reverse(settings.VR_PAYMENT_SHOPPER_RESULT_URL_NAME)
+                "vr_payment_src_url": get_vr_payment_url(
+                    basic_payment.sandbox, basic_payment.entity_id
+                ),
+                "vr_payment_widget_url": get_widget_url(
+                    basic_payment.sandbox, basic_payment.checkout_id, basic_payment.entity_id
+                ),
+                "shopper_result_url": get_shopper_result_url(self.request),
+                "brands": self.get_brands(basic_payment.entity_id),
+                "resource_hints": get_resource_hints(
+                    basic_payment.sandbox, basic_payment.checkout_id, basic_payment.entity_id
                 ),
             }
         )
@@ -53,6 +86,11 @@ class VRPaymentBasicCheckoutView(TemplateView):
 
 class VRPaymentReturnView(View):
     basic_payment = None
+    # seconds to wait for a webhook before querying VR Pay, defaults to VR_PAYMENT_RETURN_WEBHOOK_WAIT
+    webhook_wait = None
+    # seconds between two reads of the latest status while waiting, for webhooks saved by other processes
+    # that are not published to this one (VR_PAYMENT_PUBSUB_BACKEND = "local")
+    webhook_poll_interval = 0.25
 
     def get_error_url(self):
         return reverse(settings.VR_PAYMENT_ERROR_URL_NAME)
@@ -80,11 +118,24 @@ class VRPaymentReturnView(View):
                 else None
             )
 
+        if not redirect_url:
+            webhook_wait = self.webhook_wait
+            if webhook_wait is None:
+                webhook_wait = settings.VR_PAYMENT_RETURN_WEBHOOK_WAIT
+            if webhook_wait is not None:
+                redirect_url = self.get_notified_redirect_url(webhook_wait)
+
         if not redirect_url:
             # check status from VR Pay
-            vr_payment_wrapper = VRPaymentWrapper(
-                entity_id=entity_id, bearer_token=bearer_token, sandbox=sandbox
-            )
+            if bearer_token:
+                vr_payment_wrapper = VRPaymentWrapper(
+                    entity_id=entity_id, bearer_token=bearer_token, sandbox=sandbox
+                )
+            else:
+                vr_payment_wrapper = get_wrapper(
+                    entity_id or self.basic_payment.entity_id,
+                    self.basic_payment.sandbox if sandbox is None else sandbox,
+                )
             vr_payment_status = vr_payment_wrapper.get_checkout_status(
                 basic_payment=self.basic_payment
             )
@@ -99,10 +150,34 @@ class VRPaymentReturnView(View):
                 redirect_url = self.get_error_url()
         return redirect_url
 
+    def get_notified_redirect_url(self, timeout: float):
+        """
+        the redirect url by the latest webhook payload or status response of the payment if it is successful or
+        rejected, waiting up to `timeout` seconds for one to be saved (published, see utils/pubsub.py, or found
+        every `webhook_poll_interval` seconds); None otherwise
+        """
+        channel = get_status_channel(self.basic_payment.merchant_transaction_id or "")
+        # subscribe before reading the latest status, so no status saved in between is missed
+        with get_broker().subscribe(channel) as subscription:
+            deadline = time.monotonic() + timeout
+            message = get_latest_status(self.basic_payment.pk)
+            while True:
+                if message is not None:
+                    if message["status_category"] in SUCCESSFUL_STATUS_CATEGORIES:
+                        return self.get_success_url()
+                    if message["status_category"] in REJECTED_STATUS_CATEGORIES:
+                        return self.get_rejected_url()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                message = subscription.get(timeout=min(remaining, self.webhook_poll_interval))
+                if message is None:
+                    message = get_latest_status(self.basic_payment.pk)
+
     def get(self, *args, **kwargs):
         update_fields = []
         try:
-            self.basic_payment = VRPaymentBasicPayment.objects.get(
+            self.basic_payment = VRPaymentBasicPayment.objects.for_return_view().get(
                 checkout_response__vr_pay_id=self.request.GET["id"]
             )
             if self.basic_payment.resource_path:
@@ -125,8 +200,153 @@ class VRPaymentReturnView(View):
 
 @method_decorator(csrf_exempt, name="dispatch")
 class VRPaymentWebhookView(View):
-    config_key = settings.VR_PAYMENT_CONFIG_KEY
+    # defaults to VR_PAYMENT_CONFIG_KEY of the entity in the url, if any
+    config_key = None
+
+    def get_config_key(self) -> str:
+        if self.config_key:
+            return self.config_key
+        entity_id = self.kwargs.get("entity_id")
+        if not entity_id:
+            return settings.VR_PAYMENT_CONFIG_KEY
+        try:
+            return settings.for_entity(entity_id).VR_PAYMENT_CONFIG_KEY
+        except settings.UnknownEntityError as e:
+            raise Http404(e)
 
     def post(self, request, *args, **kwargs):
-        VRPaymentWebhook.objects.create_from_request(self.config_key, self.request)
+        VRPaymentWebhook.objects.create_from_request(self.get_config_key(), self.request)
         return HttpResponse(status=202)  # Accepted
+
+
+class VRPaymentReadinessView(View):
+    """
+    for load balancers: 200 once the worker is warmed up, 503 otherwise. Staff users also get the upstream
+    probe results and the connection pool state.
+    """
+
+    def get(self, request, *args, **kwargs):
+        readiness = get_readiness(details=getattr(getattr(request, "user", None), "is_staff", False))
+        return JsonResponse(readiness, status=200 if readiness["ready"] else 503)
+
+
+class StatusEventStream(object):
+    """
+    the response content of VRPaymentStatusEventsView: django closes it with the response, whether it was
+    iterated or not, which releases the stream's slot
+    """
+
+    def __init__(self, events, release):
+        self.events = events
+        self.release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self.events)
+
+    def close(self):
+        self.events.close()
+        if self.release is not None:
+            self.release()
+            self.release = None
+
+
+class VRPaymentStatusEventsView(View):
+    """
+    server-sent events (text/event-stream, e.g. for an EventSource) with the status of a payment: its current
+    status, then every new status response or webhook payload (see utils/pubsub.py) until the status is final
+    or VR_PAYMENT_STATUS_STREAM_TIMEOUT seconds passed. Each open stream keeps a worker thread busy, so it
+    is only served with VR_PAYMENT_STATUS_STREAM and at most VR_PAYMENT_STATUS_STREAM_MAX_OPEN at a time.
+    The url contains the signed merchant transaction id, see get_url.
+    """
+
+    # seconds between two keepalive comments, the status is also re-read from the database then
+    keepalive_interval = 15
+    # milliseconds until an EventSource reconnects after the stream was closed
+    retry = 3000
+    signing_salt = "django_vr_payment.status-events"
+
+    # open streams of this process
+    _open_streams = 0
+    _open_streams_lock = threading.Lock()
+
+    @classmethod
+    def get_url(cls, merchant_transaction_id: str) -> str:
+        """
+        the url of the status events of a payment, e.g. for the page the shopper returns to
+        """
+        token = signing.dumps(merchant_transaction_id, salt=cls.signing_salt)
+        return reverse(settings.VR_PAYMENT_STATUS_EVENTS_URL_NAME, kwargs={"token": token})
+
+    @classmethod
+    def acquire_stream(cls) -> bool:
+        with cls._open_streams_lock:
+            if cls._open_streams >= settings.VR_PAYMENT_STATUS_STREAM_MAX_OPEN:
+                return False
+            cls._open_streams += 1
+            return True
+
+    @classmethod
+    def release_stream(cls):
+        with cls._open_streams_lock:
+            cls._open_streams -= 1
+
+    def get(self, request, *args, **kwargs):
+        if not settings.VR_PAYMENT_STATUS_STREAM:
+            raise Http404("status event streams are disabled")
+        try:
+            merchant_transaction_id = signing.loads(
+                kwargs["token"], salt=self.signing_salt, max_age=settings.VR_PAYMENT_STATUS_STREAM_URL_MAX_AGE
+            )
+        except signing.BadSignature:
+            raise Http404("invalid or expired status events url")
+        basic_payment_id = (
+            VRPaymentBasicPayment._base_manager.filter(merchant_transaction_id=merchant_transaction_id)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if basic_payment_id is None:
+            raise Http404(f"no payment with merchant_transaction_id {merchant_transaction_id}")
+        if not self.acquire_stream():
+            response = HttpResponse("too many open status event streams", status=503)
+            response["Retry-After"] = str(self.retry // 1000)
+            return response
+        response = StreamingHttpResponse(
+            StatusEventStream(self.iter_events(merchant_transaction_id, basic_payment_id), self.release_stream),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # no proxy buffering (nginx)
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def iter_events(self, merchant_transaction_id: str, basic_payment_id: int):
+        # subscribe before reading the current status, so no status change in between is missed
+        with get_broker().subscribe(get_status_channel(merchant_transaction_id)) as subscription:
+            yield f"retry: {self.retry}\n\n"
+            deadline = time.monotonic() + settings.VR_PAYMENT_STATUS_STREAM_TIMEOUT
+            sent = None
+            message = get_latest_status(basic_payment_id)
+            while True:
+                if message is not None and (message["source"], message["id"]) != sent:
+                    sent = (message["source"], message["id"])
+                    yield self.format_event(message)
+                    if message["final"]:
+                        return
+                # do not hold a database connection while waiting (unless persistent connections are used)
+                close_old_connections()
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return
+                message = subscription.get(timeout=min(timeout, self.keepalive_interval))
+                if message is None:
+                    # catches up with status changes published while a listener reconnected
+                    message = get_latest_status(basic_payment_id)
+                    if message is None or (message["source"], message["id"]) == sent:
+                        yield ": keepalive\n\n"
+
+    def format_event(self, message: dict) -> str:
+        data = json.dumps(message, cls=DjangoJSONEncoder)
+        return f"event: status\nid: {message['source']}-{message['id']}\ndata: {data}\n\n"
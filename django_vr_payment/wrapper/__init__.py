@@ -1,5 +1,6 @@
 import requests
 from requests import Response
+from requests.adapters import HTTPAdapter
 
 from .checkout import CheckOutWrapper
 from .transaction import TransactionWrapper
@@ -7,51 +8,89 @@ from .. import settings
 
 
 class VRPaymentWrapper(TransactionWrapper, CheckOutWrapper):
-    bearer_token = settings.VR_PAYMENT_BEARER_TOKEN
-    entity_id = settings.VR_PAYMENT_ENTITY_ID
-    sandbox = settings.VR_PAYMENT_SANDBOX
-    url = (
-        settings.VR_PAYMENT_TEST_URL
-        if settings.VR_PAYMENT_SANDBOX
-        else settings.VR_PAYMENT_LIVE_URL
-    )
+    # class level defaults for subclasses; otherwise the (entity) settings are used
+    bearer_token = None
+    entity_id = None
+    sandbox = None
 
     def __init__(
-        self, bearer_token: str = None, entity_id: str = None, sandbox: bool = None
+        self,
+        bearer_token: str = None,
+        entity_id: str = None,
+        sandbox: bool = None,
+        session: requests.Session = None,
+        rate_limiter=None,
     ) -> None:
-        self.bearer_token = bearer_token if bearer_token else self.bearer_token
-        self.entity_id = entity_id if entity_id else self.entity_id
-        self.sandbox = sandbox if sandbox is not None else self.sandbox
-        if self.sandbox:
-            self.url = f"{settings.VR_PAYMENT_TEST_URL}"
-        elif sandbox is not None:
-            self.url = f"{settings.VR_PAYMENT_LIVE_URL}"
+        """
+        :param session: (optional) requests.Session to share connections with other wrappers, see registry
+        :param rate_limiter: (optional) registry.RateLimiter every call to the api has to pass
+        """
+        entity_id = entity_id or self.entity_id
+        entity_settings = settings.for_entity(entity_id, fallback=True) if entity_id else settings
+        self.bearer_token = (
+            bearer_token or self.bearer_token or entity_settings.VR_PAYMENT_BEARER_TOKEN
+        )
+        self.entity_id = entity_id or entity_settings.VR_PAYMENT_ENTITY_ID
+        if sandbox is None:
+            sandbox = (
+                self.sandbox if self.sandbox is not None else entity_settings.VR_PAYMENT_SANDBOX
+            )
+        self.sandbox = sandbox
+        self.url = (
+            entity_settings.VR_PAYMENT_TEST_URL
+            if self.sandbox
+            else entity_settings.VR_PAYMENT_LIVE_URL
+        )
+        self._session = session
+        self.rate_limiter = rate_limiter
         super().__init__()
 
+    @property
+    def session(self) -> requests.Session:
+        """
+        one keep-alive connection pool per wrapper, shared by all (concurrent) calls
+        """
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=settings.VR_PAYMENT_CONNECTION_POOL_SIZE
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
     def _call_api(
         self,
         url_append: str,
         method: str,
         data: dict = None,
-        headers: dict = {},
+        headers: dict = None,
         connect_timeout=2,
         read_timeout=10,
+        stream: bool = False,
     ) -> Response:
-        headers.update({"Authorization": f"Bearer {self.bearer_token}"})
+        """
+        :param stream: (GET only) do not read the content yet, e.g. to parse it incrementally from response.raw
+        """
+        headers = dict(headers or {}, Authorization=f"Bearer {self.bearer_token}")
         call_url = self.url + url_append
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
         try:
-            if method is "POST":
-                response = requests.post(
+            if method == "POST":
+                response = self.session.post(
                     url=call_url,
                     headers=headers,
                     data=data,
                     timeout=(connect_timeout, read_timeout),
                 )
-            elif method is "GET":
-                response = requests.get(
+            elif method == "GET":
+                response = self.session.get(
                     url=call_url,
                     headers=headers,
                     timeout=(connect_timeout, read_timeout),
+                    stream=stream,
                 )
             else:
                 raise NotImplementedError(f"method '{method}# is not supported")
@@ -1,15 +1,44 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from itertools import islice
 
 import requests
+from django.db import DatabaseError, transaction
 from django.utils import timezone
 from requests import Response
 
+from .. import settings
 from ..models import (
     VRPaymentBasicPaymentStatusResponse,
     VRPaymentBasicPayment,
     VRPaymentCheckoutResponse,
+    VRPaymentIdentifier,
 )
 
+logger = logging.getLogger(__name__)
+
+# result of one checkout of CheckOutWrapper.create_checkouts: the saved VRPaymentBasicPayment or the error
+CheckoutResult = namedtuple("CheckoutResult", ["spec", "basic_payment", "error"])
+
+# result code of a created checkout
+CHECKOUT_CREATED_RESULT_CODE = "000.200.100"
+
+
+class CheckoutError(ValueError):
+    """
+    a checkout request of create_checkouts that did not create a checkout
+    """
+
+
+def _chunked(iterable, size: int):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
 
 class CheckOutWrapper(object):
     def create_checkout(
@@ -40,6 +69,76 @@ class CheckOutWrapper(object):
         :param transaction_category: (optional) The category of the transaction. See VR Payment docs for possible values
         :param kwargs: (optional) any additional information you want to provide. See VR Payment docs for possible kwargs. NOTE: these values will not be saved in the VRPaymentBasicPayment object
         """
+        data, basic_payment = self._prepare_checkout(
+            amount=amount,
+            payment_type=payment_type,
+            merchant_transaction_id=merchant_transaction_id,
+            currency=currency,
+            tax_amount=tax_amount,
+            payment_brand=payment_brand,
+            descriptor=descriptor,
+            merchant_invoice_id=merchant_invoice_id,
+            merchant_memo=merchant_memo,
+            transaction_category=transaction_category,
+            **kwargs,
+        )
+        response = self._call_api("/v1/checkouts", "POST", data=data)
+        return VRPaymentBasicPayment.objects.save_with_checkout_response(
+            basic_payment,
+            VRPaymentCheckoutResponse.objects.build_from_response(
+                response, basic_payment=basic_payment
+            ),
+        )
+
+    def create_checkouts(
+        self, checkouts, max_in_flight: int = None, chunk_size: int = None
+    ) -> list:
+        """
+        create many checkouts at once: the requests run concurrently over the pooled connection of the wrapper,
+        payments and checkout responses are saved with one bulk_create each per chunk.
+        While a chunk is saved the requests of the next chunk are already running.
+        :param checkouts: iterable of dicts with the arguments of create_checkout
+        :param max_in_flight: max concurrent requests, defaults to VR_PAYMENT_BATCH_MAX_IN_FLIGHT
+        :param chunk_size: checkouts per chunk, defaults to VR_PAYMENT_BATCH_CHUNK_SIZE
+        :return: one CheckoutResult per checkout, in order. A failed checkout does not abort the batch,
+            its error is returned instead and its payment is not saved; a checkout is failed if its request
+            raised or if its response is not a created checkout (CheckoutError).
+        """
+        max_in_flight = (
+            max_in_flight
+            or settings.VR_PAYMENT_BATCH_MAX_IN_FLIGHT
+            or settings.VR_PAYMENT_CONNECTION_POOL_SIZE
+        )
+        chunk_size = chunk_size or settings.VR_PAYMENT_BATCH_CHUNK_SIZE
+        results = []
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            pending = None
+            for chunk in _chunked(checkouts, chunk_size):
+                submitted = [self._submit_checkout(executor, spec) for spec in chunk]
+                if pending is not None:
+                    results.extend(self._save_checkouts(pending))
+                pending = submitted
+            if pending is not None:
+                results.extend(self._save_checkouts(pending))
+        return results
+
+    def _prepare_checkout(
+        self,
+        amount: Decimal,
+        payment_type: str,
+        merchant_transaction_id: str,
+        currency: str = "EUR",
+        tax_amount: Decimal = Decimal(0.00),
+        payment_brand: str = None,
+        descriptor: str = None,
+        merchant_invoice_id: str = None,
+        merchant_memo: str = None,
+        transaction_category: str = None,
+        **kwargs,
+    ) -> tuple:
+        """
+        :return: the request data and the unsaved VRPaymentBasicPayment of a checkout
+        """
         data = {
             "entityId": self.entity_id,
             "amount": amount,
@@ -58,8 +157,7 @@ class CheckOutWrapper(object):
             for kwarg in kwargs:
                 for element in kwargs.get(kwarg):
                     data.update({kwarg + "." + element: kwargs.get(kwarg).get(element)})
-        response = self._call_api("/v1/checkouts", "POST", data=data)
-        basic_payment = VRPaymentBasicPayment.objects.create(
+        basic_payment = VRPaymentBasicPayment(
             entity_id=self.entity_id,
             amount=amount,
             currency=currency,
@@ -73,19 +171,99 @@ class CheckOutWrapper(object):
             transaction_category=transaction_category,
             sandbox=self.sandbox,
         )
-        VRPaymentCheckoutResponse.objects.create_from_response(
-            response, basic_payment=basic_payment
+        return data, basic_payment
+
+    def _submit_checkout(self, executor, spec: dict) -> tuple:
+        """
+        :return: (spec, unsaved basic payment, future of the response) or (spec, None, error)
+        """
+        try:
+            data, basic_payment = self._prepare_checkout(**spec)
+        except (TypeError, AttributeError) as e:
+            return spec, None, e
+        return (
+            spec,
+            basic_payment,
+            executor.submit(self._call_api, "/v1/checkouts", "POST", data=data),
         )
-        return basic_payment
+
+    def _save_checkouts(self, submitted: list) -> list:
+        results = [None] * len(submitted)
+        completed = []
+        for position, (spec, basic_payment, future) in enumerate(submitted):
+            if basic_payment is None:
+                results[position] = CheckoutResult(spec, None, future)
+                continue
+            try:
+                response = future.result()
+                checkout_response = VRPaymentCheckoutResponse.objects.build_from_response(
+                    response, basic_payment=basic_payment
+                )
+                if checkout_response is None:
+                    raise CheckoutError("the response could not be parsed")
+                if not response.ok or checkout_response.result_code != CHECKOUT_CREATED_RESULT_CODE:
+                    raise CheckoutError(
+                        f"rejected with HTTP {response.status_code}: "
+                        f"{checkout_response.result_code} {checkout_response.result_description}"
+                    )
+            except Exception as e:
+                logger.error(f"checkout '{basic_payment.merchant_transaction_id}' failed: {e}")
+                results[position] = CheckoutResult(spec, None, e)
+                continue
+            completed.append((position, basic_payment, checkout_response))
+
+        try:
+            with transaction.atomic():
+                self._bulk_save_checkouts(completed)
+        except DatabaseError as e:
+            # e.g. a duplicate merchant_transaction_id; save one by one to find the culprits
+            logger.warning(f"saving {len(completed)} checkouts at once failed: {e}")
+            for position, basic_payment, checkout_response in completed:
+                basic_payment.pk = None
+                checkout_response.pk = None
+                try:
+                    VRPaymentBasicPayment.objects.save_with_checkout_response(basic_payment, checkout_response)
+                except DatabaseError as e:
+                    logger.error(
+                        f"checkout '{basic_payment.merchant_transaction_id}' could not be saved: {e}"
+                    )
+                    basic_payment.pk = None
+                    results[position] = CheckoutResult(submitted[position][0], None, e)
+                else:
+                    results[position] = CheckoutResult(submitted[position][0], basic_payment, None)
+        else:
+            for position, basic_payment, _checkout_response in completed:
+                results[position] = CheckoutResult(submitted[position][0], basic_payment, None)
+        return results
+
+    def _bulk_save_checkouts(self, completed: list):
+        basic_payments = [basic_payment for _position, basic_payment, _checkout_response in completed]
+        VRPaymentBasicPayment.objects.bulk_create(basic_payments)
+        if any(basic_payment.pk is None for basic_payment in basic_payments):
+            # not every database returns the primary keys of bulk inserted rows
+            pks = dict(
+                VRPaymentBasicPayment.objects.filter(
+                    merchant_transaction_id__in=[
+                        basic_payment.merchant_transaction_id for basic_payment in basic_payments
+                    ]
+                ).values_list("merchant_transaction_id", "pk")
+            )
+            for basic_payment in basic_payments:
+                basic_payment.pk = pks[basic_payment.merchant_transaction_id]
+        checkout_responses = []
+        for _position, basic_payment, checkout_response in completed:
+            # built before the payment had its primary key
+            checkout_response.basic_payment = basic_payment
+            checkout_responses.append(checkout_response)
+        VRPaymentCheckoutResponse.objects.bulk_create(checkout_responses)
+        VRPaymentIdentifier.objects.register(checkout_responses)
 
     def get_checkout_status(
         self, basic_payment: VRPaymentBasicPayment
     ) -> VRPaymentBasicPaymentStatusResponse:
         url = f"{basic_payment.resource_path}?entityId={self.entity_id}"
         try:
-            assert basic_payment.created_at > (
-                timezone.now() - timezone.timedelta(minutes=30)
-            )
+            assert basic_payment.checkout_expires_at > timezone.now()
             response = self._call_api(url, "GET")
             response.raise_for_status()
         except (AssertionError, requests.HTTPError):
@@ -0,0 +1,159 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.core.signals import setting_changed
+from requests.adapters import HTTPAdapter
+
+from .. import settings
+
+"""
+long-lived VRPaymentWrapper instances, one per (entity id, sandbox)
+
+All wrappers talking to the same host share one connection pool and all wrappers of an entity share
+its rate limit (VR_PAYMENT_RATE_LIMIT requests per second), so switching between entities costs a dict lookup.
+The wrappers do not keep any per request state and can be used from several threads at once.
+"""
+
+
+class RateLimiter(object):
+    """
+    thread-safe token bucket: `rate` calls per second, bursts of up to `burst` calls
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        block until a call is allowed
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class VRPaymentWrapperRegistry(object):
+    def __init__(self):
+        self._wrappers = {}
+        self._sessions = {}
+        self._rate_limiters = {}
+        self._lock = threading.RLock()
+
+    def get(self, entity_id: str = None, sandbox: bool = None):
+        """
+        :param entity_id: (optional) defaults to VR_PAYMENT_ENTITY_ID
+        :param sandbox: (optional) defaults to VR_PAYMENT_SANDBOX of the entity
+        :return: the shared VRPaymentWrapper of the entity
+        """
+        key = (entity_id, sandbox)
+        try:
+            return self._wrappers[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._wrappers:
+                self._wrappers[key] = self._create_wrapper(entity_id, sandbox)
+            return self._wrappers[key]
+
+    def _create_wrapper(self, entity_id: str, sandbox: bool):
+        from . import VRPaymentWrapper
+
+        entity_settings = settings.for_entity(entity_id, fallback=True) if entity_id else settings
+        entity_id = entity_id or entity_settings.VR_PAYMENT_ENTITY_ID
+        if sandbox is None:
+            sandbox = entity_settings.VR_PAYMENT_SANDBOX
+        if (entity_id, sandbox) in self._wrappers:
+            # the same wrapper as the explicit key
+            return self._wrappers[(entity_id, sandbox)]
+        url = entity_settings.VR_PAYMENT_TEST_URL if sandbox else entity_settings.VR_PAYMENT_LIVE_URL
+        wrapper = VRPaymentWrapper(
+            entity_id=entity_id,
+            sandbox=sandbox,
+            session=self.get_session(url),
+            rate_limiter=self.get_rate_limiter(entity_id),
+        )
+        self._wrappers[(entity_id, sandbox)] = wrapper
+        return wrapper
+
+    def get_session(self, url: str) -> requests.Session:
+        """
+        :return: the requests.Session shared by all wrappers calling the host of `url`
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=settings.VR_PAYMENT_CONNECTION_POOL_SIZE
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def get_rate_limiter(self, entity_id: str):
+        """
+        :return: the RateLimiter of `entity_id` or None if VR_PAYMENT_RATE_LIMIT is not set
+        """
+        rate = settings.for_entity(entity_id, fallback=True).VR_PAYMENT_RATE_LIMIT
+        if not rate:
+            return None
+        with self._lock:
+            if entity_id not in self._rate_limiters:
+                self._rate_limiters[entity_id] = RateLimiter(
+                    rate, settings.for_entity(entity_id, fallback=True).VR_PAYMENT_RATE_LIMIT_BURST
+                )
+            return self._rate_limiters[entity_id]
+
+    def warm_up(self) -> list:
+        """
+        create the wrappers of the default entity and of all VR_PAYMENT_ENTITY_PROFILES
+        :return: the wrappers
+        """
+        wrappers = [self.get()]
+        for entity_id in settings.VR_PAYMENT_ENTITY_PROFILES:
+            wrappers.append(self.get(entity_id))
+        return wrappers
+
+    @property
+    def sessions(self) -> dict:
+        return dict(self._sessions)
+
+    def clear(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._wrappers = {}
+            self._sessions = {}
+            self._rate_limiters = {}
+
+
+registry = VRPaymentWrapperRegistry()
+
+
+def get_wrapper(entity_id: str = None, sandbox: bool = None):
+    """
+    shortcut for registry.get
+    """
+    return registry.get(entity_id, sandbox)
+
+
+def clear_registry(setting: str, **kwargs):
+    if setting in settings.DEFAULTS:
+        registry.clear()
+
+
+setting_changed.connect(clear_registry)
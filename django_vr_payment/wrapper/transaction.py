@@ -1,11 +1,23 @@
+import datetime
 import logging
+from urllib.parse import urlencode
 
 import requests
+from django.utils import timezone
 
 from ..models import VRPaymentBasicPayment, VRPaymentBasicPaymentStatusResponse
+from .checkout import _chunked
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 logger = logging.getLogger(__name__)
 
+# the result code of a query without any transaction
+NO_TRANSACTIONS_RESULT_CODE = "700.400.200"
+
 
 class TransactionWrapper(object):
     """
@@ -38,3 +50,85 @@ class TransactionWrapper(object):
     ) -> VRPaymentBasicPaymentStatusResponse:
         url = f"v1/query?entityId={self.entity_id}&merchantTransactionId={getattr(basic_payment, 'merchant_transaction_id')}"
         return self._get_transaction_status(url, basic_payment)
+
+    def iter_transactions(
+        self,
+        date_from: datetime.datetime,
+        date_to: datetime.datetime,
+        window: datetime.timedelta = datetime.timedelta(days=1),
+        page_size: int = 100,
+        **params,
+    ):
+        """
+        all transactions of the entity between `date_from` and `date_to`, queried window by window and page by page;
+        each page is parsed while it is downloaded if the 'ijson' package is installed
+        https://vr-pay-ecommerce.docs.oppwa.com/tutorials/reporting/transaction#transactions-for-a-specified-time-frame
+        :param window: max time range of one query
+        :param page_size: transactions per page (`limit`)
+        :param params: (optional) further query parameters, e.g. paymentTypes="DB,RF"
+        :return: an iterator of the transactions as parsed json. A transaction at the border of two windows
+            can be returned twice.
+        """
+        start = date_from
+        while start < date_to:
+            end = min(date_to, start + window)
+            page = 1
+            while True:
+                query = dict(
+                    params,
+                    entityId=self.entity_id,
+                    limit=page_size,
+                    pageNo=page,
+                    **{"date.from": _format_query_date(start), "date.to": _format_query_date(end)},
+                )
+                transactions = 0
+                for transaction in self._iter_query_page(f"v1/query?{urlencode(query)}"):
+                    transactions += 1
+                    yield transaction
+                if transactions < page_size:
+                    break
+                page += 1
+            start = end
+
+    def _iter_query_page(self, url: str):
+        response = self._call_api(url, "GET", read_timeout=60, stream=True)
+        try:
+            if not response.ok:
+                try:
+                    result_code = (response.json().get("result") or {}).get("code")
+                except ValueError:
+                    result_code = None
+                if result_code == NO_TRANSACTIONS_RESULT_CODE:
+                    return
+                response.raise_for_status()
+            if ijson is None:
+                yield from response.json().get("payments") or []
+            else:
+                # transparently gunzip response.raw
+                response.raw.decode_content = True
+                yield from ijson.items(response.raw, "payments.item")
+        finally:
+            response.close()
+
+    def sync_transactions(
+        self, date_from: datetime.datetime, date_to: datetime.datetime, chunk_size: int = 500, **kwargs
+    ) -> dict:
+        """
+        save the transactions between `date_from` and `date_to` that are not saved yet as status responses
+        of their basic payments, `chunk_size` per bulk insert, see VRPaymentAPIResponseManger.bulk_create_from_json.
+        Transactions of payments that were not created through this app are skipped.
+        :param kwargs: see iter_transactions
+        :return: stats
+        """
+        stats = {"transactions": 0, "saved": 0}
+        url = f"{self.url}v1/query"
+        for chunk in _chunked(self.iter_transactions(date_from, date_to, **kwargs), chunk_size):
+            stats["transactions"] += len(chunk)
+            stats["saved"] += len(VRPaymentBasicPaymentStatusResponse.objects.bulk_create_from_json(chunk, url=url))
+        return stats
+
+
+def _format_query_date(value: datetime.datetime) -> str:
+    if timezone.is_aware(value):
+        value = value.astimezone(datetime.timezone.utc)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
@@ -1,3 +1,6 @@
 from setuptools import setup
 
-setup(install_requires=["requests", "django", "cryptography"])
+setup(
+    install_requires=["requests", "django", "cryptography"],
+    extras_require={"zstd": ["zstandard"], "ijson": ["ijson"]},
+)